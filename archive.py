@@ -0,0 +1,95 @@
+# archive.py - Moves closed months of the ledger and finished matches into compressed append-only files
+import asyncio, glob, gzip, json, logging, os, time
+from collections import defaultdict
+from datetime import datetime
+import config, db, periodic
+
+logger = logging.getLogger(__name__)
+_running = asyncio.Lock()  # the scheduler and /archive must not interleave (orphan cleanup)
+
+def cutoff(now=None):
+    """Epoch of the first day of the oldest month kept hot: ARCHIVE_KEEP_MONTHS full months before the current one."""
+    now = now or datetime.now()
+    months = now.year * 12 + now.month - 1 - config.ARCHIVE_KEEP_MONTHS
+    return int(datetime(months // 12, months % 12 + 1, 1).timestamp())
+
+def _period(ts):
+    return datetime.fromtimestamp(ts).strftime('%Y-%m')
+
+def _write_segment(kind, period, rows, key):
+    """Writes one immutable gzip JSONL segment atomically and returns its path.
+
+    The name is derived from the first row's key, so retrying a chunk whose
+    delete never committed overwrites the same file instead of duplicating it.
+    """
+    os.makedirs(config.ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(config.ARCHIVE_DIR, f'{kind}-{period}-{rows[0][key]:012d}.jsonl.gz')
+    with open(path + '.tmp', 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as out:
+            for row in rows: out.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')).encode() + b'\n')
+        raw.flush(); os.fsync(raw.fileno())
+    os.replace(path + '.tmp', path)
+    return path
+
+def _segments(kind, rows, key):
+    by_period = defaultdict(list)
+    for row in rows: by_period[_period(row['created_at'])].append(row)
+    return [(period, _write_segment(kind, period, chunk, key), len(chunk), chunk[0][key], chunk[-1][key]) for period, chunk in by_period.items()]
+
+async def _archive(kind, read, commit, key, before):
+    moved = 0
+    while True:
+        rows = await db.run_db(read, before, config.ARCHIVE_BATCH)
+        if not rows: return moved
+        segments = await asyncio.to_thread(_segments, kind, rows, key)
+        await db.run_write(commit, rows, segments)  # deletes the rows only once their files are on disk
+        moved += len(rows)
+        await asyncio.sleep(0)  # let queued handler writes in between chunks
+
+async def run(now=None):
+    """Archives everything older than cutoff(); returns {'transactions': n, 'matches': n}.
+
+    Each chunk of ARCHIVE_BATCH rows is read from a reader, written to
+    per-month segment files off the event loop, then deleted in one write
+    together with its balance checkpoints (ledger) or archived-total counters
+    (matches) and its archive_segments entry. A crash leaves each chunk either
+    fully moved or still in the database; files never recorded in
+    archive_segments are leftovers of such a crash and are removed first.
+    """
+    before = cutoff(now); started = time.monotonic()
+    async with _running:
+        await asyncio.to_thread(_remove_orphans, {s['path'] for s in await db.run_db(db.get_archive_segments_sync)})
+        result = {'transactions': await _archive('transactions', db.get_archivable_transactions_sync, db.archive_transactions_sync, 'id', before),
+                  'matches': await _archive('matches', db.get_archivable_matches_sync, db.archive_matches_sync, 'rid', before)}
+    if any(result.values()): logger.info(f"Archived {result} older than {_period(before)} in {time.monotonic() - started:.1f}s")
+    return result
+
+def _remove_orphans(recorded):
+    for path in glob.glob(os.path.join(config.ARCHIVE_DIR, '*.jsonl.gz*')):
+        if path not in recorded:
+            logger.warning(f"Removing unrecorded archive file {path}"); os.remove(path)
+
+def read_segment(path):
+    """Yields the rows stored in one segment (dicts, as they were in the table)."""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f: yield json.loads(line)
+
+def user_history_sync(user_id, period=None):
+    """Archived ledger rows of one user, oldest first (optionally one 'YYYY-MM' month only)."""
+    return [row for s in db.get_archive_segments_sync('transactions') if period in (None, s['period'])
+            for row in read_segment(s['path']) if row['user_id'] == user_id]
+
+def find_match_sync(match_id):
+    for s in reversed(db.get_archive_segments_sync('matches')):
+        for row in read_segment(s['path']):
+            if row['match_id'] == match_id: return row
+    return None
+
+# Runs the archiver at startup and then every ARCHIVE_INTERVAL seconds (0 disables it).
+scheduler = periodic.PeriodicTask('Archiving', run, lambda: config.ARCHIVE_INTERVAL, run_first=True)
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    db.init_db()
+    print(asyncio.run(run()))
+    db.close()
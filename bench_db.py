@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+db.py বেঞ্চমার্ক - সিনথেটিক প্রোডাকশন-আকারের ডাটাসেটে প্রতিটি পাবলিক ফাংশনের ল্যাটেন্সি ও থ্রুপুট
+
+    python bench_db.py --users 1000000 --transactions 10000000 --matches 2000000 --out bench_db.json
+    python bench_db.py --users 50000 --transactions 500000 --matches 100000 --compare bench_db.json
+
+প্রতিটি ফাংশন async wrapper (run_db / run_write) দিয়ে চালানো হয়:
+  - latency: একটির পর একটি কল, p50/p95/p99/mean (ms)
+  - throughput: --concurrency টি কোরুটিন একসাথে, প্রতি সেকেন্ডে কল
+ফলাফল JSON ফাইলে যায়; --compare দিয়ে আগের ফাইলের সাথে তুলনা করা যায়।
+--db PATH দিলে ডাটাসেট সেখানে রাখা হয় ও পরের বার পুনরায় ব্যবহার হয় (বেঞ্চমার্কের রাইটগুলো ডাটাসেটে থেকে যায়)।
+"""
+import argparse, asyncio, itertools, json, os, platform, random, sqlite3, subprocess, sys, tempfile, time
+import config
+
+NOW = int(time.time())
+FEES = [0.0, 20.0, 30.0, 50.0, 100.0, 200.0, 500.0]
+
+def _batched(rows, size=50000):
+    it = iter(rows)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk: return
+        yield chunk
+
+def generate(db, users, transactions, matches, seed):
+    """Bulk-loads a synthetic dataset through the real schema (migrations, triggers, indexes)."""
+    rnd = random.Random(seed)
+    conn = db.get_conn()
+    conn.execute('PRAGMA synchronous=OFF')
+    t0 = time.perf_counter()
+    conn.executemany('INSERT INTO users(user_id, username, ingame_name, is_registered, balance, wins, losses, created_at, elo_rating, last_tx_at) VALUES(?,?,?,?,?,?,?,?,?,?)',
+                     ((uid, f'user{uid}', f'IGN{uid}', int(rnd.random() < 0.8), round(rnd.random() * 2000, 2), rnd.randint(0, 200), rnd.randint(0, 200),
+                       NOW - rnd.randint(0, 365 * 86400), int(rnd.gauss(1000, 150)), NOW - rnd.randint(0, 60 * 86400)) for uid in range(1, users + 1)))
+    conn.commit()
+    types = ['deposit', 'match_entry', 'match_win', 'withdrawal_request', 'refund', 'referral_bonus']
+    for chunk in _batched((rnd.randint(1, users), round(rnd.uniform(-500, 500), 2), rnd.choice(types), 'bench', NOW - rnd.randint(0, 365 * 86400)) for _ in range(transactions)):
+        conn.executemany('INSERT INTO transactions(user_id, amount, type, note, created_at) VALUES(?,?,?,?,?)', chunk)
+    conn.commit()
+    def match_rows():
+        for i in range(matches):
+            p1 = rnd.randint(1, users); p2 = rnd.randint(1, users)
+            created = NOW - rnd.randint(3600, 365 * 86400)
+            r = rnd.random()
+            status = 'completed' if r < 0.90 else 'cancelled' if r < 0.95 else 'in_progress'
+            yield (f'b{i:07x}', p1, p2, rnd.choice(FEES), status, 'ROOM', created, p1 if status == 'completed' else None,
+                   created + config.MATCH_TIMEOUT if status == 'in_progress' else None)
+    for chunk in _batched(match_rows()):
+        conn.executemany('INSERT INTO active_matches(match_id, player1_id, player2_id, fee, status, room_code, created_at, winner_id, deadline_at) VALUES(?,?,?,?,?,?,?,?,?)', chunk)
+    conn.commit()
+    n_requests = max(users // 100, 10)
+    conn.executemany('INSERT INTO deposit_requests(user_id, txid, amount, status, created_at) VALUES(?,?,?,?,?)',
+                     ((rnd.randint(1, users), f'TX{i}', 100.0, 'pending' if rnd.random() < 0.1 else 'approved', NOW - rnd.randint(0, 86400 * 30)) for i in range(n_requests)))
+    conn.executemany('INSERT INTO withdrawal_requests(user_id, amount, method, account_number, status, created_at) VALUES(?,?,?,?,?,?)',
+                     ((rnd.randint(1, users), 150.0, 'bkash', '017', 'pending' if rnd.random() < 0.1 else 'approved', NOW - rnd.randint(0, 86400 * 30)) for _ in range(n_requests)))
+    conn.executemany('INSERT OR IGNORE INTO matchmaking_queue(user_id, fee, joined_at, lobby_message_id) VALUES(?,?,?,NULL)',
+                     ((rnd.randint(1, users), rnd.choice(FEES), NOW - rnd.randint(0, 600)) for _ in range(200)))
+    conn.commit()
+    db.rebuild_counters_sync(); conn.commit()
+    conn.execute('ANALYZE'); conn.commit()
+    conn.execute(f'PRAGMA synchronous={config.DB_SYNCHRONOUS}')
+    print(f"dataset: {users:,} users, {transactions:,} transactions, {matches:,} matches in {time.perf_counter() - t0:.1f}s")
+
+def _ids(conn, sql, *args):
+    return [r[0] for r in conn.execute(sql, args).fetchall()]
+
+def build_benches(db, users, rnd):
+    """(name, call(i) -> awaitable, heavy) for every public db function, reads first."""
+    conn = db.get_conn()
+    in_progress = conn.execute("SELECT match_id, player1_id FROM active_matches WHERE status = 'in_progress'").fetchall()
+    rnd.shuffle(in_progress)
+    pools = {name: in_progress[i::4] for i, name in enumerate(('resolve', 'screenshot', 'cancel', 'expire'))}
+    some_matches = _ids(conn, "SELECT match_id FROM active_matches LIMIT 10000")
+    deposits = _ids(conn, "SELECT id FROM deposit_requests"); withdrawals = _ids(conn, "SELECT id FROM withdrawal_requests")
+    new_users = itertools.count(users + 1)
+    queued = []; created = []
+    user = lambda: rnd.randint(1, users)
+    state = {}
+
+    async def create_campaign(i):
+        state['campaign'] = await db.create_campaign('bench', None, 1)
+    async def add_to_queue(i):
+        uid = user(); queued.append(uid); await db.add_to_queue(uid, rnd.choice(FEES), None)
+    async def remove_from_queue(i):
+        await db.remove_from_queue(queued.pop() if queued else user())
+    async def create_match(i):
+        created.append(await db.create_match(user(), user(), rnd.choice(FEES)))
+    async def set_room_code(i):
+        await db.set_room_code(created.pop() if created else rnd.choice(some_matches), 'ROOM')
+    def consume(pool, fn):
+        async def call(i):
+            if pools[pool]: await fn(*pools[pool].pop())
+        return call
+
+    return [
+        # --- reads (run_db) ---
+        ('get_user', lambda i: db.get_user(user()), False),
+        ('get_top_wins', lambda i: db.get_top_wins(10), False),
+        ('find_opponent_in_queue', lambda i: db.find_opponent_in_queue(rnd.choice(FEES), user()), False),
+        ('get_match', lambda i: db.get_match(rnd.choice(some_matches)), False),
+        ('get_deposit_request', lambda i: db.get_deposit_request(rnd.choice(deposits)), False),
+        ('get_withdrawal_request', lambda i: db.get_withdrawal_request(rnd.choice(withdrawals)), False),
+        ('get_from_queue', lambda i: db.get_from_queue(user()), False),
+        ('get_setting', lambda i: db.get_setting('rules_text'), False),
+        ('get_stats', lambda i: db.get_stats(), False),
+        ('get_total_users', lambda i: db.get_total_users(), False),
+        ('get_active_users', lambda i: db.get_active_users(), False),
+        ('get_total_matches', lambda i: db.get_total_matches(), False),
+        ('get_pending_deposits_count', lambda i: db.get_pending_deposits_count(), False),
+        ('get_pending_withdrawals_count', lambda i: db.get_pending_withdrawals_count(), False),
+        ('get_total_fees_collected', lambda i: db.get_total_fees_collected(), False),
+        ('get_pending_reviews', lambda i: db.get_pending_reviews(50), False),
+        ('get_running_campaign_ids', lambda i: db.get_running_campaign_ids(), False),
+        ('get_pending_deadlines', lambda i: db.get_pending_deadlines(), True),
+        ('get_all_user_ids', lambda i: db.get_all_user_ids(), True),
+        ('get_ranked_users (startup)', lambda i: db.run_db(db.get_ranked_users_sync), True),
+        ('get_queue (startup)', lambda i: db.run_db(db.get_queue_sync), True),
+        ('get_user_states (startup)', lambda i: db.run_db(db.get_user_states_sync), True),
+        # --- writes (run_write, group commit) ---
+        ('set_setting', lambda i: db.set_setting('bench_key', str(i)), False),
+        ('create_user_if_not_exists', lambda i: db.create_user_if_not_exists(next(new_users), 'bench', None), False),
+        ('update_user_fields', lambda i: db.update_user_fields(user(), {'phone_number': '017'}), False),
+        ('set_user_state', lambda i: db.set_user_state(user(), None), False),
+        ('save_user_states (x100)', lambda i: db.save_user_states([(user(), None, None) for _ in range(100)]), False),
+        ('adjust_balance', lambda i: db.adjust_balance(user(), 1.0, 'bench', 'bench'), False),
+        ('create_deposit_request', lambda i: db.create_deposit_request(user(), f'BTX{i}', 100.0), False),
+        ('update_deposit_status', lambda i: db.update_deposit_status(rnd.choice(deposits), 'approved'), False),
+        ('create_withdrawal_request', lambda i: db.create_withdrawal_request(user(), 150.0, 'bkash', '017'), False),
+        ('update_withdrawal_status', lambda i: db.update_withdrawal_status(rnd.choice(withdrawals), 'approved'), False),
+        ('add_to_queue', add_to_queue, False),
+        ('set_queue_lobby_message', lambda i: db.set_queue_lobby_message(user(), 1), False),
+        ('remove_from_queue', remove_from_queue, False),
+        ('create_match', create_match, False),
+        ('create_match_from_queue', lambda i: db.create_match_from_queue(user(), user(), rnd.choice(FEES)), False),
+        ('set_room_code', set_room_code, False),
+        ('submit_screenshot', consume('screenshot', lambda m, p1: db.submit_screenshot(m, p1, 'file')), False),
+        ('resolve_match', consume('resolve', lambda m, p1: db.resolve_match(m, p1)), False),
+        ('cancel_match', consume('cancel', lambda m, p1: db.cancel_match(m)), False),
+        ('expire_matches', consume('expire', lambda m, p1: db.expire_matches([m])), False),
+        ('create_campaign (all users)', create_campaign, True),
+        ('get_campaign', lambda i: db.get_campaign(state.get('campaign')), False),
+        ('get_pending_recipients', lambda i: db.get_pending_recipients(state.get('campaign'), user(), config.BROADCAST_PAGE_SIZE), False),
+        ('record_broadcast_results', lambda i: db.record_broadcast_results(state.get('campaign'), [(user(), 'sent')]), False),
+        ('finish_campaign', lambda i: db.finish_campaign(state.get('campaign')), True),
+        ('rebuild_counters', lambda i: db.rebuild_counters(), True),
+    ]
+
+def _pct(values, p):
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+async def measure(call, iterations, concurrency, throughput_ops, heavy):
+    samples = []
+    for i in range(iterations if not heavy else min(iterations, 3)):
+        t0 = time.perf_counter(); await call(i); samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    result = {'latency_ms': {'n': len(samples), 'p50': _pct(samples, 50), 'p95': _pct(samples, 95), 'p99': _pct(samples, 99),
+                             'mean': sum(samples) / len(samples), 'max': samples[-1]}}
+    if not heavy and throughput_ops:
+        counter = itertools.count(iterations)
+        async def worker():
+            for i in iter(lambda: next(counter), None):
+                if i >= iterations + throughput_ops: return
+                await call(i)
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+        result['throughput'] = {'ops': throughput_ops, 'concurrency': concurrency, 'seconds': elapsed, 'ops_per_sec': throughput_ops / elapsed}
+    return result
+
+def _git_commit():
+    try: return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError: return None
+
+def compare(previous, current):
+    print(f"\n{'function':32s} {'p50 ms (old → new)':>24s} {'ops/s (old → new)':>26s}")
+    for name, res in current['results'].items():
+        old = previous['results'].get(name)
+        if not old: continue
+        p_old, p_new = old['latency_ms']['p50'], res['latency_ms']['p50']
+        line = f"{name:32s} {p_old:9.3f} → {p_new:9.3f} {p_new / p_old if p_old else 0:5.2f}x"
+        if 'throughput' in res and 'throughput' in old:
+            t_old, t_new = old['throughput']['ops_per_sec'], res['throughput']['ops_per_sec']
+            line += f" {t_old:9.0f} → {t_new:9.0f} {t_new / t_old if t_old else 0:5.2f}x"
+        print(line)
+
+async def run(db, benches, args):
+    results = {}
+    for name, call, heavy in benches:
+        if args.only and not any(key in name for key in args.only): continue
+        results[name] = res = await measure(call, args.iterations, args.concurrency, args.throughput_ops, heavy)
+        lat = res['latency_ms']; tp = res.get('throughput')
+        print(f"{name:32s} p50={lat['p50']:8.3f}ms p95={lat['p95']:8.3f}ms p99={lat['p99']:8.3f}ms" + (f"  {tp['ops_per_sec']:9.0f} ops/s" if tp else ''))
+    await db.flush()
+    return results
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--users', type=int, default=1_000_000)
+    ap.add_argument('--transactions', type=int, default=10_000_000)
+    ap.add_argument('--matches', type=int, default=2_000_000)
+    ap.add_argument('--iterations', type=int, default=200, help='latency: sequential calls per function')
+    ap.add_argument('--throughput-ops', type=int, default=2000, help='throughput: calls per function (0 = skip)')
+    ap.add_argument('--concurrency', type=int, default=32)
+    ap.add_argument('--only', nargs='*', help='run only functions whose name contains one of these')
+    ap.add_argument('--db', help='dataset path to create or reuse (default: temporary)')
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--out', default='bench_db.json')
+    ap.add_argument('--compare', help='previous results JSON to compare against')
+    args = ap.parse_args()
+
+    config.LOCAL_DB = args.db or os.path.join(tempfile.mkdtemp(prefix='db_bench_'), 'bench.db')
+    reuse = os.path.exists(config.LOCAL_DB)
+    import db
+    db.init_db()
+    if reuse:
+        args.users = db.get_conn().execute('SELECT MAX(user_id) FROM users').fetchone()[0] or 0
+        print(f"reusing dataset {config.LOCAL_DB} ({args.users:,} users)")
+    else:
+        generate(db, args.users, args.transactions, args.matches, args.seed)
+    benches = build_benches(db, args.users, random.Random(args.seed))
+    results = asyncio.run(run(db, benches, args))
+    conn = db.get_conn()
+    report = {
+        'meta': {'timestamp': int(time.time()), 'git_commit': _git_commit(), 'python': sys.version.split()[0], 'sqlite': sqlite3.sqlite_version,
+                 'platform': platform.platform(), 'dataset': {t: conn.execute(f'SELECT COUNT(*) FROM {t}').fetchone()[0] for t in ('users', 'transactions', 'active_matches')},
+                 'args': {k: v for k, v in vars(args).items() if k not in ('out', 'compare')},
+                 'config': {k: getattr(config, k) for k in ('DB_READERS', 'DB_WRITE_BATCH', 'DB_SYNCHRONOUS', 'USER_CACHE_SIZE')},
+                 'user_cache': db.user_cache_stats()},
+        'results': results,
+    }
+    db.close()
+    with open(args.out, 'w') as f: json.dump(report, f, indent=2)
+    print(f"\nresults written to {args.out}")
+    if args.compare:
+        with open(args.compare) as f: compare(json.load(f), report)
+
+if __name__ == '__main__':
+    main()
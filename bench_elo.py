@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+ELO রিপ্লে বেঞ্চমার্ক - স্কেলার db.calculate_elo লুপ বনাম NumPy ওয়েভ ইঞ্জিন
+
+    python bench_elo.py --matches 2000000 --players 100000
+    python bench_elo.py --db bench.db      # bench_db.py --db দিয়ে তৈরি ডাটাসেটে পুরো লোড + রিপ্লে (ড্রাই রান)
+
+সিনথেটিক ইতিহাসে কিছু খেলোয়াড় অনেক বেশি খেলে (বাস্তবের মতো), তাই ওয়েভ সংখ্যা
+শুধু ম্যাচ/খেলোয়াড় অনুপাতের চেয়ে বেশি হয়। দুই ইঞ্জিনের ফলাফল হুবহু মিলতে হবে।
+"""
+import argparse, random, time
+import config
+
+def history(matches, players, skew, seed):
+    rnd = random.Random(seed)
+    weights = [1 / (i + 1) ** skew for i in range(players)]  # a few very active players, a long tail
+    picks = rnd.choices(range(players), weights, k=2 * matches)
+    winners = []; losers = []
+    for a, b in zip(picks[::2], picks[1::2]):
+        if a == b: b = (b + 1) % players
+        winners.append(a); losers.append(b)
+    return winners, losers
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter(); result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--matches', type=int, default=1000000)
+    parser.add_argument('--players', type=int, default=50000)
+    parser.add_argument('--skew', type=float, default=0.5, help='Zipf exponent of player activity (0 = uniform)')
+    parser.add_argument('--provisional-games', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--db', help='replay this database instead of a synthetic history (read only)')
+    args = parser.parse_args()
+    if args.db: config.LOCAL_DB = args.db
+    import db, elo_replay
+    if elo_replay.np is None: print("numpy নেই: শুধু স্কেলার পথ মাপা হবে")
+
+    if args.db:
+        db.init_db()
+        for engine in ('scalar', 'numpy') if elo_replay.np is not None else ('scalar',):
+            report = elo_replay.run_sync(engine=engine)
+            print(f"{engine:>6}: {report['matches']} matches, load {report['load_seconds']:.2f}s, replay {report['replay_seconds']:.2f}s, "
+                  f"{len(report['changes'])} ratings would change")
+        db.close(); return
+
+    winners, losers = history(args.matches, args.players, args.skew, args.seed)
+    options = (config.ELO_K_FACTOR, 48, args.provisional_games)
+    print(f"{args.matches} matches, {args.players} players, K={options[0]}, provisional K={options[1]} for {options[2]} games")
+    scalar, t_scalar = timed(elo_replay.replay_scalar, winners, losers, args.players, *options)
+    print(f"scalar calculate_elo: {t_scalar:.2f}s ({args.matches / t_scalar:,.0f} matches/s)")
+    if elo_replay.np is None: return
+    wave, t_waves = timed(elo_replay.waves, winners, losers, args.players)
+    vector, t_numpy = timed(elo_replay.replay_numpy, winners, losers, args.players, *options, wave=wave)
+    total = t_waves + t_numpy
+    print(f"numpy: waves {t_waves:.2f}s + rating {t_numpy:.2f}s = {total:.2f}s ({args.matches / total:,.0f} matches/s, "
+          f"{max(wave)} waves, {args.matches / max(wave):.0f} matches/wave), {t_scalar / total:.1f}x")
+    mismatches = sum(a != b for a, b in zip(scalar, vector))
+    print(f"identical ratings: {mismatches == 0} ({mismatches} differ)")
+
+if __name__ == '__main__':
+    main()
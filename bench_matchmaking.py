@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+ম্যাচমেকিং থ্রুপুট বেঞ্চমার্ক - পুরাতন SQL কিউ পদ্ধতি বনাম ইন-মেমরি ইঞ্জিন
+
+    python bench_matchmaking.py --players 5000 --fees 0,20,30,50,100,200,500
+
+একটি অস্থায়ী ডাটাবেসে কাজ করে, local_data.db স্পর্শ করে না।
+"""
+import argparse, asyncio, os, tempfile, time
+import config
+
+async def legacy_round(db, waiting, joining, fees):
+    """The pre-engine flow: one global lock, queue scan + remove + create per tap."""
+    lock = asyncio.Lock()
+    for i, uid in enumerate(waiting): await db.add_to_queue(uid, fees[i % len(fees)], None)
+    async def tap(i, uid):
+        async with lock:
+            opponent = await db.find_opponent_in_queue(fees[i % len(fees)], uid)
+            if opponent:
+                await db.remove_from_queue(opponent['user_id'])
+                await db.create_match(uid, opponent['user_id'], fees[i % len(fees)])
+                await db.get_user(opponent['user_id'])
+    t0 = time.perf_counter()
+    await asyncio.gather(*(tap(i, uid) for i, uid in enumerate(joining)))
+    return time.perf_counter() - t0
+
+async def engine_round(store, matchmaking, waiting, joining, fees):
+    """The engine persisting through `store` (storage.SqliteStorage or the zero-I/O MemoryStorage)."""
+    import storage
+    storage.use(store); engine = matchmaking.MatchmakingEngine()
+    for i, uid in enumerate(waiting): await engine.pair_or_enqueue(uid, fees[i % len(fees)])
+    async def tap(i, uid):
+        opponent = await engine.pair_or_enqueue(uid, fees[i % len(fees)])
+        if opponent:
+            await store.create_match_from_queue(uid, opponent['user_id'], fees[i % len(fees)])
+            await store.get_user(opponent['user_id'])
+    t0 = time.perf_counter()
+    await asyncio.gather(*(tap(i, uid) for i, uid in enumerate(joining)))
+    return time.perf_counter() - t0
+
+async def pairing_only(matchmaking, players, fees):
+    """Pure in-memory pairing rate (no persistence)."""
+    engine = matchmaking.MatchmakingEngine()
+    engine.load([{'user_id': uid, 'fee': fees[i % len(fees)], 'joined_at': 0, 'lobby_message_id': None} for i, uid in enumerate(players)])
+    joining = [uid + len(players) for uid in players]
+    t0 = time.perf_counter()
+    for i, uid in enumerate(joining): await engine.pair_or_enqueue(uid, fees[i % len(fees)])
+    return time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--players', type=int, default=5000, help='কিউতে অপেক্ষমাণ খেলোয়াড় (সমান সংখ্যক খেলোয়াড় জোড়া খুঁজবে)')
+    ap.add_argument('--fees', default='0,20,30,50,100,200,500')
+    args = ap.parse_args()
+    fees = [float(f) for f in args.fees.split(',')]
+
+    tmpdir = tempfile.mkdtemp(prefix='mm_bench_')
+    config.LOCAL_DB = os.path.join(tmpdir, 'bench.db')
+    import db, matchmaking, storage
+    db.init_db()
+    n = args.players
+    conn = db.get_conn()
+    conn.executemany('INSERT INTO users(user_id, username, is_registered, balance) VALUES(?,?,1,1000000)', [(uid, f'u{uid}') for uid in range(1, 4 * n + 1)])
+    conn.commit()
+
+    legacy = asyncio.run(legacy_round(db, list(range(1, n + 1)), list(range(n + 1, 2 * n + 1)), fees))
+    new = asyncio.run(engine_round(storage.SqliteStorage(), matchmaking, list(range(2 * n + 1, 3 * n + 1)), list(range(3 * n + 1, 4 * n + 1)), fees))
+    memory = storage.MemoryStorage()
+    for uid in range(2 * n + 1, 4 * n + 1): asyncio.run(memory.create_user_if_not_exists(uid, f'u{uid}'))
+    nio = asyncio.run(engine_round(memory, matchmaking, list(range(2 * n + 1, 3 * n + 1)), list(range(3 * n + 1, 4 * n + 1)), fees))
+    mem = asyncio.run(pairing_only(matchmaking, list(range(10**7, 10**7 + n)), fees))
+
+    print(f"{n} queued players, {len(fees)} fee tiers")
+    print(f"  legacy SQL queue + global lock : {n / legacy:10.0f} pairings/s ({legacy:.2f}s)")
+    print(f"  engine + single-tx persistence : {n / new:10.0f} pairings/s ({new:.2f}s)")
+    print(f"  engine + MemoryStorage (no I/O): {n / nio:10.0f} pairings/s ({nio:.2f}s)")
+    print(f"  engine pairing only (in-memory): {n / mem:10.0f} pairings/s ({mem:.4f}s)")
+
+if __name__ == '__main__':
+    main()
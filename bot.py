@@ -1,10 +1,12 @@
 # bot.py - Final, with dynamic rules and free play toggle
-import logging, re, json, asyncio
-from datetime import datetime, timedelta
+import logging, re, asyncio, os
+from pathlib import Path
+from collections import Counter
+from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler
-from telegram.error import BadRequest, Forbidden
-import db, config
+from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler, ChatMemberHandler
+from telegram.error import BadRequest
+import db, storage, config, matchmaking, membership, broadcast, leaderboard, timeouts, webhook, dispatcher, floodcontrol, lobby, outbound, review, backup, metrics, conversation, archive, elo_replay, tournament
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -16,6 +18,7 @@ MAIN_KEYBOARD = ReplyKeyboardMarkup([
     ["🏆 Leaderboard", "🔗 Share & Earn"]
 ], resize_keyboard=True)
 CANCEL_KEYBOARD = ReplyKeyboardMarkup([["❌ Cancel"]], resize_keyboard=True)
+MENU_BUTTONS = {button.text for row in MAIN_KEYBOARD.keyboard for button in row}
 
 # --- Helper: Get Main Menu Inline Keyboard ---
 def get_main_menu_keyboard():
@@ -25,22 +28,40 @@ def get_main_menu_keyboard():
         [InlineKeyboardButton("🏆 Leaderboard", callback_data="menu_leaderboard"), InlineKeyboardButton("📜 Rules", callback_data="menu_rules")]
     ])
 
+# --- Metric routes: fixed labels for the dispatch branches (never raw user input) ---
+TEXT_ROUTES = {"🎮 Play 1v1": 'play', "💰 My Wallet": 'wallet', "📋 Profile": 'profile', "📜 Rules": 'rules',
+               "🏆 Leaderboard": 'leaderboard', "🔗 Share & Earn": 'share', "❌ Cancel": 'cancel'}
+CALLBACK_PAGES = {'menu_play', 'menu_wallet', 'menu_profile', 'menu_leaderboard', 'menu_rules', 'deposit', 'withdraw'}
+CALLBACK_PREFIXES = ('play_fee_', 'cancel_', 'admin_res_', 'review_show_', 'admin_ban_', 'admin_setbal_', 'w_method_', 'pend_', 'tjoin_')
+
+def _text_route(update):
+    return TEXT_ROUTES.get(update.message.text.strip(), 'text') if update.message and update.message.text else 'text'
+
+def _callback_route(update):
+    data = update.callback_query.data or ''
+    if data in CALLBACK_PAGES: return data
+    return next((prefix[:-1] for prefix in CALLBACK_PREFIXES if data.startswith(prefix)), 'other')
+
 # --- Core Functions (Unaltered) ---
 async def ensure_user(update: Update, referrer_id: int = None):
     user_obj = update.effective_user
     if not user_obj: return None
-    if not await db.get_user(user_obj.id):
-        await db.create_user_if_not_exists(user_obj.id, user_obj.username or user_obj.first_name, referrer_id)
-    user = await db.get_user(user_obj.id)
+    user = await storage.backend.get_user(user_obj.id)
+    if not user:
+        await storage.backend.create_user_if_not_exists(user_obj.id, user_obj.username or user_obj.first_name, referrer_id)
+        user = await storage.backend.get_user(user_obj.id)
     if user and user.get('is_banned'):
         return None  # User is banned
+    if user and user.get('is_blocked'):
+        await storage.backend.update_user_fields(user['user_id'], {'is_blocked': 0})  # talking to us again, so broadcasts may reach them
     return user
+SQLITE_ONLY_REPLY = "এই কমান্ডটি শুধু SQLite স্টোরেজে (STORAGE_BACKEND = 'sqlite') চালু থাকে।"
+
 async def check_channel_member(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
     user_id = update.effective_user.id
     if user_id in config.ADMINS: return True
     try:
-        member = await context.bot.get_chat_member(config.CHANNEL_ID, user_id)
-        if member.status in ('left', 'kicked'):
+        if not await membership.cache.is_member(context.bot, user_id):
             kb = [[InlineKeyboardButton('Join Channel', url=f'https://t.me/{config.CHANNEL_USERNAME}')]]
             await update.effective_message.reply_text('বটটি ব্যবহার করতে, অনুগ্রহ করে আমাদের চ্যানেলে যোগ দিন।', reply_markup=InlineKeyboardMarkup(kb))
             return False
@@ -49,6 +70,12 @@ async def check_channel_member(update: Update, context: ContextTypes.DEFAULT_TYP
         logger.error(f"Error checking channel membership for {user_id}: {e}")
         return False
 
+async def channel_member_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Keeps the membership cache in sync with joins/leaves in the main channel."""
+    change = update.chat_member
+    if change.chat.id != config.CHANNEL_ID: return
+    membership.cache.on_member_update(change.new_chat_member.user.id, change.new_chat_member.status)
+
 # --- Command Handlers ---
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user; args = context.args
@@ -56,7 +83,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     db_user = await ensure_user(update, referrer_id)
     
     # Check if user is banned
-    raw_user = await db.get_user(user.id)
+    raw_user = await storage.backend.get_user(user.id)
     if raw_user and raw_user.get('is_banned'):
         return await update.message.reply_text("❌ আপনার একাউন্ট ব্যান করা হয়েছে। আপিল করতে অ্যাডমিনের সাথে যোগাযোগ করুন।")
     
@@ -65,12 +92,12 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if db_user.get('is_registered'): await update.message.reply_text('আপনাকে স্বাগতম!', reply_markup=MAIN_KEYBOARD)
     else:
         await update.message.reply_text('স্বাগতম! আপনার eFootball ইন-গেম নাম (IGN) পাঠান:', reply_markup=CANCEL_KEYBOARD)
-        await db.set_user_state(db_user['user_id'], 'awaiting_ign')
+        conversation.store.set(db_user['user_id'], 'awaiting_ign')
 
 async def main_text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = await ensure_user(update)
     if not user:
-        raw_user = await db.get_user(update.effective_user.id)
+        raw_user = await storage.backend.get_user(update.effective_user.id)
         if raw_user and raw_user.get('is_banned'):
             return await update.message.reply_text("❌ আপনার একাউন্ট ব্যান করা হয়েছে।")
         return await update.message.reply_text("আপনার একাউন্টে সমস্যা। /start কমান্ড দিন।")
@@ -80,80 +107,82 @@ async def main_text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if txt == "📜 Rules":
         return await rules_command(update, context)
 
-    state, state_data = user.get('state'), user.get('state_data')
+    conv = conversation.store.get(user['user_id'])
+    if conv is None and txt != "❌ Cancel" and tournament.engine.resume_host(user['user_id']):
+        conv = conversation.store.get(user['user_id'])  # a deferred tournament host: this text may already be the room code
+    state = conv and conv.step
+    if state: metrics.set_route(state)
     
     if txt == "❌ Cancel":
-        await db.set_user_state(user['user_id'], None)
-        queue_entry = await db.get_from_queue(user['user_id'])
+        conversation.store.clear(user['user_id'])
+        queue_entry = matchmaking.engine.remove(user['user_id'])
         if queue_entry:
-            await db.remove_from_queue(user['user_id'])
-            try: await context.bot.delete_message(config.LOBBY_CHANNEL_ID, queue_entry['lobby_message_id'])
-            except Exception: pass
+            await storage.backend.remove_from_queue(user['user_id'])
+            await lobby.board.left(context.bot, queue_entry)
+        if tournament.engine.resume_host(user['user_id']):
+            return await update.message.reply_text("বাতিল করা হয়েছে। 🏆 এখন আপনার টুর্নামেন্ট ম্যাচের রুম কোডটি পাঠান।", reply_markup=CANCEL_KEYBOARD)
         return await update.message.reply_text("বাতিল করা হয়েছে।", reply_markup=MAIN_KEYBOARD)
     
     # ... (Registration, room code, withdrawal logic is unaltered) ...
     if state == 'awaiting_ign':
-        await db.update_user_fields(user['user_id'], {'ingame_name': txt})
-        await db.set_user_state(user['user_id'], 'awaiting_phone')
+        await storage.backend.update_user_fields(user['user_id'], {'ingame_name': txt})
+        conversation.store.set(user['user_id'], 'awaiting_phone')
         return await update.message.reply_text('ধন্যবাদ! এখন আপনার ফোন নম্বর পাঠান:')
     if state == 'awaiting_phone':
-        await db.update_user_fields(user['user_id'], {'phone_number': txt, 'is_registered': 1})
+        await storage.backend.update_user_fields(user['user_id'], {'phone_number': txt, 'is_registered': 1})
         if not user.get('welcome_given'):
-            await db.adjust_balance(user['user_id'], 10.0, 'welcome_bonus', 'Welcome bonus')
-            await db.update_user_fields(user['user_id'], {'welcome_given': 1})
+            await storage.backend.adjust_balance(user['user_id'], 10.0, 'welcome_bonus', 'Welcome bonus')
+            await storage.backend.update_user_fields(user['user_id'], {'welcome_given': 1})
             await update.message.reply_text('রেজিস্ট্রেশন সম্পন্ন! আপনি 10.0 টাকা বোনাস পেয়েছেন।', reply_markup=MAIN_KEYBOARD)
         else: await update.message.reply_text('রেজিস্ট্রেশন সম্পন্ন!', reply_markup=MAIN_KEYBOARD)
         referrer_id = user.get('referrer_id')
         if referrer_id and referrer_id != user['user_id']: 
-            await db.adjust_balance(referrer_id, config.REFERRAL_BONUS, 'referral_bonus', f"Bonus for referring {user['user_id']}")
-            try: await context.bot.send_message(referrer_id, f"🎉 অভিনন্দন! আপনার বন্ধু রেজিস্ট্রেশন করেছে। আপনি {config.REFERRAL_BONUS:.2f} TK বোনাস পেয়েছেন।")
-            except Exception as e: logger.warning(f"Could not send ref bonus notification to {referrer_id}: {e}")
-        return await db.set_user_state(user['user_id'], None)
-    if state == 'awaiting_room_code':
-        match_id = state_data
-        match = await db.get_match(match_id)
+            await storage.backend.adjust_balance(referrer_id, config.REFERRAL_BONUS, 'referral_bonus', f"Bonus for referring {user['user_id']}")
+            outbound.pipeline.send(context.bot.send_message, referrer_id, f"🎉 অভিনন্দন! আপনার বন্ধু রেজিস্ট্রেশন করেছে। আপনি {config.REFERRAL_BONUS:.2f} TK বোনাস পেয়েছেন।")
+        return conversation.store.clear(user['user_id'])
+    if state == 'awaiting_room_code' and txt not in MENU_BUTTONS:  # a menu tap is not a room code
+        match_id = conv.match_id
+        match = await storage.backend.get_match(match_id)
         if match and match['player1_id'] == user['user_id'] and match['status'] == 'waiting_for_code':
             opponent_id = match['player2_id']; room_code = txt
-            await db.set_room_code(match_id, room_code)
+            deadline_at = await storage.backend.set_room_code(match_id, room_code)
+            timeouts.scheduler.schedule(match_id, deadline_at)
             match_start_text_opponent = (f"⚔️ **ম্যাচ শুরু!** ⚔️\nRoom Code: `{room_code}`\n\nখেলা শেষে, জেতার স্ক্রিনশট দিয়ে `/result {match_id}` কমান্ডটি ব্যবহার করুন।\n**সময়:** ১৫ মিনিট.")
             match_start_text_provider = (f"রুম কোড `{room_code}` প্রতিপক্ষকে পাঠানো হয়েছে। শুভকামনা!\n\nখেলা শেষে, জেতার স্ক্রিনশট দিয়ে `/result {match_id}` কমান্ডটি ব্যবহার করুন।")
-            await context.bot.send_message(user['user_id'], match_start_text_provider, reply_markup=MAIN_KEYBOARD, parse_mode='Markdown')
-            await context.bot.send_message(opponent_id, match_start_text_opponent, parse_mode='Markdown')
-            context.job_queue.run_once(check_match_timeout, timedelta(minutes=15), data={'match_id': match_id}, name=f"timeout_{match_id}")
-            return await db.set_user_state(user['user_id'], None)
+            outbound.pipeline.send(context.bot.send_message, user['user_id'], match_start_text_provider, reply_markup=MAIN_KEYBOARD, parse_mode='Markdown', lane=outbound.CRITICAL)
+            outbound.pipeline.send(context.bot.send_message, opponent_id, match_start_text_opponent, parse_mode='Markdown', lane=outbound.CRITICAL)
+            return conversation.store.clear(user['user_id'])
     if state == 'awaiting_withdraw_amount':
         try:
             amount = float(txt); balance = user['balance']
             if amount < config.MINIMUM_WITHDRAWAL: return await update.message.reply_text(f'ন্যূনতম উইথড্র {config.MINIMUM_WITHDRAWAL:.2f} TK।')
             if amount > balance: return await update.message.reply_text(f'অপর্যাপ্ত ব্যালেন্স।')
             kb = [[InlineKeyboardButton('Bkash', callback_data='w_method_bkash')], [InlineKeyboardButton('Nagad', callback_data='w_method_nagad')]]
-            await db.set_user_state(user['user_id'], 'awaiting_withdraw_method', json.dumps({'amount': amount}))
+            conversation.store.set(user['user_id'], 'awaiting_withdraw_method', amount=amount)
             return await update.message.reply_text('মাধ্যম নির্বাচন করুন:', reply_markup=InlineKeyboardMarkup(kb))
         except ValueError: return await update.message.reply_text('সঠিক সংখ্যা লিখুন।')
     if state == 'awaiting_withdraw_account':
-        data = json.loads(state_data)
-        await db.adjust_balance(user['user_id'], -data['amount'], 'withdrawal_request', f"Withdrawal request")
-        req_id = await db.create_withdrawal_request(user['user_id'], data['amount'], data['method'], txt)
+        await storage.backend.adjust_balance(user['user_id'], -conv.amount, 'withdrawal_request', f"Withdrawal request")
+        req_id = await storage.backend.create_withdrawal_request(user['user_id'], conv.amount, conv.method, txt)
         await update.message.reply_text('আপনার উইথড্র অনুরোধ গ্রহণ করা হয়েছে।', reply_markup=MAIN_KEYBOARD)
         for aid in config.ADMINS:
-            try: await context.bot.send_message(aid, (f"নতুন উইথড্র অনুরোধ! (ID: {req_id})\nUser: {user['user_id']} ({user.get('ingame_name')})\nAmount: {data['amount']} TK\nMethod: {data['method']}\nNumber: {txt}\n/approve_withdrawal {req_id}\n/reject_withdrawal {req_id}"))
-            except Exception: pass
-        return await db.set_user_state(user['user_id'], None)
+            outbound.pipeline.send(context.bot.send_message, aid, (f"নতুন উইথড্র অনুরোধ! (ID: {req_id})\nUser: {user['user_id']} ({user.get('ingame_name')})\nAmount: {conv.amount} TK\nMethod: {conv.method}\nNumber: {txt}\n/approve_withdrawal {req_id}\n/reject_withdrawal {req_id}"))
+        return conversation.store.clear(user['user_id'])
     
     if state == 'admin_setbal_amount':
         try:
             if user['user_id'] not in config.ADMINS:
                 return await update.message.reply_text("অনুমতি নেই।")
             new_amount = float(txt)
-            target_user_id = int(state_data)
-            current_balance = (await db.get_user(target_user_id)).get('balance', 0)
-            await db.update_user_fields(target_user_id, {'balance': new_amount})
+            target_user_id = conv.target_id
+            current_balance = (await storage.backend.get_user(target_user_id)).get('balance', 0)
+            await storage.backend.update_user_fields(target_user_id, {'balance': new_amount})
             await update.message.reply_text(f"✅ ব্যবহারকারী {target_user_id} এর ব্যালেন্স {current_balance:.2f} থেকে {new_amount:.2f} TK এ পরিবর্তন করা হয়েছে।")
-            await context.bot.send_message(target_user_id, f"📝 আপনার ব্যালেন্স আপডেট করা হয়েছে। নতুন ব্যালেন্স: {new_amount:.2f} TK")
+            outbound.pipeline.send(context.bot.send_message, target_user_id, f"📝 আপনার ব্যালেন্স আপডেট করা হয়েছে। নতুন ব্যালেন্স: {new_amount:.2f} TK")
         except ValueError:
             await update.message.reply_text("❌ সঠিক সংখ্যা লিখুন।")
         finally:
-            await db.set_user_state(user['user_id'], None)
+            conversation.store.clear(user['user_id'])
 
     # --- Menu Button Actions (Unaltered) ---
     if txt == "🎮 Play 1v1": return await play_1v1_menu(update, context)
@@ -165,39 +194,35 @@ async def main_text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # ... (Deposit logic is unaltered) ...
     m = re.match(r'^([A-Za-z0-9]+)\s+(\d+(?:\.\d{1,2})?)$', txt)
     if m:
+        metrics.set_route('deposit')
         if not await check_channel_member(update, context): return
         txid, amt = m.group(1), float(m.group(2))
         if amt < config.MINIMUM_DEPOSIT: return await update.message.reply_text(f"ন্যূনতম ডিপোজিট {config.MINIMUM_DEPOSIT:.2f} TK।")
-        req_id = await db.create_deposit_request(user['user_id'], txid, amt)
+        req_id = await storage.backend.create_deposit_request(user['user_id'], txid, amt)
         await update.message.reply_text('আপনার ডিপোজিট অনুরোধ গ্রহণ করা হয়েছে।')
         for aid in config.ADMINS:
-            try: await context.bot.send_message(aid, (f"নতুন ডিপোজিট অনুরোধ! (ID: {req_id})\nUser: {user['user_id']} ({user.get('ingame_name')})\nTxID: {txid}\nAmount: {amt} TK\n/approve_deposit {req_id}"))
-            except Exception: pass
+            outbound.pipeline.send(context.bot.send_message, aid, (f"নতুন ডিপোজিট অনুরোধ! (ID: {req_id})\nUser: {user['user_id']} ({user.get('ingame_name')})\nTxID: {txid}\nAmount: {amt} TK\n/approve_deposit {req_id}\n/reject_deposit {req_id}"))
 
 async def photo_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # ... (Unaltered) ...
     user = await ensure_user(update);
     if not user: return
-    state, state_data = user.get('state'), user.get('state_data')
-    if state == 'awaiting_screenshot':
-        match_id = state_data; screenshot_id = update.message.photo[-1].file_id
-        updated_match = await db.submit_screenshot(match_id, user['user_id'], screenshot_id)
+    conv = conversation.store.get(user['user_id'])
+    if conv and conv.step == 'awaiting_screenshot':
+        match_id = conv.match_id; screenshot_id = update.message.photo[-1].file_id
+        updated_match = await storage.backend.submit_screenshot(match_id, user['user_id'], screenshot_id)
+        conversation.store.clear(user['user_id'])
+        if not updated_match: return await update.message.reply_text("এই ম্যাচটি আর চালু নেই, স্ক্রিনশট নেওয়া হয়নি।", reply_markup=MAIN_KEYBOARD)
         await update.message.reply_text("আপনার স্ক্রিনশট গ্রহণ করা হয়েছে।", reply_markup=MAIN_KEYBOARD)
-        await db.set_user_state(user['user_id'], None)
         p1_id = updated_match['player1_id']; p2_id = updated_match['player2_id']
         opponent_id = p2_id if user['user_id'] == p1_id else p1_id
-        await context.bot.send_message(opponent_id, "আপনার প্রতিপক্ষ ফলাফল জমা দিয়েছে।")
+        outbound.pipeline.send(context.bot.send_message, opponent_id, "আপনার প্রতিপক্ষ ফলাফল জমা দিয়েছে।", lane=outbound.CRITICAL)
         if updated_match.get('p1_screenshot_id') and updated_match.get('p2_screenshot_id'):
-            p1 = await db.get_user(p1_id); p2 = await db.get_user(p2_id)
-            for admin_id in config.ADMINS:
-                try:
-                    kb = [[InlineKeyboardButton(f"{p1['ingame_name']} Wins", callback_data=f"admin_res_{match_id}_{p1_id}"), InlineKeyboardButton(f"{p2['ingame_name']} Wins", callback_data=f"admin_res_{match_id}_{p2_id}")]]
-                    await context.bot.send_message(admin_id, f"ম্যাচ #{match_id} এর ফলাফল পর্যালোচনার জন্য প্রস্তুত।")
-                    await context.bot.send_photo(admin_id, updated_match['p1_screenshot_id'], caption=f"P1 ({p1.get('ingame_name', p1_id)}) এর স্ক্রিনশট:")
-                    await context.bot.send_photo(admin_id, updated_match['p2_screenshot_id'], caption=f"P2 ({p2.get('ingame_name', p2_id)}) এর স্ক্রিনশট:", reply_markup=InlineKeyboardMarkup(kb))
-                except Exception as e: logger.error(f"Failed to send screenshots to admin {admin_id}: {e}")
-            await context.bot.send_message(p1_id, "উভয় স্ক্রিনশট জমা হয়েছে।")
-            await context.bot.send_message(p2_id, "উভয় স্ক্রিনশট জমা হয়েছে।")
+            timeouts.scheduler.cancel(match_id)  # an admin decides from here on
+            p1, p2 = await asyncio.gather(storage.backend.get_user(p1_id), storage.backend.get_user(p2_id))
+            review.queue.dispatch(context.bot, updated_match, p1, p2)
+            outbound.pipeline.send(context.bot.send_message, p1_id, "উভয় স্ক্রিনশট জমা হয়েছে।", lane=outbound.CRITICAL)
+            outbound.pipeline.send(context.bot.send_message, p2_id, "উভয় স্ক্রিনশট জমা হয়েছে।", lane=outbound.CRITICAL)
 
 async def callback_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # ... (Unaltered) ...
@@ -213,54 +238,58 @@ async def callback_query_handler(update: Update, context: ContextTypes.DEFAULT_T
     if data.startswith('play_fee_'): await handle_play_request(update, context)
     elif data.startswith('cancel_'): await cancel_search(update, context)
     elif data.startswith('admin_res_'): await admin_resolve_match(update, context)
+    elif data.startswith('review_show_'): await show_review_callback(update, context)
     elif data.startswith('admin_ban_'): await handle_ban_callback(update, context)
     elif data.startswith('admin_setbal_'): await handle_setbalance_callback(update, context)
+    elif data.startswith('pend_'): await pending_callback(update, context)
+    elif data.startswith('tjoin_'): await tournament_join_callback(update, context)
     elif data == 'deposit': await query.message.reply_text(f"ন্যূনতম ডিপোজিট {config.MINIMUM_DEPOSIT:.2f} TK।\n\nBkash/Nagad (Send Money): `{config.BKASH_NUMBER}`\nটাকা পাঠিয়ে Transaction ID সহ এভাবে লিখুন:\n`TX123ABC 500`", parse_mode='Markdown')
     elif data == 'withdraw':
-        user = await db.get_user(user_id)
+        user = await storage.backend.get_user(user_id)
         if user['balance'] < config.MINIMUM_WITHDRAWAL: return await query.message.reply_text(f'ন্যূনতম উইথড্র {config.MINIMUM_WITHDRAWAL:.2f} টাকা।')
-        await db.set_user_state(user_id, 'awaiting_withdraw_amount')
+        conversation.store.set(user_id, 'awaiting_withdraw_amount')
         await query.message.reply_text('আপনি কত টাকা উইথড্র করতে চান?', reply_markup=CANCEL_KEYBOARD)
     elif data.startswith('w_method_'):
-        user = await db.get_user(user_id)
-        if user and user.get('state') == 'awaiting_withdraw_method':
+        conv = conversation.store.get(user_id)
+        if conv and conv.step == 'awaiting_withdraw_method':
             method = data.split('_')[-1]
-            saved_data = json.loads(user['state_data'])
-            saved_data['method'] = method
-            await db.set_user_state(user_id, 'awaiting_withdraw_account', json.dumps(saved_data))
+            conversation.store.set(user_id, 'awaiting_withdraw_account', amount=conv.amount, method=method)
             await query.message.edit_text(f'আপনার {method.capitalize()} নম্বরটি পাঠান।')
 
 async def handle_play_request(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    # ... (Unaltered matchmaking logic) ...
     query = update.callback_query; fee = float(query.data.split('_')[-1]); player1_id = query.from_user.id
-    player1 = await db.get_user(player1_id)
+    if fee not in config.FEE_TIERS and not (fee == 0 and storage.backend.setting('free_play_status') == 'on'):
+        return await query.message.reply_text("এই এন্ট্রি ফি এখন আর চালু নেই। আবার 🎮 Play 1v1 চাপুন।")
+    player1 = await storage.backend.get_user(player1_id)
     if not player1 or not await check_channel_member(update, context) or not player1.get('is_registered'): return await query.message.reply_text("ম্যাচ খেলার আগে /start করে রেজিস্ট্রেশন করুন ও চ্যানেলে যোগ দিন।")
     if fee > 0 and player1['balance'] < fee: return await query.message.reply_text('অপর্যাপ্ত ব্যালেন্স।')
-    if await db.get_from_queue(player1_id): return await query.message.reply_text("আপনি ইতিমধ্যে একটি ম্যাচ খুঁজছেন।")
-    async with db._lock:
-        opponent = await db.find_opponent_in_queue(fee, player1_id)
-        if opponent:
-            player2_id = opponent['user_id']; await db.remove_from_queue(player2_id)
-            match_id = await db.create_match(player1_id, player2_id, fee)
-            player2 = await db.get_user(player2_id)
-            try: await context.bot.delete_message(config.LOBBY_CHANNEL_ID, opponent['lobby_message_id'])
-            except: pass
-            p1_msg = f"প্রতিপক্ষ পাওয়া গেছে! আপনার ম্যাচ {player2.get('ingame_name')} এর সাথে।\n\nঅনুগ্রহ করে eFootball গেমে একটি Friend Match রুম তৈরি করে **রুম কোডটি এখানে পাঠান**।"
-            p2_msg = f"প্রতিপক্ষ পাওয়া গেছে! আপনার ম্যাচ {player1.get('ingame_name')} এর সাথে। রুম কোডের জন্য অপেক্ষা করুন।"
-            await context.bot.send_message(player1_id, p1_msg, reply_markup=CANCEL_KEYBOARD)
-            await db.set_user_state(player1_id, 'awaiting_room_code', match_id)
-            await context.bot.send_message(player2_id, p2_msg)
-            await query.message.edit_text("✅ প্রতিপক্ষ পাওয়া গেছে! আপনাকে ব্যক্তিগত চ্যাটে বিস্তারিত জানানো হয়েছে।")
-        else:
-            fee_text = f"**এন্ট্রি ফি:** {fee:.2f} TK" if fee > 0 else "**ধরন:** Fun Match (Free)"
-            lobby_text = (f"🔥 **নতুন চ্যালেঞ্জ!** 🔥\n\n**প্লেয়ার:** {player1.get('ingame_name')} (ELO: {player1.get('elo_rating', 1000)})\n{fee_text}")
-            try:
-                lobby_message = await context.bot.send_message(config.LOBBY_CHANNEL_ID, lobby_text, parse_mode='Markdown')
-                await db.add_to_queue(player1_id, fee, lobby_message.message_id)
-                await query.message.edit_text("আপনার চ্যালেঞ্জটি ম্যাচ লবিতে পোস্ট করা হয়েছে।", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("❌ বাতিল করুন", callback_data=f"cancel_{player1_id}")]]))
-            except Exception as e:
-                logger.error(f"Failed to post to lobby: {e}", exc_info=True)
-                await query.message.edit_text("লবিতে পোস্ট করা সম্ভব হচ্ছে না।")
+    if tournament.engine.playing(player1_id): return await query.message.reply_text("আপনি একটি টুর্নামেন্টে আছেন; সেটি শেষ না হওয়া পর্যন্ত 1v1 খেলা যাবে না।")
+    try: opponent = await matchmaking.engine.pair_or_enqueue(player1_id, fee)
+    except matchmaking.AlreadyQueued: return await query.message.reply_text("আপনি ইতিমধ্যে একটি ম্যাচ খুঁজছেন।")
+    if opponent:
+        player2_id = opponent['user_id']
+        try: match_id = await storage.backend.create_match_from_queue(player1_id, player2_id, fee)
+        except Exception as e:
+            # Nothing was written; the opponent keeps their place (and their queue row) and waits on.
+            logger.error(f"Failed to create a match for {player1_id} and {player2_id}: {e}", exc_info=True)
+            await matchmaking.engine.requeue(opponent)
+            return await query.message.edit_text("ম্যাচ তৈরি করা সম্ভব হয়নি। অনুগ্রহ করে আবার চেষ্টা করুন।")
+        player2 = await storage.backend.get_user(player2_id)
+        await lobby.board.left(context.bot, opponent)
+        p1_msg = f"প্রতিপক্ষ পাওয়া গেছে! আপনার ম্যাচ {player2.get('ingame_name')} এর সাথে।\n\nঅনুগ্রহ করে eFootball গেমে একটি Friend Match রুম তৈরি করে **রুম কোডটি এখানে পাঠান**।"
+        p2_msg = f"প্রতিপক্ষ পাওয়া গেছে! আপনার ম্যাচ {player1.get('ingame_name')} এর সাথে। রুম কোডের জন্য অপেক্ষা করুন।"
+        conversation.store.set(player1_id, 'awaiting_room_code', match_id=match_id)
+        outbound.pipeline.send(context.bot.send_message, player1_id, p1_msg, reply_markup=CANCEL_KEYBOARD, lane=outbound.CRITICAL)
+        outbound.pipeline.send(context.bot.send_message, player2_id, p2_msg, lane=outbound.CRITICAL)
+        await query.message.edit_text("✅ প্রতিপক্ষ পাওয়া গেছে! আপনাকে ব্যক্তিগত চ্যাটে বিস্তারিত জানানো হয়েছে।")
+    else:
+        try:
+            if not await lobby.board.joined(context.bot, player1, fee): return
+            await query.message.edit_text("আপনার চ্যালেঞ্জটি ম্যাচ লবিতে পোস্ট করা হয়েছে।", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("❌ বাতিল করুন", callback_data=f"cancel_{player1_id}")]]))
+        except Exception as e:
+            logger.error(f"Failed to post to lobby: {e}", exc_info=True)
+            if matchmaking.engine.remove(player1_id): await storage.backend.remove_from_queue(player1_id)
+            await query.message.edit_text("লবিতে পোস্ট করা সম্ভব হচ্ছে না।")
 
 async def play_1v1_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """'Play 1v1' মেন্যু তৈরি করে এবং ডাটাবেস থেকে ফ্রি-প্লে স্ট্যাটাস চেক করে।"""
@@ -269,25 +298,21 @@ async def play_1v1_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return await update.message.reply_text("অনুগ্রহ করে চ্যানেলে যোগ দিন এবং /start করে রেজিস্ট্রেশন সম্পন্ন করুন।")
     
     kb = []
-    free_play_status = await db.get_setting('free_play_status')
-    if free_play_status == 'on':
+    if storage.backend.setting('free_play_status') == 'on':
         kb.append([InlineKeyboardButton('🎮 Fun Match (Free)', callback_data='play_fee_0')])
     
-    kb.extend([
-        [InlineKeyboardButton(f'{fee} TK', callback_data=f'play_fee_{fee}') for fee in [20, 30, 50]],
-        [InlineKeyboardButton(f'{fee} TK', callback_data=f'play_fee_{fee}') for fee in [100, 200, 500]]
-    ])
+    tiers = config.FEE_TIERS
+    kb.extend([InlineKeyboardButton(f'{fee} TK', callback_data=f'play_fee_{fee}') for fee in tiers[i:i + 3]] for i in range(0, len(tiers), 3))
     await update.effective_message.reply_text('ম্যাচের ধরন বা এন্ট্রি ফি নির্বাচন করুন:', reply_markup=InlineKeyboardMarkup(kb))
 
-# ... (Unaltered functions: cancel_search, admin_resolve_match, share_menu, wallet_menu, check_match_timeout, show_profile, show_leaderboard, result_command) ...
+# ... (Unaltered functions: cancel_search, admin_resolve_match, share_menu, wallet_menu, show_profile, show_leaderboard, result_command) ...
 async def cancel_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query; user_id = int(query.data.split('_')[-1])
     if query.from_user.id != user_id: return await query.answer("এটি আপনার চ্যালেঞ্জ নয়।", show_alert=True)
-    challenge_data = await db.get_from_queue(user_id)
+    challenge_data = matchmaking.engine.remove(user_id)
     if challenge_data:
-        await db.remove_from_queue(user_id)
-        try: await context.bot.delete_message(chat_id=config.LOBBY_CHANNEL_ID, message_id=challenge_data['lobby_message_id'])
-        except: pass
+        await storage.backend.remove_from_queue(user_id)
+        await lobby.board.left(context.bot, challenge_data)
         await query.message.edit_text("আপনার ম্যাচ খোঁজা বাতিল করা হয়েছে।")
     else: await query.message.edit_text("আপনি কোনো ম্যাচ খুঁজছেন না।")
 
@@ -297,7 +322,7 @@ async def handle_ban_callback(update: Update, context: ContextTypes.DEFAULT_TYPE
     if query.from_user.id not in config.ADMINS:
         return await query.answer("অনুমতি নেই।", show_alert=True)
     target_user_id = int(query.data.split('_')[-1])
-    await db.update_user_fields(target_user_id, {'is_banned': 1})
+    await storage.backend.update_user_fields(target_user_id, {'is_banned': 1})
     await query.edit_message_text(f"✅ ব্যবহারকারী {target_user_id} ব্যান করা হয়েছে।")
 
 async def handle_setbalance_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -306,7 +331,7 @@ async def handle_setbalance_callback(update: Update, context: ContextTypes.DEFAU
     if query.from_user.id not in config.ADMINS:
         return await query.answer("অনুমতি নেই।", show_alert=True)
     target_user_id = int(query.data.split('_')[-1])
-    await db.set_user_state(query.from_user.id, 'admin_setbal_amount', str(target_user_id))
+    conversation.store.set(query.from_user.id, 'admin_setbal_amount', target_id=target_user_id)
     await query.message.reply_text("নতুন ব্যালেন্স পরিমাণ লিখুন:")
 
 async def admin_resolve_match(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -314,22 +339,43 @@ async def admin_resolve_match(update: Update, context: ContextTypes.DEFAULT_TYPE
     if query.from_user.id not in config.ADMINS: return
     try:
         _, _, match_id, winner_id_str = query.data.split('_'); winner_id = int(winner_id_str)
-        match = await db.get_match(match_id)
-        if match and match['status'] != 'completed':
-            success = await db.resolve_match(match_id, winner_id)
+        match = await storage.backend.get_match(match_id)
+        if match and match['status'] == 'in_progress':
+            success = await storage.backend.resolve_match(match_id, winner_id)
             if success:
+                timeouts.scheduler.cancel(match_id)
                 loser_id = match['player2_id'] if winner_id == match['player1_id'] else match['player1_id']
-                winner_user = await db.get_user(winner_id)
-                await context.bot.send_message(winner_id, "অভিনন্দন! আপনি ম্যাচটি জিতেছেন।")
-                await context.bot.send_message(loser_id, "দুঃখিত, আপনি ম্যাচটি হেরে গেছেন।")
-                final_caption = f"✅ ম্যাচ {match_id} সমাধান করা হয়েছে।\nবিজয়ী: {winner_user.get('ingame_name', winner_id)}"
-                await query.edit_message_caption(caption=final_caption, reply_markup=None)
-        else: await query.edit_message_caption(caption="⚠️ এই ম্যাচটি ইতিমধ্যে সমাধান করা হয়েছে।", reply_markup=None)
+                winner_user = await storage.backend.get_user(winner_id)
+                outbound.pipeline.send(context.bot.send_message, winner_id, "অভিনন্দন! আপনি ম্যাচটি জিতেছেন।", lane=outbound.CRITICAL)
+                outbound.pipeline.send(context.bot.send_message, loser_id, "দুঃখিত, আপনি ম্যাচটি হেরে গেছেন।", lane=outbound.CRITICAL)
+                final_text = f"✅ ম্যাচ {match_id} সমাধান করা হয়েছে।\nবিজয়ী: {winner_user.get('ingame_name', winner_id)}"
+                review.queue.close(context.bot, match_id, final_text, skip_chat=query.message.chat_id)
+                tournament.engine.matches_finished([match_id])
+                await query.edit_message_text(final_text, reply_markup=None)
+        else: await query.edit_message_text("⚠️ এই ম্যাচটি ইতিমধ্যে সমাধান বা বাতিল করা হয়েছে।", reply_markup=None)
     except Exception as e:
         logger.error(f"Error in admin_resolve_match: {e}", exc_info=True)
-        try: await query.edit_message_caption(caption="❌ একটি ত্রুটি ঘটেছে।", reply_markup=None)
+        try: await query.edit_message_text("❌ একটি ত্রুটি ঘটেছে।", reply_markup=None)
         except: pass
 
+async def reviews_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """রিভিউয়ের অপেক্ষায় থাকা ম্যাচগুলো দেখায়।"""
+    if update.effective_user.id not in config.ADMINS: return await update.message.reply_text("এই কমান্ডটি শুধুমাত্র অ্যাডমিনদের জন্য।")
+    matches = await review.queue.pending(10)
+    if not matches: return await update.message.reply_text("✅ কোনো ম্যাচ রিভিউয়ের অপেক্ষায় নেই।")
+    lines = [f"• `{m['match_id']}` — {m['fee']:.2f} TK, {datetime.fromtimestamp(m['created_at']).strftime('%d/%m %H:%M')}" for m in matches]
+    kb = [[InlineKeyboardButton(f"🔍 {m['match_id']}", callback_data=f"review_show_{m['match_id']}")] for m in matches]
+    await update.message.reply_text("🧾 **রিভিউয়ের অপেক্ষায়:**\n\n" + "\n".join(lines), parse_mode='Markdown', reply_markup=InlineKeyboardMarkup(kb))
+
+async def show_review_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    if query.from_user.id not in config.ADMINS: return
+    match = await storage.backend.get_match(query.data[len('review_show_'):])
+    if not match or match['status'] != 'in_progress' or not (match['p1_screenshot_id'] and match['p2_screenshot_id']):
+        return await query.message.reply_text("⚠️ এই ম্যাচটি আর রিভিউয়ের অপেক্ষায় নেই।")
+    p1, p2 = await asyncio.gather(storage.backend.get_user(match['player1_id']), storage.backend.get_user(match['player2_id']))
+    review.queue.dispatch(context.bot, match, p1, p2, admins=[query.from_user.id])
+
 async def share_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = await ensure_user(update)
     share_link = f"https://t.me/{config.BOT_USERNAME}?start=ref_{user['user_id']}"
@@ -339,35 +385,16 @@ async def wallet_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = await ensure_user(update)
     kb = [[InlineKeyboardButton('➕ Deposit', callback_data='deposit'), InlineKeyboardButton('➖ Withdraw', callback_data='withdraw')]]
     await update.effective_message.reply_text(f'আপনার ব্যালেন্স: {user.get("balance", 0):.2f} TK', reply_markup=InlineKeyboardMarkup(kb))
-async def check_match_timeout(context: ContextTypes.DEFAULT_TYPE):
-    match_id = context.job.data['match_id']; match = await db.get_match(match_id)
-    if not match or match['status'] != 'in_progress': return
-    p1, p2 = match['player1_id'], match['player2_id']
-    ss1, ss2 = match.get('p1_screenshot_id'), match.get('p2_screenshot_id')
-    winner, loser = (None, None)
-    if ss1 and not ss2: winner, loser = p1, p2
-    elif ss2 and not ss1: winner, loser = p2, p1
-    if winner:
-        await db.resolve_match(match_id, winner)
-        await context.bot.send_message(winner, f"প্রতিপক্ষ ফলাফল না দেওয়ায় আপনি বিজয়ী হয়েছেন।")
-        await context.bot.send_message(loser, f"ফলাফল না দেওয়ায় আপনি পরাজিত হয়েছেন।")
-    else: 
-        refund_msg = "এটি একটি ফ্রি ম্যাচ ছিল।"
-        if match['fee'] > 0:
-            await db.adjust_balance(p1, match['fee'], 'refund', f'Match {match_id} cancelled (timeout)')
-            await db.adjust_balance(p2, match['fee'], 'refund', f'Match {match_id} cancelled (timeout)')
-            refund_msg = "আপনার ফি ফেরত দেওয়া হয়েছে।"
-        await db.cancel_match(match_id)
-        await context.bot.send_message(p1, f"ম্যাচ ({match_id}) বাতিল কারণ কোনো ফলাফল পাওয়া যায়নি। {refund_msg}")
-        await context.bot.send_message(p2, f"ম্যাচ ({match_id}) বাতিল কারণ কোনো ফলাফল পাওয়া যায়নি। {refund_msg}")
 async def show_profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = await ensure_user(update)
     if not user or not await check_channel_member(update, context): return
     txt = (f"👤 **প্রোফাইল**\n\n**IGN:** {user.get('ingame_name') or 'N/A'}\n**Balance:** {user.get('balance', 0):.2f} TK\n**Skill Rating (ELO):** {user.get('elo_rating', 1000)} 🎖️\n**Wins/Losses:** {user.get('wins',0)}/{user.get('losses',0)}")
+    rank = leaderboard.board.rank(user['user_id'])
+    if rank: txt += f"\n**Rank:** #{rank[0]:,} / {rank[1]:,}"
     await update.effective_message.reply_text(txt, parse_mode='Markdown')
 async def show_leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await check_channel_member(update, context): return
-    rows = await db.get_top_wins(10)
+    rows = leaderboard.board.top(10)
     text = '🏆 **লিডারবোর্ড (Skill Rating অনুযায়ী)** 🏆\n\n'
     text += '\n'.join([f"**{i+1}.** {r['ingame_name'] or r['username']} — **{r['elo_rating']} ELO** ({r['wins']} wins)" for i,r in enumerate(rows)])
     await update.effective_message.reply_text(text, parse_mode='Markdown')
@@ -376,16 +403,16 @@ async def result_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not user or not context.args: return await update.message.reply_text("ব্যবহার: /result <match_id>")
     try:
         match_id = context.args[0].strip()
-        match = await db.get_match(match_id)
+        match = await storage.backend.get_match(match_id)
         if not match or user['user_id'] not in [match['player1_id'], match['player2_id']]: return await update.message.reply_text("অবৈধ ম্যাচ আইডি।")
         if match['status'] != 'in_progress': return await update.message.reply_text("এই ম্যাচের ফলাফল ইতিমধ্যে প্রক্রিয়া করা হয়েছে।")
-        await db.set_user_state(user['user_id'], 'awaiting_screenshot', match_id)
+        conversation.store.set(user['user_id'], 'awaiting_screenshot', match_id=match_id)
         await update.message.reply_text("আপনার জেতার একটি স্পষ্ট স্ক্রিনশট পাঠান।", reply_markup=CANCEL_KEYBOARD)
     except Exception as e: await update.message.reply_text(f"একটি ত্রুটি ঘটেছে: {e}")
 
 # --- NEW/UPDATED Commands for Rules & Free Play ---
 async def rules_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    rules_text = await db.get_setting('rules_text')
+    rules_text = storage.backend.setting('rules_text')
     if rules_text:
         await update.message.reply_text(rules_text, parse_mode='Markdown')
     else:
@@ -396,72 +423,289 @@ async def set_rules_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if user_id not in config.ADMINS: return await update.message.reply_text("এই কমান্ডটি শুধুমাত্র অ্যাডমিনদের জন্য।")
     if not context.args: return await update.message.reply_text("ব্যবহার: /setrules <আপনার নতুন নিয়মাবলী>")
     new_rules = " ".join(context.args)
-    await db.set_setting('rules_text', new_rules)
+    await storage.backend.set_setting('rules_text', new_rules)
     await update.message.reply_text("✅ নিয়মাবলী সফলভাবে আপডেট করা হয়েছে।")
 
 async def free_play_on_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     if user_id not in config.ADMINS: return await update.message.reply_text("এই কমান্ডটি শুধুমাত্র অ্যাডমিনদের জন্য।")
     
-    await db.set_setting('free_play_status', 'on')
+    await storage.backend.set_setting('free_play_status', 'on')
+    if not storage.backend.persistent: return await update.message.reply_text("✅ ফ্রি-প্লে মোড চালু করা হয়েছে। (এই স্টোরেজে ব্রডকাস্ট নেই, নোটিফিকেশন পাঠানো হয়নি।)")
     await update.message.reply_text("✅ ফ্রি-প্লে মোড চালু করা হয়েছে। সকল ব্যবহারকারীকে নোটিফিকেশন পাঠানো হচ্ছে...")
 
-    all_user_ids = await db.get_all_user_ids()
-    notification_text = "🎉 সুসংবাদ! আমাদের বটে এখন ফ্রি ম্যাচ খেলার সুবিধা চালু করা হয়েছে। আপনার স্কিল পরীক্ষা করুন এবং ELO রেটিং বাড়ান!"
-    for uid in all_user_ids:
-        try:
-            await context.bot.send_message(chat_id=uid, text=notification_text)
-            await asyncio.sleep(0.1) # To avoid hitting Telegram API rate limits
-        except (Forbidden, BadRequest):
-            logger.warning(f"User {uid} has blocked the bot or chat not found. Skipping.")
-        except Exception as e:
-            logger.error(f"Failed to send notification to {uid}: {e}")
-    
-    await update.message.reply_text(f"✅ {len(all_user_ids)} জন ব্যবহারকারীকে নোটিফিকেশন পাঠানো সম্পন্ন হয়েছে।")
+    notification_text = "🎉 সুসংবাদ! আমাদের বটে এখন ফ্রি ম্যাচ খেলার সুবিধা চালু করা হয়েছে। আপনার স্কিল পরীক্ষা করুন এবং ELO রেটিং বাড়ান!"
+    campaign_id = await broadcast.engine.start(context.bot, notification_text, user_id)
+    await update.message.reply_text(f"📢 নোটিফিকেশন ক্যাম্পেইন #{campaign_id} শুরু হয়েছে। অগ্রগতি: /broadcast_status {campaign_id}")
 
 async def free_play_off_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     if user_id not in config.ADMINS: return await update.message.reply_text("এই কমান্ডটি শুধুমাত্র অ্যাডমিনদের জন্য।")
-    await db.set_setting('free_play_status', 'off')
+    await storage.backend.set_setting('free_play_status', 'off')
     await update.message.reply_text("✅ ফ্রি-প্লে মোড সফলভাবে বন্ধ করা হয়েছে।")
 
+async def set_config_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """রিস্টার্ট ছাড়াই কনফিগ পরিবর্তন: `/setconfig MINIMUM_DEPOSIT 100`, `/setconfig FEE_TIERS 20 50 100`, `/setconfig MINIMUM_DEPOSIT reset`।"""
+    if update.effective_user.id not in config.ADMINS: return await update.message.reply_text("এই কমান্ডটি শুধুমাত্র অ্যাডমিনদের জন্য।")
+    if not context.args:
+        current = '\n'.join(f"{name} = {getattr(config, name)}" + (" (পরিবর্তিত)" if storage.backend.setting(name) is not None else "") for name in db.CONFIG_OVERRIDES)
+        return await update.message.reply_text(f"ব্যবহার: /setconfig <নাম> <মান|reset>\n\n{current}")
+    name = context.args[0].upper(); value = " ".join(context.args[1:])
+    if name not in db.CONFIG_OVERRIDES: return await update.message.reply_text(f"❌ অজানা নাম। পরিবর্তনযোগ্য: {', '.join(db.CONFIG_OVERRIDES)}")
+    if not value: return await update.message.reply_text(f"{name} = {getattr(config, name)}")
+    try: await storage.backend.set_setting(name, None if value.lower() == 'reset' else value)
+    except ValueError: return await update.message.reply_text(f"❌ {name} এর জন্য মানটি সঠিক নয়: {value}")
+    await update.message.reply_text(f"✅ {name} = {getattr(config, name)}")
+
 # --- Admin Helper Commands (Unaltered) ---
-async def approve_deposit(update: Update, context: ContextTypes.DEFAULT_TYPE):
+# --- Deposit/withdrawal review (single ids, lists and ranges) ---
+SETTLE_LABELS = {('deposit', 'approve'): 'ডিপোজিট অনুমোদিত', ('deposit', 'reject'): 'ডিপোজিট বাতিল',
+                 ('withdrawal', 'approve'): 'উইথড্র অনুমোদিত', ('withdrawal', 'reject'): 'উইথড্র বাতিল (টাকা ফেরত)'}
+SETTLE_NOTICES = {('deposit', 'approve'): "আপনার {amount:.2f} TK ডিপোজিট সফল হয়েছে।",
+                  ('deposit', 'reject'): "আপনার {amount:.2f} TK ডিপোজিট অনুরোধ বাতিল করা হয়েছে।",
+                  ('withdrawal', 'approve'): "আপনার {amount:.2f} TK উইথড্র সফল হয়েছে।",
+                  ('withdrawal', 'reject'): "আপনার {amount:.2f} TK উইথড্র অনুরোধ বাতিল করা হয়েছে।"}
+
+def parse_ids(args):
+    """`12 15-20,31` -> [12, 15, ..., 20, 31]; ValueError if malformed or more than BULK_MAX_IDS."""
+    ids = set()
+    for token in re.split(r'[\s,]+', ' '.join(args).strip()):
+        if not token: continue
+        first, _, last = token.partition('-')
+        first, last = int(first), int(last or first)
+        if first > last or last - first >= config.BULK_MAX_IDS: raise ValueError(token)
+        ids.update(range(first, last + 1))
+        if len(ids) > config.BULK_MAX_IDS: raise ValueError(token)
+    if not ids: raise ValueError('no ids')
+    return sorted(ids)
+
+def format_ids(ids):
+    """[12, 15, 16, 17, 31] -> '#12, #15-17, #31'."""
+    ids = sorted(ids); parts = []; i = 0
+    while i < len(ids):
+        j = i
+        while j + 1 < len(ids) and ids[j + 1] == ids[j] + 1: j += 1
+        parts.append(f"#{ids[i]}" if i == j else f"#{ids[i]}-{ids[j]}"); i = j + 1
+    return ', '.join(parts)
+
+async def settle(bot, kind, action, req_ids):
+    """Settles the requests in one transaction, then queues every user's notice; returns the admin summary."""
+    settled = await storage.backend.settle_requests(kind, action, req_ids)
+    for r in settled: outbound.pipeline.send(bot.send_message, r['user_id'], SETTLE_NOTICES[(kind, action)].format(amount=r['amount']))
+    done = {r['id'] for r in settled}; skipped = [i for i in req_ids if i not in done]
+    text = f"✅ {SETTLE_LABELS[(kind, action)]}: {len(settled)} টি, মোট {sum(r['amount'] for r in settled):.2f} TK"
+    if settled: text += f"\n{format_ids(done)}"
+    if skipped: text += f"\n⚠️ পাওয়া যায়নি বা ইতিমধ্যে প্রক্রিয়াকৃত: {format_ids(skipped)}"
+    return text
+
+async def _settle_command(update, context, kind, action, command):
     if update.effective_user.id not in config.ADMINS or not context.args: return
-    try:
-        req_id = int(context.args[0]); req = await db.get_deposit_request(req_id)
-        if not req or req['status'] != 'pending': return await update.message.reply_text("অনুরোধ পাওয়া যায়নি বা ইতিমধ্যে প্রক্রিয়াকৃত।")
-        await db.adjust_balance(req['user_id'], req['amount'], 'deposit', f'Deposit ID {req_id}')
-        await db.update_deposit_status(req_id, 'approved')
-        await update.message.reply_text(f"ডিপোজিট #{req_id} অনুমোদিত হয়েছে।")
-        await context.bot.send_message(req['user_id'], f"আপনার {req['amount']:.2f} TK ডিপোজিট সফল হয়েছে।")
-    except: await update.message.reply_text("ব্যবহার: /approve_deposit <id>")
+    try: req_ids = parse_ids(context.args)
+    except ValueError: return await update.message.reply_text(f"ব্যবহার: /{command} <id> [id ...] (যেমন: 12 15-20,31; সর্বোচ্চ {config.BULK_MAX_IDS}টি)")
+    await update.message.reply_text(await settle(context.bot, kind, action, req_ids))
+
+async def approve_deposit(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await _settle_command(update, context, 'deposit', 'approve', 'approve_deposit')
+async def reject_deposit(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await _settle_command(update, context, 'deposit', 'reject', 'reject_deposit')
 async def approve_withdrawal(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if update.effective_user.id not in config.ADMINS or not context.args: return
-    try:
-        req_id = int(context.args[0]); req = await db.get_withdrawal_request(req_id)
-        if not req or req['status'] != 'pending': return await update.message.reply_text("অনুরোধ পাওয়া যায়নি।")
-        await db.update_withdrawal_status(req_id, 'approved')
-        await update.message.reply_text(f"উইথড্র #{req_id} অনুমোদিত হয়েছে।") 
-        await context.bot.send_message(req['user_id'], f"আপনার {req['amount']:.2f} TK উইথড্র সফল হয়েছে।")
-    except: await update.message.reply_text("ব্যবহার: /approve_withdrawal <id>")
+    await _settle_command(update, context, 'withdrawal', 'approve', 'approve_withdrawal')
 async def reject_withdrawal(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if update.effective_user.id not in config.ADMINS or not context.args: return
-    try:
-        req_id = int(context.args[0]); req = await db.get_withdrawal_request(req_id)
-        if not req or req['status'] != 'pending': return await update.message.reply_text("অনুরোধ পাওয়া যায়নি।")
-        await db.adjust_balance(req['user_id'], req['amount'], 'withdrawal_rejected', f'Withdrawal ID {req_id} rejected')
-        await db.update_withdrawal_status(req_id, 'rejected')
-        await update.message.reply_text(f"উইথড্র #{req_id} বাতিল করা হয়েছে এবং টাকা ফেরত দেওয়া হয়েছে।") 
-        await context.bot.send_message(req['user_id'], f"আপনার {req['amount']:.2f} TK উইথড্র অনুরোধ বাতিল করা হয়েছে।")
-    except: await update.message.reply_text("ব্যবহার: /reject_withdrawal <id>")
+    await _settle_command(update, context, 'withdrawal', 'reject', 'reject_withdrawal')
+
+# /pending: one page of requests with toggle buttons; the selection survives paging until it is settled.
+# Callback data: pend_<op>_<kind>_<page>[_<id>], op = p (show), t (toggle), s (select page), c (clear), a/r (approve/reject selected)
+_pending_selection = {}  # admin_id -> (kind, set of selected request ids)
+
+async def _render_pending(admin_id, kind, page):
+    rows, total = await storage.backend.get_pending_requests(kind, page * config.PENDING_PAGE_SIZE, config.PENDING_PAGE_SIZE)
+    pages = max(1, -(-total // config.PENDING_PAGE_SIZE))
+    if not rows and page:  # the page emptied since it was shown
+        page = pages - 1
+        rows, total = await storage.backend.get_pending_requests(kind, page * config.PENDING_PAGE_SIZE, config.PENDING_PAGE_SIZE)
+    selected = _pending_selection.get(admin_id, (kind, set()))[1]
+    title = 'ডিপোজিট' if kind == 'deposit' else 'উইথড্র'
+    lines = [f"⏳ অপেক্ষমাণ {title}: {total} টি (পেজ {page + 1}/{pages}, নির্বাচিত {len(selected)})\n"]
+    kb = []
+    for r in rows:
+        detail = f"TxID {r['txid']}" if kind == 'deposit' else f"{r['method']} {r['account_number']}"
+        lines.append(f"#{r['id']} · {r['user_id']} · {r['amount']:.2f} TK · {detail}")
+        kb.append([InlineKeyboardButton(f"{'✅' if r['id'] in selected else '⬜'} #{r['id']} · {r['amount']:.2f} TK", callback_data=f"pend_t_{kind}_{page}_{r['id']}")])
+    if not rows: lines.append("কোনো অপেক্ষমাণ অনুরোধ নেই।")
+    nav = [InlineKeyboardButton("◀️", callback_data=f"pend_p_{kind}_{page - 1}")] if page else []
+    nav.append(InlineKeyboardButton("🔄", callback_data=f"pend_p_{kind}_{page}"))
+    if page + 1 < pages: nav.append(InlineKeyboardButton("▶️", callback_data=f"pend_p_{kind}_{page + 1}"))
+    kb.append(nav)
+    if rows: kb.append([InlineKeyboardButton("☑️ এই পেজ", callback_data=f"pend_s_{kind}_{page}"), InlineKeyboardButton("✖️ নির্বাচন মুছুন", callback_data=f"pend_c_{kind}_{page}")])
+    if selected: kb.append([InlineKeyboardButton(f"✅ অনুমোদন ({len(selected)})", callback_data=f"pend_a_{kind}_{page}"), InlineKeyboardButton(f"❌ বাতিল ({len(selected)})", callback_data=f"pend_r_{kind}_{page}")])
+    return "\n".join(lines), InlineKeyboardMarkup(kb)
+
+async def pending_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """অপেক্ষমাণ ডিপোজিট/উইথড্র পেজ আকারে দেখায়: `/pending` বা `/pending withdrawal`।"""
+    admin_id = update.effective_user.id
+    if admin_id not in config.ADMINS: return await update.message.reply_text("এই কমান্ডটি শুধুমাত্র অ্যাডমিনদের জন্য।")
+    kind = 'withdrawal' if context.args and context.args[0].lower().startswith('w') else 'deposit'
+    _pending_selection[admin_id] = (kind, set())
+    text, markup = await _render_pending(admin_id, kind, 0)
+    await update.message.reply_text(text, reply_markup=markup)
+
+async def pending_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query; admin_id = query.from_user.id
+    if admin_id not in config.ADMINS: return
+    _, op, kind, page, *rest = query.data.split('_'); page = int(page)
+    if kind not in db.REQUEST_TABLES: return
+    selection = _pending_selection.get(admin_id)
+    if selection is None or selection[0] != kind: selection = _pending_selection[admin_id] = (kind, set())
+    selected = selection[1]
+    if op == 't': selected.symmetric_difference_update({int(rest[0])})
+    elif op == 's':
+        rows, _ = await storage.backend.get_pending_requests(kind, page * config.PENDING_PAGE_SIZE, config.PENDING_PAGE_SIZE)
+        selected.update(r['id'] for r in rows)
+    elif op == 'c': selected.clear()
+    elif op in ('a', 'r') and selected:
+        req_ids = sorted(selected); selected.clear()
+        await query.message.reply_text(await settle(context.bot, kind, 'approve' if op == 'a' else 'reject', req_ids))
+    text, markup = await _render_pending(admin_id, kind, page)
+    try: await query.message.edit_text(text, reply_markup=markup)
+    except BadRequest as e:
+        if 'not modified' not in str(e): raise
+
 async def backup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """সর্বশেষ স্ন্যাপশট পাঠায়; `/backup now` নতুন স্ন্যাপশট নিয়ে পাঠায়।"""
     user_id = update.effective_user.id
     if user_id not in config.ADMINS: return await update.message.reply_text("এই কমান্ডটি শুধুমাত্র অ্যাডমিনদের জন্য।")
+    if not storage.backend.persistent: return await update.message.reply_text(SQLITE_ONLY_REPLY)
+    try:
+        path = backup.latest_snapshot()
+        if path is None or (context.args and context.args[0] == 'now'):
+            await update.message.reply_text("⏳ নতুন স্ন্যাপশট নেওয়া হচ্ছে...")
+            path = await backup.snapshot()
+        taken = datetime.fromtimestamp(os.path.getmtime(path)).strftime('%Y-%m-%d %H:%M:%S')
+        data = await asyncio.to_thread(Path(path).read_bytes)
+        await context.bot.send_document(chat_id=user_id, document=data, filename=os.path.basename(path), caption=f"✅ ডাটাবেস ব্যাকআপ ({taken})")
+    except Exception as e:
+        logger.error(f"Error in backup_command: {e}", exc_info=True)
+        await update.message.reply_text(f"❌ একটি ত্রুটি ঘটেছে: {e}")
+
+async def archive_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """পুরোনো মাসের লেজার ও শেষ হওয়া ম্যাচ এখনই আর্কাইভে সরায়।"""
+    if update.effective_user.id not in config.ADMINS: return await update.message.reply_text("এই কমান্ডটি শুধুমাত্র অ্যাডমিনদের জন্য।")
+    if not storage.backend.persistent: return await update.message.reply_text(SQLITE_ONLY_REPLY)
+    await update.message.reply_text("⏳ আর্কাইভ চলছে...")
+    try: moved = await archive.run()
+    except Exception as e:
+        logger.error(f"Error in archive_command: {e}", exc_info=True)
+        return await update.message.reply_text(f"❌ ত্রুটি: {e}")
+    segments = await db.run_db(db.get_archive_segments_sync)
+    await update.message.reply_text(f"✅ {moved['transactions']} লেনদেন ও {moved['matches']} ম্যাচ আর্কাইভ করা হয়েছে ({datetime.fromtimestamp(archive.cutoff()).strftime('%Y-%m')} এর আগের)।\nমোট সেগমেন্ট: {len(segments)}")
+
+async def audit_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """ব্যবহারকারীর ব্যালেন্স লেজারের (আর্কাইভ চেকপয়েন্ট + বর্তমান লেনদেন) সাথে মেলায়।"""
+    if update.effective_user.id not in config.ADMINS: return await update.message.reply_text("এই কমান্ডটি শুধুমাত্র অ্যাডমিনদের জন্য।")
+    try: target_user_id = int(context.args[0])
+    except (IndexError, ValueError): return await update.message.reply_text("ব্যবহার: /audit <user_id>")
+    a = await storage.backend.audit_user(target_user_id)
+    if a['balance'] is None: return await update.message.reply_text("এই ব্যবহারকারী পাওয়া যায়নি।")
+    diff = a['balance'] - a['ledger_total']
+    await update.message.reply_text(
+        f"🧾 ব্যবহারকারী {target_user_id}\n"
+        f"আর্কাইভ ({a['archived_through'] or '—'} পর্যন্ত, {a['archived_count']} লেনদেন): {a['archived_total']:.2f} TK\n"
+        f"বর্তমান লেজার ({a['hot_count']} লেনদেন): {a['hot_total']:.2f} TK\n"
+        f"লেজার মোট: {a['ledger_total']:.2f} TK | ব্যালেন্স: {a['balance']:.2f} TK\n"
+        + ("✅ মিলেছে" if abs(diff) < 0.005 else f"⚠️ পার্থক্য {diff:+.2f} TK (সরাসরি ব্যালেন্স সেট বা লেজারের বাইরের পরিবর্তন)"))
+
+ELO_REPLAY_OPTIONS = {'k': ('k_factor', float), 'pk': ('provisional_k', float), 'pg': ('provisional_games', int)}
+
+async def elo_replay_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """পুরো ম্যাচ ইতিহাস থেকে সবার ELO পুনর্গণনা: `/elo_replay [k=32] [pk=48 pg=10] [exclude=id,id] [apply]`; apply ছাড়া শুধু রিপোর্ট।"""
+    if update.effective_user.id not in config.ADMINS: return await update.message.reply_text("এই কমান্ডটি শুধুমাত্র অ্যাডমিনদের জন্য।")
+    if not storage.backend.persistent: return await update.message.reply_text(SQLITE_ONLY_REPLY)
+    options = {}; exclude = []; apply = False
     try:
-        await context.bot.send_document(chat_id=user_id, document=open(config.LOCAL_DB, 'rb'), caption=f"✅ ডাটাবেস ব্যাকআপ ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})")
-    except FileNotFoundError: await update.message.reply_text("❌ ডাটাবেস ফাইলটি খুঁজে পাওয়া যায়নি।")
-    except Exception as e: await update.message.reply_text(f"❌ একটি ত্রুটি ঘটেছে: {e}")
+        for arg in context.args:
+            name, _, value = arg.partition('=')
+            if arg == 'apply': apply = True
+            elif name == 'exclude': exclude += [m for m in value.split(',') if m]
+            else: key, convert = ELO_REPLAY_OPTIONS[name]; options[key] = convert(value)
+    except (KeyError, ValueError): return await update.message.reply_text("ব্যবহার: /elo_replay [k=32] [pk=48 pg=10] [exclude=match_id,...] [apply]")
+    await update.message.reply_text("⏳ ম্যাচ ইতিহাস রিপ্লে হচ্ছে...")
+    try: report = await db.run_db(elo_replay.run_sync, exclude, apply=apply, **options)
+    except Exception as e:
+        logger.error(f"Error in elo_replay_command: {e}", exc_info=True)
+        return await update.message.reply_text(f"❌ ত্রুটি: {e}")
+    changes = report['changes']; shown = changes if len(changes) <= 10 else changes[-5:][::-1] + changes[:5]
+    movers = '\n'.join(f"{user_id}: {old} → {new} ({new - old:+d})" for user_id, old, new in shown)
+    await update.message.reply_text(
+        f"{'✅ প্রয়োগ করা হয়েছে' if apply else '🔍 শুধু রিপোর্ট (প্রয়োগ করতে apply লিখুন)'}\n"
+        f"{report['matches']} ম্যাচ, {report['players']} খেলোয়াড়, {report['excluded']} বাদ; সময় {report['total_seconds']:.1f}s\n"
+        f"K={options.get('k_factor', config.ELO_K_FACTOR)}, প্রভিশনাল K={options.get('provisional_k', config.ELO_PROVISIONAL_K)} "
+        f"(প্রথম {options.get('provisional_games', config.ELO_PROVISIONAL_GAMES)} ম্যাচ)\n"
+        f"রেটিং বদল: {len(changes)} জন\n{movers}")
+
+# --- Tournaments (see tournament.py) ---
+TOURNAMENT_JOIN_REPLIES = {'joined': "✅ আপনি টুর্নামেন্টে যোগ দিয়েছেন। শুরু হলে প্রতিপক্ষের নাম এখানে পাবেন।", 'already': "আপনি ইতিমধ্যে এই টুর্নামেন্টে আছেন।",
+                           'full': "দুঃখিত, টুর্নামেন্টটি পূর্ণ।", 'closed': "এই টুর্নামেন্টের রেজিস্ট্রেশন বন্ধ।", 'balance': "অপর্যাপ্ত ব্যালেন্স।",
+                           'busy': "আপনি এখন 1v1 ম্যাচ খুঁজছেন, খেলছেন বা অন্য টুর্নামেন্টে আছেন। সেটি শেষ হলে যোগ দিন।"}
+
+def _tournament_line(t, players):
+    fee_text = f"{t['fee']:.2f} TK" if t['fee'] > 0 else "ফ্রি"
+    state = f"রেজিস্ট্রেশন চলছে, {players}/{t['max_players']} জন" if t['status'] == 'registering' else f"রাউন্ড {t['round']}/{t['rounds']}, {players} জন"
+    return f"#{t['id']} {t['name']} — {tournament.FORMATS[t['format']]}, এন্ট্রি ফি {fee_text} ({state})"
+
+def _tournament_keyboard(t):
+    return InlineKeyboardMarkup([[InlineKeyboardButton(f"🏆 যোগ দিন: {t['name']}", callback_data=f"tjoin_{t['id']}")]])
+
+async def tournaments_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """চলমান ও রেজিস্ট্রেশন চলা টুর্নামেন্টের তালিকা, যোগ দেওয়ার বাটনসহ।"""
+    open_tournaments = await storage.backend.get_open_tournaments()
+    if not open_tournaments: return await update.message.reply_text("এখন কোনো টুর্নামেন্ট নেই।")
+    counts = await asyncio.gather(*(storage.backend.get_tournament_players(t['id']) for t in open_tournaments))
+    kb = [row for t in open_tournaments if t['status'] == 'registering' for row in _tournament_keyboard(t).inline_keyboard]
+    await update.message.reply_text("🏆 টুর্নামেন্ট:\n\n" + "\n".join(_tournament_line(t, len(p)) for t, p in zip(open_tournaments, counts)),
+                                    reply_markup=InlineKeyboardMarkup(kb) if kb else None)
+
+async def tournament_join_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # The button may sit in the channel post, so the answer goes to the private chat.
+    query = update.callback_query; user_id = query.from_user.id
+    user = await storage.backend.get_user(user_id)
+    if not user or not user.get('is_registered') or user.get('is_banned') or not await check_channel_member(update, context):
+        reply = "টুর্নামেন্টে যোগ দেওয়ার আগে বটে /start করে রেজিস্ট্রেশন করুন ও চ্যানেলে যোগ দিন।"
+    else: reply = TOURNAMENT_JOIN_REPLIES[await tournament.engine.join(int(query.data[len('tjoin_'):]), user_id)]
+    outbound.pipeline.send(context.bot.send_message, user_id, reply)
+
+async def tournament_new_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """নতুন টুর্নামেন্ট: `/tournament_new <knockout|swiss> <fee> <max_players> [rounds] [নাম]`; চ্যানেলে যোগ দেওয়ার বাটনসহ ঘোষণা হয়।"""
+    if update.effective_user.id not in config.ADMINS: return await update.message.reply_text("এই কমান্ডটি শুধুমাত্র অ্যাডমিনদের জন্য।")
+    args = list(context.args); rounds = None
+    try:
+        fmt, fee, max_players = args[0], float(args[1]), int(args[2]); rest = args[3:]
+        if rest and rest[0].isdigit(): rounds = int(rest.pop(0))
+        name = ' '.join(rest) or f"{fmt.capitalize()} {fee:g} TK"
+        tournament_id = await tournament.engine.create(name, fmt, fee, max_players, rounds)
+    except (IndexError, ValueError): return await update.message.reply_text("ব্যবহার: /tournament_new <knockout|swiss> <fee> <max_players> [rounds] [নাম]")
+    except tournament.TournamentError as e: return await update.message.reply_text(f"❌ {e}")
+    t = await storage.backend.get_tournament(tournament_id)
+    outbound.pipeline.send(context.bot.send_message, config.CHANNEL_ID, f"🏆 নতুন টুর্নামেন্ট!\n\n{_tournament_line(t, 0)}", reply_markup=_tournament_keyboard(t))
+    await update.message.reply_text(f"✅ টুর্নামেন্ট #{tournament_id} তৈরি হয়েছে। শুরু করতে: /tournament_start {tournament_id}")
+
+async def tournament_start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """রেজিস্ট্রেশন বন্ধ করে ELO অনুযায়ী সিডিং ও প্রথম রাউন্ডের সব ম্যাচ তৈরি করে।"""
+    if update.effective_user.id not in config.ADMINS: return await update.message.reply_text("এই কমান্ডটি শুধুমাত্র অ্যাডমিনদের জন্য।")
+    try: tournament_id = int(context.args[0])
+    except (IndexError, ValueError): return await update.message.reply_text("ব্যবহার: /tournament_start <id>")
+    try: matches = await tournament.engine.begin(tournament_id)
+    except tournament.TournamentError as e: return await update.message.reply_text(f"❌ {e}")
+    await update.message.reply_text(f"✅ টুর্নামেন্ট #{tournament_id} শুরু হয়েছে: প্রথম রাউন্ডে {matches}টি ম্যাচ।")
+
+async def tournament_cancel_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """রেজিস্ট্রেশন চলা টুর্নামেন্ট বাতিল করে সবার এন্ট্রি ফি ফেরত দেয়।"""
+    if update.effective_user.id not in config.ADMINS: return await update.message.reply_text("এই কমান্ডটি শুধুমাত্র অ্যাডমিনদের জন্য।")
+    try: tournament_id = int(context.args[0])
+    except (IndexError, ValueError): return await update.message.reply_text("ব্যবহার: /tournament_cancel <id>")
+    refunded = await tournament.engine.cancel(tournament_id)
+    if refunded is None: return await update.message.reply_text("❌ শুধু রেজিস্ট্রেশন চলা টুর্নামেন্ট বাতিল করা যায়।")
+    for user_id in refunded: outbound.pipeline.send(context.bot.send_message, user_id, f"টুর্নামেন্ট #{tournament_id} বাতিল হয়েছে। আপনার এন্ট্রি ফি ফেরত দেওয়া হয়েছে।")
+    await update.message.reply_text(f"✅ টুর্নামেন্ট #{tournament_id} বাতিল, {len(refunded)} জনের ফি ফেরত।")
 
 # --- NEW ADMIN COMMANDS ---
 async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -470,12 +714,16 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if user_id not in config.ADMINS: return await update.message.reply_text("এই কমান্ডটি শুধুমাত্র অ্যাডমিনদের জন্য।")
     
     try:
-        total_users = await db.get_total_users()
-        active_users = await db.get_active_users()
-        total_matches = await db.get_total_matches()
-        pending_deposits = await db.get_pending_deposits_count()
-        pending_withdrawals = await db.get_pending_withdrawals_count()
-        total_fees_collected = await db.get_total_fees_collected()
+        if context.args and context.args[0] == '--rebuild':
+            await storage.backend.rebuild_counters()
+            await update.message.reply_text("🔄 কাউন্টারগুলো টেবিল থেকে পুনরায় গণনা করা হয়েছে।")
+        stats = await storage.backend.get_stats()
+        total_users, active_users, total_matches = stats['registered_users'], stats['active_users'], stats['completed_matches']
+        pending_deposits, pending_withdrawals, total_fees_collected = stats['pending_deposits'], stats['pending_withdrawals'], stats['fees_collected']
+        cache = db.user_cache_stats()
+        updates = context.application.update_processor.stats()
+        flood = floodcontrol.guard.stats(); shed = Counter()
+        for (_, reason), n in flood['shed'].items(): shed[reason] += n
         
         stats_text = f"""
 📊 **বিস্তারিত পরিসংখ্যান**
@@ -492,6 +740,10 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
   • অপেক্ষমাণ ডিপোজিট: {pending_deposits}
   • অপেক্ষমাণ উইথড্র: {pending_withdrawals}
 
+⚡ **ইউজার ক্যাশ:** {cache['hit_rate']:.0%} হিট ({cache['hits']}/{cache['hits'] + cache['misses']}), {cache['size']} সারি
+🧵 **আপডেট:** {updates['active']}/{updates['workers']} চলমান, {updates['busy_keys']} ইউজার অপেক্ষায়, গড় বিলম্ব {updates['avg_delay'] * 1000:.1f}ms (সর্বোচ্চ {updates['max_delay'] * 1000:.0f}ms)
+🚦 **ফ্লাড কন্ট্রোল:** {flood['total']} আপডেট বাদ (একই বাটন {shed['duplicate']}, ইউজার সীমা {shed['user']}, সার্বিক সীমা {shed['global']})
+
 ⏰ আপডেট: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 """
         await update.message.reply_text(stats_text, parse_mode='Markdown')
@@ -499,6 +751,23 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error(f"Error in stats_command: {e}", exc_info=True)
         await update.message.reply_text(f"❌ ত্রুটি: {e}")
 
+async def perf_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """হ্যান্ডলার, ডাটাবেস ও Telegram API এর লেটেন্সি (p50/p95/p99, ms) দেখায়; `/perf 15` আরও সারি দেখায়।"""
+    if update.effective_user.id not in config.ADMINS: return await update.message.reply_text("এই কমান্ডটি শুধুমাত্র অ্যাডমিনদের জন্য।")
+    limit = int(context.args[0]) if context.args and context.args[0].isdigit() else 8
+    def table(name, label):
+        rows = metrics.summary(name, limit)
+        if not rows: return "(কোনো ডাটা নেই)"
+        return '\n'.join(f"{label(l)[:26]:<26}{n:>7}{p50 * 1000:>7.1f}{p95 * 1000:>7.1f}{p99 * 1000:>7.1f}" for l, n, p50, p95, p99 in rows)
+    header = f"{'':<26}{'n':>7}{'p50':>7}{'p95':>7}{'p99':>7}"
+    handlers = table('bot_handler_seconds', lambda l: f"{l['handler']}:{l['route']}" if l['route'] else l['handler'])
+    queries = table('db_call_seconds', lambda l: re.sub(r'_sync$', '', l['func']))
+    api = table('telegram_api_seconds', lambda l: l['method'])
+    text = (f"⏱ হ্যান্ডলার\n```\n{header}\n{handlers}\n```\n🗄 ডাটাবেস\n```\n{header}\n{queries}\n```\n"
+            f"📡 Telegram API ({metrics.registry.total('telegram_api_errors_total')} ত্রুটি)\n```\n{header}\n{api}\n```\n"
+            f"📬 আউটবাউন্ড কিউ: {outbound.pipeline.pending} | রাইট কিউ: {db.write_queue_depth()} | চলমান ম্যাচ: {len(timeouts.scheduler.wheel)}")
+    await update.message.reply_text(text, parse_mode='Markdown')
+
 async def userinfo_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """নির্দিষ্ট ব্যবহারকারীর তথ্য দেখায়।"""
     user_id = update.effective_user.id
@@ -507,7 +776,7 @@ async def userinfo_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         target_user_id = int(context.args[0])
-        user = await db.get_user(target_user_id)
+        user = await storage.backend.get_user(target_user_id)
         
         if not user:
             return await update.message.reply_text("এই ব্যবহারকারী পাওয়া যায়নি।")
@@ -548,34 +817,36 @@ async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """সকল ব্যবহারকারীকে বার্তা পাঠায়।"""
     user_id = update.effective_user.id
     if user_id not in config.ADMINS: return await update.message.reply_text("এই কমান্ডটি শুধুমাত্র অ্যাডমিনদের জন্য।")
+    if not storage.backend.persistent: return await update.message.reply_text(SQLITE_ONLY_REPLY)
     if not context.args: return await update.message.reply_text("ব্যবহার: /broadcast <বার্তা>")
     
     broadcast_text = " ".join(context.args)
     
     try:
-        all_users = await db.get_all_user_ids()
-        success_count = 0
-        failed_count = 0
-        
-        await update.message.reply_text(f"📢 {len(all_users)} জন ব্যবহারকারীকে বার্তা পাঠানো হচ্ছে...", parse_mode='Markdown')
-        
-        for uid in all_users:
-            try:
-                await context.bot.send_message(chat_id=uid, text=f"📢 **অ্যাডমিন ঘোষণা:**\n\n{broadcast_text}", parse_mode='Markdown')
-                success_count += 1
-                await asyncio.sleep(0.05)  # Rate limit
-            except (Forbidden, BadRequest):
-                failed_count += 1
-            except Exception as e:
-                logger.warning(f"Failed to send broadcast to {uid}: {e}")
-                failed_count += 1
-        
-        result_text = f"✅ **সম্প্রচার সম্পূর্ণ**\n\n✔️ সফল: {success_count}\n❌ ব্যর্থ: {failed_count}"
-        await update.message.reply_text(result_text, parse_mode='Markdown')
+        campaign_id = await broadcast.engine.start(context.bot, f"📢 **অ্যাডমিন ঘোষণা:**\n\n{broadcast_text}", user_id, parse_mode='Markdown')
+        campaign = await db.get_campaign(campaign_id)
+        await update.message.reply_text(f"📢 ক্যাম্পেইন #{campaign_id}: {campaign['total']} জন ব্যবহারকারীকে বার্তা পাঠানো হচ্ছে...\nঅগ্রগতি দেখতে: /broadcast_status {campaign_id}")
     except Exception as e:
         logger.error(f"Error in broadcast_command: {e}", exc_info=True)
         await update.message.reply_text(f"❌ ত্রুটি: {e}")
 
+async def broadcast_status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """ব্রডকাস্ট ক্যাম্পেইনের অগ্রগতি দেখায় (আইডি না দিলে সর্বশেষটি)।"""
+    user_id = update.effective_user.id
+    if user_id not in config.ADMINS: return await update.message.reply_text("এই কমান্ডটি শুধুমাত্র অ্যাডমিনদের জন্য।")
+    if not storage.backend.persistent: return await update.message.reply_text(SQLITE_ONLY_REPLY)
+    try:
+        campaign = await db.get_campaign(int(context.args[0]) if context.args else None)
+        if not campaign: return await update.message.reply_text("কোনো ক্যাম্পেইন পাওয়া যায়নি।")
+        done = campaign['sent'] + campaign['failed'] + campaign['blocked']
+        percent = done / campaign['total'] if campaign['total'] else 1
+        state = campaign['status'] if campaign['status'] != 'running' or broadcast.engine.is_running(campaign['id']) else 'paused (রিস্টার্টে চালু হবে)'
+        await update.message.reply_text(
+            f"📢 **ক্যাম্পেইন #{campaign['id']}** — {state}\n\n"
+            f"অগ্রগতি: {done}/{campaign['total']} ({percent:.0%})\n"
+            f"✔️ সফল: {campaign['sent']}\n❌ ব্যর্থ: {campaign['failed']}\n🚫 ব্লক করেছে: {campaign['blocked']}", parse_mode='Markdown')
+    except ValueError: await update.message.reply_text("ব্যবহার: /broadcast_status [campaign_id]")
+
 async def matchinfo_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """ম্যাচের তথ্য দেখায়।"""
     user_id = update.effective_user.id
@@ -584,13 +855,14 @@ async def matchinfo_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         match_id = context.args[0]
-        match = await db.get_match(match_id)
+        match = await storage.backend.get_match(match_id)
+        if not match and storage.backend.persistent: match = await asyncio.to_thread(archive.find_match_sync, match_id)
         
         if not match:
             return await update.message.reply_text("ম্যাচ পাওয়া যায়নি।")
         
-        p1 = await db.get_user(match['player1_id'])
-        p2 = await db.get_user(match['player2_id'])
+        p1 = await storage.backend.get_user(match['player1_id'])
+        p2 = await storage.backend.get_user(match['player2_id'])
         
         info_text = f"""
 🎮 **ম্যাচ তথ্য**
@@ -625,13 +897,10 @@ async def banuser_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         target_user_id = int(context.args[0])
         reason = " ".join(context.args[1:]) if len(context.args) > 1 else "কোনো কারণ উল্লেখ নেই"
         
-        await db.update_user_fields(target_user_id, {'is_banned': 1})
+        await storage.backend.update_user_fields(target_user_id, {'is_banned': 1})
         await update.message.reply_text(f"✅ ব্যবহারকারী {target_user_id} ব্যান করা হয়েছে।\n\nকারণ: {reason}")
         
-        try:
-            await context.bot.send_message(target_user_id, f"❌ **আপনার একাউন্ট ব্যান হয়েছে।**\n\nকারণ: {reason}\n\nআপিল করতে অ্যাডমিনের সাথে যোগাযোগ করুন।")
-        except Exception:
-            pass
+        outbound.pipeline.send(context.bot.send_message, target_user_id, f"❌ **আপনার একাউন্ট ব্যান হয়েছে।**\n\nকারণ: {reason}\n\nআপিল করতে অ্যাডমিনের সাথে যোগাযোগ করুন।")
     except ValueError:
         await update.message.reply_text("❌ বৈধ ব্যবহারকারী ID প্রদান করুন।")
     except Exception as e:
@@ -646,41 +915,77 @@ async def unbanuser_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         target_user_id = int(context.args[0])
-        await db.update_user_fields(target_user_id, {'is_banned': 0})
+        await storage.backend.update_user_fields(target_user_id, {'is_banned': 0})
         await update.message.reply_text(f"✅ ব্যবহারকারী {target_user_id} আনব্যান করা হয়েছে।")
         
-        try:
-            await context.bot.send_message(target_user_id, "✅ **সুখবর!** আপনার একাউন্ট পুনরুদ্ধার করা হয়েছে। আবার খেলতে পারেন!")
-        except Exception:
-            pass
+        outbound.pipeline.send(context.bot.send_message, target_user_id, "✅ **সুখবর!** আপনার একাউন্ট পুনরুদ্ধার করা হয়েছে। আবার খেলতে পারেন!")
     except ValueError:
         await update.message.reply_text("❌ বৈধ ব্যবহারকারী ID প্রদান করুন।")
     except Exception as e:
         logger.error(f"Error in unbanuser_command: {e}", exc_info=True)
         await update.message.reply_text(f"❌ ত্রুটি: {e}")
 
-def main():
-    db.init_db()
-    app = Application.builder().token(config.TOKEN).build()
+async def on_startup(app: Application):
+    await storage.backend.flush()
+    await timeouts.scheduler.start(app.bot)
+    await tournament.engine.start(app.bot)
+    await lobby.board.start(app.bot)
+    conversation.store.start()
+    if storage.backend.persistent:  # SQLite-only maintenance; the memory backend has nothing to back up or archive
+        await broadcast.engine.resume(app.bot)
+        backup.scheduler.start()
+        archive.scheduler.start()
+    await metrics.start()
+
+async def on_shutdown(app: Application):
+    await metrics.stop()
+    await timeouts.scheduler.stop()
+    await tournament.engine.stop()
+    await lobby.board.stop()
+    await backup.scheduler.stop()
+    await archive.scheduler.stop()
+    await conversation.store.stop()
+    await outbound.pipeline.stop()
+    await storage.backend.flush()
+    storage.backend.close()
+
+def build_application():
+    builder = Application.builder().token(config.TOKEN).concurrent_updates(dispatcher.build_processor())
+    if config.TELEGRAM_API_URL:
+        builder = builder.base_url(config.TELEGRAM_API_URL + '/bot').base_file_url(config.TELEGRAM_API_URL + '/file/bot')
+    app = builder.post_init(on_startup).post_shutdown(on_shutdown).build()
     
     # --- Registering ALL handlers ---
     # User handlers
     app.add_handler(CommandHandler('start', start_command))
     app.add_handler(CommandHandler('result', result_command))
     app.add_handler(CommandHandler('rules', rules_command))
+    app.add_handler(CommandHandler('tournaments', tournaments_command))
 
     # Admin handlers
     app.add_handler(CommandHandler('approve_deposit', approve_deposit))
+    app.add_handler(CommandHandler('reject_deposit', reject_deposit))
     app.add_handler(CommandHandler('approve_withdrawal', approve_withdrawal))
     app.add_handler(CommandHandler('reject_withdrawal', reject_withdrawal))
+    app.add_handler(CommandHandler('pending', pending_command))
     app.add_handler(CommandHandler('backup', backup_command))
+    app.add_handler(CommandHandler('archive', archive_command))
+    app.add_handler(CommandHandler('audit', audit_command))
+    app.add_handler(CommandHandler('elo_replay', elo_replay_command))
+    app.add_handler(CommandHandler('tournament_new', tournament_new_command))
+    app.add_handler(CommandHandler('tournament_start', tournament_start_command))
+    app.add_handler(CommandHandler('tournament_cancel', tournament_cancel_command))
     app.add_handler(CommandHandler('setrules', set_rules_command))
     app.add_handler(CommandHandler('freeplay_on', free_play_on_command))
     app.add_handler(CommandHandler('freeplay_off', free_play_off_command))
+    app.add_handler(CommandHandler('setconfig', set_config_command))
     
     # New Admin commands
     app.add_handler(CommandHandler('stats', stats_command))
+    app.add_handler(CommandHandler('perf', perf_command))
     app.add_handler(CommandHandler('broadcast', broadcast_command))
+    app.add_handler(CommandHandler('broadcast_status', broadcast_status_command))
+    app.add_handler(CommandHandler('reviews', reviews_command))
     app.add_handler(CommandHandler('userinfo', userinfo_command))
     app.add_handler(CommandHandler('matchinfo', matchinfo_command))
     app.add_handler(CommandHandler('banuser', banuser_command))
@@ -690,9 +995,37 @@ def main():
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, main_text_handler))
     app.add_handler(MessageHandler(filters.PHOTO, photo_handler))
     app.add_handler(CallbackQueryHandler(callback_query_handler))
+    app.add_handler(ChatMemberHandler(channel_member_update, ChatMemberHandler.CHAT_MEMBER))
+
+    routes = {callback_query_handler: _callback_route, main_text_handler: _text_route}
+    for handler in app.handlers[0]:
+        handler.callback = metrics.instrument(handler.callback.__name__, handler.callback, routes.get(handler.callback))
+    register_gauges(app)
+    return app
+
+def register_gauges(app):
+    metrics.gauge('outbound_queued', lambda: {(('lane', lane),): n for lane, n in outbound.pipeline.stats()['queued'].items()}, 'Sends waiting in the outbound queue, by lane')
+    metrics.gauge('outbound_pending', lambda: outbound.pipeline.pending, 'Sends queued or in flight')
+    metrics.gauge('updates_in_progress', lambda: app.update_processor.current_concurrent_updates, 'Updates admitted and not yet finished')
+    metrics.gauge('updates_busy_users', lambda: app.update_processor.busy_keys, 'Users with an update running or waiting')
+    metrics.gauge('db_write_queue', db.write_queue_depth, 'Writes waiting for the writer thread')
+    metrics.gauge('db_user_cache_size', lambda: db.user_cache_stats()['size'], 'Rows in the user cache')
+    metrics.gauge('matches_in_progress', lambda: len(timeouts.scheduler.wheel), 'Started matches waiting for results')
+    metrics.gauge('matchmaking_queue', matchmaking.engine.size, 'Players waiting for an opponent')
+    metrics.gauge('conversations', lambda: len(conversation.store), 'Users in the middle of a multi-step flow')
+
+def main():
+    store = storage.backend; store.open()
+    matchmaking.engine.load(store.load_queue())
+    leaderboard.board.load(store.load_ranked_users())
+    conversation.store.load(store.load_user_states())
+    app = build_application()
     
-    logger.info('Bot starting...')
-    app.run_polling()
+    logger.info(f'Bot starting ({config.UPDATE_MODE})...')
+    if config.UPDATE_MODE == 'webhook':
+        asyncio.run(webhook.serve(app))
+    else:
+        app.run_polling(allowed_updates=Update.ALL_TYPES)  # chat_member updates are opt-in
 
 if __name__ == '__main__':
     main()
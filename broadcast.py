@@ -0,0 +1,74 @@
+# broadcast.py - Resumable, rate-limited broadcast campaigns
+import asyncio, logging
+from telegram.error import Forbidden
+import db, config, outbound
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+class BroadcastEngine:
+    """Delivers broadcast campaigns stored in the DB.
+
+    Recipients are materialized when the campaign is created and walked with a
+    user_id cursor, one page at a time; each page's results are persisted in one
+    write, so a restart resumes from the first unrecorded page (at most one page
+    may be delivered twice). Sends go through the outbound pipeline's bulk lane,
+    which handles retries and gives way to match traffic; BROADCAST_RATE caps the
+    campaign's share of the global budget. Users answering Forbidden are marked
+    `is_blocked` and skipped by later campaigns. 'failed' is terminal: by then
+    the pipeline has already retried flood waits and network errors up to
+    OUTBOUND_MAX_ATTEMPTS, so a resumed campaign does not send to them again.
+    """
+
+    def __init__(self):
+        self.bucket = TokenBucket(config.BROADCAST_RATE)
+        self._tasks = {}  # campaign_id -> asyncio.Task
+
+    def is_running(self, campaign_id):
+        return campaign_id in self._tasks
+
+    async def start(self, bot, text, created_by, parse_mode=None):
+        campaign_id = await db.create_campaign(text, parse_mode, created_by)
+        self._spawn(bot, campaign_id)
+        return campaign_id
+
+    async def resume(self, bot):
+        """Restarts campaigns left in 'running' state by a previous process."""
+        for campaign_id in await db.get_running_campaign_ids():
+            if not self.is_running(campaign_id):
+                logger.info(f"Resuming broadcast campaign #{campaign_id}")
+                self._spawn(bot, campaign_id)
+
+    def _spawn(self, bot, campaign_id):
+        task = asyncio.create_task(self._run(bot, campaign_id))
+        self._tasks[campaign_id] = task
+        task.add_done_callback(lambda t: self._tasks.pop(campaign_id, None))
+
+    async def _run(self, bot, campaign_id):
+        try:
+            campaign = await db.get_campaign(campaign_id)
+            sem = asyncio.Semaphore(config.BROADCAST_CONCURRENCY)
+            cursor = 0
+            while True:
+                page = await db.get_pending_recipients(campaign_id, cursor, config.BROADCAST_PAGE_SIZE)
+                if not page: break
+                statuses = await asyncio.gather(*(self._deliver(bot, sem, campaign, uid) for uid in page))
+                await db.record_broadcast_results(campaign_id, list(zip(page, statuses)))
+                cursor = page[-1]
+            await db.finish_campaign(campaign_id)
+            logger.info(f"Broadcast campaign #{campaign_id} finished")
+        except asyncio.CancelledError: raise
+        except Exception as e:
+            logger.error(f"Broadcast campaign #{campaign_id} stopped: {e}", exc_info=True)
+
+    async def _deliver(self, bot, sem, campaign, user_id):
+        async with sem:
+            await self.bucket.acquire()
+            try:
+                await outbound.pipeline.call(bot.send_message, user_id, text=campaign['text'], parse_mode=campaign['parse_mode'], lane=outbound.BULK)
+                return 'sent'
+            except Forbidden: return 'blocked'
+            except Exception as e:
+                logger.warning(f"Broadcast to {user_id} failed: {e}"); return 'failed'
+
+engine = BroadcastEngine()
@@ -6,10 +6,58 @@ ADMINS = [5172723202]          # আপনার অ্যাডমিন আই
 # নিচের দুটি আইডি একই হতে পারে যদি আপনি একটি চ্যানেল ব্যবহার করেন
 CHANNEL_ID = -1003079996041   # আপনার প্রধান চ্যানেলের সঠিক আইডি দিন (-100 দিয়ে শুরু)
 LOBBY_CHANNEL_ID = -1003079996041 # আপনার লবি চ্যানেলের সঠিক আইডি দিন (-100 দিয়ে শুরু)
+LOBBY_MODE = 'board'         # 'board': প্রতি ফি-এর একটি পিন করা বার্তা জায়গায় এডিট হয়; 'posts': প্রতি চ্যালেঞ্জে নতুন পোস্ট
+LOBBY_BOARD_DEBOUNCE = 1.0   # কিউ বদলের পর কতক্ষণ অপেক্ষা করে একসাথে বোর্ড আপডেট (সেকেন্ড)
+LOBBY_BOARD_INTERVAL = 3.0   # দুই আপডেটের মাঝে ন্যূনতম বিরতি (সেকেন্ড); প্রতি বিরতিতে প্রতি ফি-তে সর্বোচ্চ একটি এডিট
+LOBBY_BOARD_ROWS = 30        # বোর্ডে সর্বোচ্চ কতজন খেলোয়াড়ের নাম দেখানো হবে
 
 # আপনার চ্যানেলের পাবলিক ইউজারনেম (যদি থাকে) @ ছাড়া লিখুন
 CHANNEL_USERNAME = 'xefootball_esports' 
 
+# --- Match timeouts ---
+MATCH_TIMEOUT = 15 * 60      # রুম কোড দেওয়ার পর ফলাফল জমার সময় (সেকেন্ড)
+TIMEOUT_TICK = 1.0           # টাইমার হুইলের টিক (সেকেন্ড)
+TIMEOUT_BATCH = 200          # এক ট্রানজ্যাকশনে সর্বোচ্চ কতগুলো মেয়াদোত্তীর্ণ ম্যাচ
+
+# --- ELO rating ---
+ELO_K_FACTOR = 32            # প্রতি ম্যাচে রেটিং কতটা বদলায়
+ELO_PROVISIONAL_K = 32       # নতুন খেলোয়াড়দের K (প্রথম ELO_PROVISIONAL_GAMES ম্যাচে)
+ELO_PROVISIONAL_GAMES = 0    # 0 = প্রভিশনাল K বন্ধ; বদলানোর পর elo_replay.py দিয়ে সবার রেটিং পুনর্গণনা করুন
+
+# --- Tournaments ---
+TOURNAMENT_MAX_PLAYERS = 1024        # একটি টুর্নামেন্টে সর্বোচ্চ খেলোয়াড়
+TOURNAMENT_ROOM_CODE_TIMEOUT = 10 * 60  # রাউন্ড শুরুর পর রুম কোড দেওয়ার সময় (সেকেন্ড); কোড দিলে MATCH_TIMEOUT শুরু হয়
+TOURNAMENT_RAKE = 0.1                # এন্ট্রি ফি-এর যে অংশ প্ল্যাটফর্ম রাখে
+TOURNAMENT_PAYOUTS = [0.7, 0.3]      # বাকি পুরস্কার তহবিল ১ম, ২য়, ... স্থানে এই অনুপাতে ভাগ হয়
+
+# --- Conversation state (write-behind) ---
+CONVERSATION_FLUSH_INTERVAL = 1.0   # কতক্ষণ পরপর পরিবর্তিত state ডাটাবেসে লেখা হবে (সেকেন্ড)
+CONVERSATION_FLUSH_BATCH = 500      # এতগুলো ইউজার জমলে সাথে সাথে লেখা হবে
+
+# --- Channel membership cache (seconds) ---
+MEMBERSHIP_TTL_POSITIVE = 600   # সদস্য হলে কতক্ষণ পুনরায় চেক করা হবে না
+MEMBERSHIP_TTL_NEGATIVE = 30    # সদস্য না হলে অল্প সময় পর আবার চেক
+MEMBERSHIP_CACHE_SIZE = 50000
+
+# --- Update delivery ---
+UPDATE_MODE = 'polling'          # 'polling' অথবা 'webhook'
+WEBHOOK_URL = ''                 # পাবলিক HTTPS বেস URL (যেমন https://example.com); খালি থাকলে setWebhook কল হবে না
+WEBHOOK_LISTEN = '127.0.0.1'     # রিভার্স প্রক্সির পেছনে লোকাল লিসেনার
+WEBHOOK_PORT = 8443
+WEBHOOK_PATH = '/telegram'
+WEBHOOK_SECRET = ''              # X-Telegram-Bot-Api-Secret-Token হেডার; খালি থাকলে প্রতি রানে র‍্যান্ডম (WEBHOOK_URL লাগবে)
+WEBHOOK_MAX_CONNECTIONS = 40
+CONCURRENT_UPDATES = 8           # একসাথে কতগুলো আপডেট প্রসেস হবে; একই ইউজারের আপডেট সবসময় ক্রমানুসারে
+UPDATE_MAX_PENDING = 512         # প্রসেসিংয়ের অপেক্ষায় থাকা আপডেটের সর্বোচ্চ সংখ্যা
+TELEGRAM_API_URL = ''            # লোকাল Bot API সার্ভার বা টেস্ট হারনেসের জন্য (যেমন http://127.0.0.1:8081)
+
+# --- Flood control (হ্যান্ডলারের আগেই অতিরিক্ত আপডেট বাদ) ---
+FLOOD_LIMITS = {'command': (0.5, 5), 'callback': (2.0, 8), 'text': (1.0, 6)}  # প্রতি ইউজার: (প্রতি সেকেন্ডে, একটানা সর্বোচ্চ)
+FLOOD_GLOBAL_LIMITS = {'command': (100, 300), 'callback': (200, 600), 'text': (200, 600)}  # সব ইউজার মিলিয়ে
+FLOOD_CALLBACK_DEBOUNCE = 1.0    # একই বাটন এর মধ্যে আবার চাপলে বাদ (সেকেন্ড)
+FLOOD_WARN_INTERVAL = 30         # "একটু ধীরে" সতর্কবার্তা ইউজারপ্রতি সর্বোচ্চ কতক্ষণ পরপর (সেকেন্ড)
+FLOOD_TRACKED_USERS = 50000      # মেমরিতে রাখা ইউজার-বাকেটের সংখ্যা
+
 # --- Bot Settings ---
 # আপনার বটের সঠিক ইউজারনেম @ ছাড়া লিখুন
 BOT_USERNAME = 'esfootball_tournament_bot' 
@@ -21,6 +69,9 @@ REFERRAL_BONUS = 5.0
 # --- Financial Settings ---
 MINIMUM_DEPOSIT = 50.0    
 MINIMUM_WITHDRAWAL = 100.0
+FEE_TIERS = [20, 30, 50, 100, 200, 500]  # এন্ট্রি ফি (TK); /setconfig দিয়ে রিস্টার্ট ছাড়াই বদলানো যায়
+BULK_MAX_IDS = 500        # একটি /approve_* বা /reject_* কমান্ডে সর্বোচ্চ কতগুলো অনুরোধ
+PENDING_PAGE_SIZE = 8     # /pending এর প্রতি পেজে কতগুলো অনুরোধ
 BKASH_NUMBER = '01914573762'
 NAGAD_NUMBER = '01914573762'
 
@@ -30,6 +81,23 @@ SUPPORT_CHAT_ID = -1001234567890 # আপনার সাপোর্ট গ্
 
 # --- New: Broadcast message debounce time (in seconds) ---
 BROADCAST_DEBOUNCE_TIME = 300 # 5 minutes between broadcasts to prevent spam
+BROADCAST_RATE = 25          # প্রতি সেকেন্ডে সর্বোচ্চ বার্তা (Telegram এর সীমা ~30/s)
+BROADCAST_CONCURRENCY = 25   # একসাথে চলমান send_message কল
+BROADCAST_PAGE_SIZE = 200    # প্রতি পেজের ফলাফল একবারে ডাটাবেসে সংরক্ষণ হয়
+
+# --- Outbound send queue ---
+OUTBOUND_RATE = 28           # সব চ্যাট মিলিয়ে প্রতি সেকেন্ডে সর্বোচ্চ বার্তা
+OUTBOUND_WORKERS = 32        # একসাথে চলমান API কল
+OUTBOUND_CHAT_RATE = 1.0     # একই প্রাইভেট চ্যাটে প্রতি সেকেন্ডে
+OUTBOUND_GROUP_RATE = 20 / 60  # গ্রুপ/চ্যানেলে প্রতি সেকেন্ডে (মিনিটে ২০টি)
+OUTBOUND_CHAT_BURST = 3      # একটি চ্যাটে একটানা কতগুলো বার্তা যেতে পারে
+OUTBOUND_MAX_ATTEMPTS = 4
+OUTBOUND_MAX_BACKOFF = 30    # নেটওয়ার্ক ত্রুটির পর সর্বোচ্চ অপেক্ষা (সেকেন্ড)
+OUTBOUND_CHAT_CACHE = 10000  # মেমরিতে রাখা চ্যাট রেট-লিমিটারের সংখ্যা
+
+# --- Metrics ---
+METRICS_LISTEN = '127.0.0.1'  # Prometheus /metrics এন্ডপয়েন্ট (শুধু লোকাল)
+METRICS_PORT = 9108          # 0 হলে এন্ডপয়েন্ট বন্ধ থাকবে
 
 
 
@@ -39,7 +107,27 @@ BROADCAST_DEBOUNCE_TIME = 300 # 5 minutes between broadcasts to prevent spam
 
 
 # --- Database and API keys (rarely change) ---
+STORAGE_BACKEND = 'sqlite'  # 'sqlite' অথবা 'memory' (শুধু টেস্ট/লোড টেস্ট: কিছুই ডিস্কে থাকে না)
 LOCAL_DB = 'local_data.db'
+DB_READERS = 4              # রিড-অনলি কানেকশন পুলের আকার
+DB_WRITE_BATCH = 256        # এক কমিটে সর্বোচ্চ কতগুলো রাইট (group commit)
+DB_SYNCHRONOUS = 'NORMAL'   # WAL মোডে NORMAL নিরাপদ ও দ্রুত; সর্বোচ্চ নিরাপত্তার জন্য 'FULL'
+DB_BUSY_TIMEOUT_MS = 5000
+USER_CACHE_SIZE = 10000     # মেমরিতে রাখা ব্যবহারকারী সারির সর্বোচ্চ সংখ্যা (LRU)
+
+# --- Backups ---
+BACKUP_DIR = 'backups'
+BACKUP_INTERVAL = 6 * 3600  # স্বয়ংক্রিয় স্ন্যাপশটের বিরতি (সেকেন্ড); 0 = বন্ধ
+BACKUP_KEEP = 28            # কতগুলো পুরনো স্ন্যাপশট রাখা হবে
+BACKUP_COMPRESSION = 'auto' # 'auto' (zstandard থাকলে zstd, নইলে gzip), 'zstd' বা 'gzip'
+BACKUP_PAGES_PER_STEP = 1024  # প্রতি ধাপে কপি হওয়া পেজ
+BACKUP_STEP_SLEEP = 0.005     # ধাপের মাঝে বিরতি (সেকেন্ড)
+
+# --- Archive (পুরোনো লেজার ও শেষ হওয়া ম্যাচ) ---
+ARCHIVE_DIR = 'archive'       # gzip JSONL সেগমেন্ট ফাইল
+ARCHIVE_KEEP_MONTHS = 3       # চলতি মাস ছাড়া এতগুলো সম্পূর্ণ মাস মূল ডাটাবেসে থাকে
+ARCHIVE_BATCH = 5000          # প্রতি চাঙ্কে কতগুলো সারি সরানো হয়
+ARCHIVE_INTERVAL = 24 * 3600  # কতক্ষণ পরপর আর্কাইভ চলবে (0 = বন্ধ)
 
 # নিচেরগুলো আপনার কোডে ব্যবহৃত হচ্ছে না, তাই যেমন আছে তেমন রাখতে পারেন
 CREDENTIALS_FILE = 'credentials.json'
@@ -0,0 +1,40 @@
+"""
+টেস্টের শেয়ার করা ফিক্সচার। fresh_db: প্রতিটি টেস্টের জন্য tmp_path এ নতুন SQLite ডাটাবেস; শেষে কানেকশন,
+ইউজার ক্যাশ ও সেটিং ক্যাশ (এবং তার config ওভাররাইড) মুছে দেয়, যাতে পরের টেস্টে কিছু না থেকে যায়।
+make_store / store: একই কাজ storage ব্যাকএন্ডের জন্য; store দুই ব্যাকএন্ডেই (sqlite, memory) প্যারামিটারাইজড।
+"""
+import itertools
+import pytest
+import config, db, leaderboard, storage
+
+def reset_db():
+    """Stops the writer and reader pool and forgets everything cached from the current database."""
+    db.close()
+    if getattr(db._local, 'conn', None) is not None: db._local.conn.close()
+    db._local.conn = None; db._user_cache.clear(); db.cache_settings(())
+
+@pytest.fixture
+def fresh_db(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, 'LOCAL_DB', str(tmp_path / 'test.db'))
+    reset_db(); db.init_db()
+    yield tmp_path
+    reset_db()
+
+@pytest.fixture
+def make_store(monkeypatch, tmp_path):
+    """Opens a storage backend by name as storage.backend, closing the one opened before it (SQLite is process-wide)."""
+    opened = []; numbers = itertools.count()
+    def make(name):
+        while opened: opened.pop().close(); reset_db()
+        if name == 'sqlite': monkeypatch.setattr(config, 'LOCAL_DB', str(tmp_path / f'storage-{next(numbers)}.db'))
+        store = storage.create(name); store.open(); leaderboard.board.load(store.load_ranked_users())
+        monkeypatch.setattr(storage, 'backend', store); opened.append(store)
+        return store
+    reset_db()
+    yield make
+    while opened: opened.pop().close()
+    reset_db()
+
+@pytest.fixture(params=sorted(storage.BACKENDS))
+def store(request, make_store):
+    return make_store(request.param)
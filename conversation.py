@@ -0,0 +1,113 @@
+# conversation.py - In-memory conversation state with write-behind persistence
+import asyncio, json, logging
+import config, storage
+
+logger = logging.getLogger(__name__)
+
+MATCH_STEPS = {'awaiting_room_code', 'awaiting_screenshot'}
+WITHDRAW_STEPS = {'awaiting_withdraw_method', 'awaiting_withdraw_account'}
+
+class State:
+    """One user's position in a multi-step flow; only the fields its step needs are set."""
+    __slots__ = ('step', 'match_id', 'amount', 'method', 'target_id')
+
+    def __init__(self, step, match_id=None, amount=None, method=None, target_id=None):
+        self.step, self.match_id, self.amount, self.method, self.target_id = step, match_id, amount, method, target_id
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__[1:] if getattr(self, name) is not None)
+        return f"State({self.step!r}{', ' if fields else ''}{fields})"
+
+    def encode(self):
+        """(state, state_data) for the users table, in the format the handlers used to write."""
+        if self.step in MATCH_STEPS: return self.step, self.match_id
+        if self.step == 'admin_setbal_amount': return self.step, str(self.target_id)
+        if self.step in WITHDRAW_STEPS: return self.step, json.dumps({'amount': self.amount, 'method': self.method} if self.method else {'amount': self.amount})
+        return self.step, None
+
+    @classmethod
+    def decode(cls, step, data):
+        if step in MATCH_STEPS: return cls(step, match_id=data)
+        if step == 'admin_setbal_amount': return cls(step, target_id=int(data))
+        if step in WITHDRAW_STEPS:
+            fields = json.loads(data); return cls(step, amount=fields['amount'], method=fields.get('method'))
+        return cls(step)
+
+class ConversationStore:
+    """Active conversations live here; the users table is only their backing copy.
+
+    Handlers read and change state synchronously (no executor round-trip, no
+    JSON). Every change marks the user dirty; a background task writes the
+    latest state of all dirty users in one transaction every
+    CONVERSATION_FLUSH_INTERVAL seconds, or sooner once CONVERSATION_FLUSH_BATCH
+    users are waiting, so several steps of one flow cost a single UPDATE.
+    Startup reloads every stored conversation, so in-flight flows survive a
+    restart; at most the last interval of changes is lost on a crash.
+    """
+
+    def __init__(self):
+        self._states = {}  # user_id -> State
+        self._dirty = {}   # user_id -> State or None (cleared), not yet written
+        self._wakeup = None
+        self._task = None
+        self.writes = 0
+
+    def load(self, rows):
+        """Startup: rows of (user_id, state, state_data) with a non-NULL state."""
+        self._states.clear()
+        for user_id, step, data in rows:
+            try: self._states[user_id] = State.decode(step, data)
+            except (ValueError, KeyError, TypeError) as e: logger.warning(f"Dropping unreadable state {step!r} of user {user_id}: {e}")
+        logger.info(f"Recovered {len(self._states)} conversations")
+
+    def get(self, user_id):
+        return self._states.get(user_id)
+
+    def set(self, user_id, step, **fields):
+        state = self._states[user_id] = State(step, **fields)
+        self._mark(user_id, state)
+        return state
+
+    def clear(self, user_id):
+        if self._states.pop(user_id, None) is not None: self._mark(user_id, None)
+
+    def __len__(self): return len(self._states)
+
+    def _mark(self, user_id, state):
+        self._dirty[user_id] = state
+        if self._wakeup is not None and len(self._dirty) >= config.CONVERSATION_FLUSH_BATCH: self._wakeup.set()
+
+    def start(self):
+        if self._task: raise RuntimeError("conversation store already started")
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops the background writer and writes whatever is still dirty."""
+        if self._task:
+            self._task.cancel()
+            try: await self._task
+            except asyncio.CancelledError: pass
+            self._task = self._wakeup = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try: await asyncio.wait_for(self._wakeup.wait(), config.CONVERSATION_FLUSH_INTERVAL)
+            except asyncio.TimeoutError: pass
+            self._wakeup.clear()
+            try: await self.flush()
+            except Exception as e: logger.error(f"Writing conversation states failed: {e}", exc_info=True)
+
+    async def flush(self):
+        """Writes all pending changes in one batch; on failure they are queued again."""
+        if not self._dirty: return
+        batch, self._dirty = self._dirty, {}
+        rows = [(user_id, *(state.encode() if state else (None, None))) for user_id, state in batch.items()]
+        try: await storage.backend.save_user_states(rows)
+        except BaseException:  # includes cancellation by stop(); rewriting the same values is harmless
+            for user_id, state in batch.items(): self._dirty.setdefault(user_id, state)  # newer changes win
+            raise
+        self.writes += 1
+
+store = ConversationStore()
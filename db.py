@@ -1,24 +1,161 @@
 # db.py - Final version with settings table and user fetching
-import sqlite3, time, asyncio, logging
+import sqlite3, json, time, asyncio, logging, threading, queue
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import OrderedDict
 from datetime import datetime
 import uuid
-import config
+import config, leaderboard, metrics
 
 logger = logging.getLogger(__name__)
-_conn = None
-_lock = asyncio.Lock() 
+# Every thread gets its own connection: the writer thread owns the only read-write
+# one used for *_sync mutators, the reader pool opens read-only connections.
+# Mutators never commit themselves; the writer wraps each one in a SAVEPOINT and
+# commits whole batches (group commit). Call them through run_write/write_sync.
+_local = threading.local()
+_writer = None
+_readers = None
+_start_lock = threading.Lock()
 
 def calculate_elo(player_rating, opponent_rating, score, k_factor=32):
     expected_score = 1 / (1 + 10**((opponent_rating - player_rating) / 400))
     new_rating = player_rating + k_factor * (score - expected_score)
     return int(round(new_rating))
 
+def elo_k_factor(games_played):
+    """K of a player with `games_played` finished matches: provisional until ELO_PROVISIONAL_GAMES."""
+    return config.ELO_PROVISIONAL_K if games_played < config.ELO_PROVISIONAL_GAMES else config.ELO_K_FACTOR
+
+def _connect(read_only=False, autocommit=False):
+    if read_only: conn = sqlite3.connect(f'file:{config.LOCAL_DB}?mode=ro', uri=True)
+    elif autocommit: conn = sqlite3.connect(config.LOCAL_DB, isolation_level=None)
+    else: conn = sqlite3.connect(config.LOCAL_DB)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f'PRAGMA busy_timeout={int(config.DB_BUSY_TIMEOUT_MS)}')
+    if not read_only: conn.execute(f'PRAGMA synchronous={config.DB_SYNCHRONOUS}')
+    return conn
+
 def get_conn():
-    global _conn
-    if _conn is None: 
-        _conn = sqlite3.connect(config.LOCAL_DB, check_same_thread=False)
-        _conn.row_factory = sqlite3.Row
-    return _conn
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = _local.conn = _connect(read_only=getattr(_local, 'read_only', False))
+    return conn
+
+class _Writer(threading.Thread):
+    """Single writer thread: drains queued mutators and commits them in batches."""
+    def __init__(self):
+        super().__init__(name='db-writer', daemon=True)
+        self.ops = queue.SimpleQueue()
+
+    def submit(self, func, args, kwargs):
+        fut = Future(); self.ops.put((fut, func, args, kwargs)); return fut
+
+    def run(self):
+        conn = _local.conn = _connect(autocommit=True); _local.is_writer = True
+        running = True
+        while running:
+            batch = [self.ops.get()]
+            while len(batch) < config.DB_WRITE_BATCH:
+                try: batch.append(self.ops.get_nowait())
+                except queue.Empty: break
+            if None in batch:
+                running = False; batch = [op for op in batch if op is not None]
+            if batch: self._commit_batch(conn, batch)
+        conn.close()
+
+    def _commit_batch(self, conn, batch):
+        done = []; hooks = []
+        try:
+            started = time.perf_counter()
+            conn.execute('BEGIN IMMEDIATE')
+            for fut, func, args, kwargs in batch:
+                if not fut.set_running_or_notify_cancel(): continue
+                conn.execute('SAVEPOINT op'); _local.hooks = []
+                try:
+                    result = _timed(func, 'write', args, kwargs); conn.execute('RELEASE op'); done.append((fut, result, None)); hooks.extend(_local.hooks)
+                except Exception as e:
+                    conn.execute('ROLLBACK TO op'); conn.execute('RELEASE op'); done.append((fut, None, e))
+            conn.execute('COMMIT')
+            metrics.observe('db_commit_seconds', time.perf_counter() - started)
+        except Exception as e:
+            logger.error(f"DB group commit of {len(batch)} ops failed: {e}", exc_info=True)
+            if conn.in_transaction: conn.execute('ROLLBACK')
+            for fut, *_ in batch:
+                if fut.running() or (not fut.done() and fut.set_running_or_notify_cancel()): fut.set_exception(e)
+            return
+        finally: _local.hooks = None
+        for fn, args in hooks:
+            try: fn(*args)
+            except Exception as e: logger.error(f"after-commit hook {fn.__name__} failed: {e}", exc_info=True)
+        for fut, result, error in done:
+            if error is None: fut.set_result(result)
+            else: fut.set_exception(error)
+
+def _timed(func, kind, args, kwargs):
+    started = time.perf_counter()
+    try: return func(*args, **kwargs)
+    finally: metrics.observe('db_call_seconds', time.perf_counter() - started, func=getattr(func, '__name__', 'other'), kind=kind)
+
+def write_queue_depth():
+    return _writer.ops.qsize() if _writer is not None else 0
+
+def _after_commit(fn, *args):
+    """Runs fn once the current write is committed (dropped if it rolls back)."""
+    hooks = getattr(_local, 'hooks', None)
+    if hooks is None: fn(*args)
+    else: hooks.append((fn, args))
+
+# --- User cache: bounded LRU of users rows, invalidated after commit ---
+_user_cache = OrderedDict()
+_user_cache_fills = {}  # user_id -> token of an in-flight fill; invalidation cancels it
+_user_cache_lock = threading.Lock()
+_user_cache_hits = _user_cache_misses = 0
+
+def _invalidate_user(user_id):
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None); _user_cache_fills.pop(user_id, None)
+
+def _touch_user(user_id):
+    _after_commit(_invalidate_user, user_id)
+
+def user_cache_stats():
+    with _user_cache_lock:
+        total = _user_cache_hits + _user_cache_misses
+        return {'hits': _user_cache_hits, 'misses': _user_cache_misses, 'size': len(_user_cache), 'hit_rate': _user_cache_hits / total if total else 0.0}
+
+def _init_reader():
+    _local.read_only = True
+
+def _start():
+    global _writer, _readers
+    with _start_lock:
+        if _writer is None:
+            _writer = _Writer(); _writer.start()
+            _readers = ThreadPoolExecutor(max_workers=config.DB_READERS, thread_name_prefix='db-reader', initializer=_init_reader)
+
+def submit_write(func, *args, **kwargs):
+    """Queues a mutator on the writer thread; the Future resolves after its batch is committed."""
+    if _writer is None: _start()
+    return _writer.submit(func, args, kwargs)
+
+def write_sync(func, *args, **kwargs):
+    """Blocking variant of run_write for scripts and startup code."""
+    return submit_write(func, *args, **kwargs).result()
+
+async def run_write(func, *args, **kwargs):
+    return await asyncio.wrap_future(submit_write(func, *args, **kwargs))
+
+async def flush():
+    """Waits until every write queued so far is committed."""
+    if _writer is not None: await run_write(lambda: None)
+
+def close():
+    """Commits pending writes and stops the writer thread and reader pool."""
+    global _writer, _readers
+    with _start_lock:
+        if _writer is not None:
+            _writer.ops.put(None); _writer.join()
+            _readers.shutdown(wait=True)
+            _writer = _readers = None
 
 def _add_column_if_not_exists(cursor, table_name, column_name, column_type_with_default):
     cursor.execute(f"PRAGMA table_info({table_name})")
@@ -27,31 +164,161 @@ def _add_column_if_not_exists(cursor, table_name, column_name, column_type_with_
         logger.info(f"Adding column '{column_name}' to table '{table_name}'...")
         cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type_with_default}")
 
-def init_db():
-    conn = get_conn(); cur = conn.cursor()
+# --- Schema migrations ---
+# Each migration runs once, in its own transaction, and bumps PRAGMA user_version.
+# Never edit a shipped migration; append a new one instead.
+def _migration_1_baseline(cur):
+    # Databases created before versioning already have (parts of) this schema.
     cur.execute('''CREATE TABLE IF NOT EXISTS users (user_id INTEGER PRIMARY KEY, username TEXT, ingame_name TEXT, phone_number TEXT, is_registered INTEGER DEFAULT 0, balance REAL DEFAULT 0, welcome_given INTEGER DEFAULT 0, wins INTEGER DEFAULT 0, losses INTEGER DEFAULT 0, created_at TIMESTAMP, state TEXT, state_data TEXT, referrer_id INTEGER, elo_rating INTEGER DEFAULT 1000)''')
     _add_column_if_not_exists(cur, 'users', 'elo_rating', 'INTEGER DEFAULT 1000')
     _add_column_if_not_exists(cur, 'users', 'is_banned', 'INTEGER DEFAULT 0')
+    _add_column_if_not_exists(cur, 'users', 'is_blocked', 'INTEGER DEFAULT 0')
     cur.execute('''CREATE TABLE IF NOT EXISTS deposit_requests (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, txid TEXT, amount REAL, status TEXT DEFAULT 'pending', created_at INTEGER)''')
     cur.execute('''CREATE TABLE IF NOT EXISTS withdrawal_requests (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, amount REAL, method TEXT, account_number TEXT, status TEXT DEFAULT 'pending', created_at INTEGER)''')
     cur.execute('''CREATE TABLE IF NOT EXISTS transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, amount REAL, type TEXT, note TEXT, created_at INTEGER)''')
     cur.execute('''CREATE TABLE IF NOT EXISTS matchmaking_queue (user_id INTEGER PRIMARY KEY, fee REAL, joined_at INTEGER, lobby_message_id INTEGER)''')
     cur.execute('''CREATE TABLE IF NOT EXISTS active_matches (match_id TEXT PRIMARY KEY, player1_id INTEGER, player2_id INTEGER, fee REAL, status TEXT, room_code TEXT, created_at INTEGER, p1_screenshot_id TEXT, p2_screenshot_id TEXT, winner_id INTEGER)''')
     cur.execute('''CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)''')
-    conn.commit()
+    cur.execute('''CREATE TABLE IF NOT EXISTS broadcast_campaigns (id INTEGER PRIMARY KEY AUTOINCREMENT, text TEXT, parse_mode TEXT, status TEXT DEFAULT 'running', created_by INTEGER, created_at INTEGER, finished_at INTEGER, total INTEGER DEFAULT 0, sent INTEGER DEFAULT 0, failed INTEGER DEFAULT 0, blocked INTEGER DEFAULT 0)''')
+    cur.execute('''CREATE TABLE IF NOT EXISTS broadcast_recipients (campaign_id INTEGER, user_id INTEGER, status TEXT DEFAULT 'pending', PRIMARY KEY (campaign_id, user_id)) WITHOUT ROWID''')
+
+def _migration_2_indexes(cur):
+    # Leaderboard/top-N, registered-user counts and broadcast recipient selection.
+    cur.execute("CREATE INDEX idx_users_rank ON users (elo_rating DESC, wins DESC) WHERE is_registered = 1")
+    # Active-user window (covering: created_at range + distinct user_id) and per-user ledger history.
+    cur.execute("CREATE INDEX idx_transactions_created ON transactions (created_at, user_id)")
+    cur.execute("CREATE INDEX idx_transactions_user ON transactions (user_id, created_at)")
+    # Status counters and fee totals.
+    cur.execute("CREATE INDEX idx_matches_status ON active_matches (status, fee)")
+    cur.execute("CREATE INDEX idx_deposits_pending ON deposit_requests (created_at) WHERE status = 'pending'")
+    cur.execute("CREATE INDEX idx_withdrawals_pending ON withdrawal_requests (created_at) WHERE status = 'pending'")
+    cur.execute("CREATE INDEX idx_queue_fee ON matchmaking_queue (fee, joined_at)")
+
+def _migration_3_counters(cur):
+    cur.execute("CREATE TABLE counters (name TEXT PRIMARY KEY, value NUMERIC NOT NULL DEFAULT 0) WITHOUT ROWID")
+    _rebuild_counters(cur)
+    # `x IS 'v'` is 0/1 (never NULL), so each delta below is exact.
+    for sql in (
+        "CREATE TRIGGER trg_users_ins AFTER INSERT ON users WHEN NEW.is_registered IS 1 BEGIN UPDATE counters SET value = value + 1 WHERE name = 'registered_users'; END",
+        "CREATE TRIGGER trg_users_reg AFTER UPDATE OF is_registered ON users WHEN NEW.is_registered IS NOT OLD.is_registered BEGIN UPDATE counters SET value = value + (NEW.is_registered IS 1) - (OLD.is_registered IS 1) WHERE name = 'registered_users'; END",
+        "CREATE TRIGGER trg_users_del AFTER DELETE ON users WHEN OLD.is_registered IS 1 BEGIN UPDATE counters SET value = value - 1 WHERE name = 'registered_users'; END",
+        # Match totals are history: archiving/deleting a completed match must not lower them.
+        "CREATE TRIGGER trg_matches_ins AFTER INSERT ON active_matches WHEN NEW.status IS 'completed' BEGIN UPDATE counters SET value = value + 1 WHERE name = 'completed_matches'; UPDATE counters SET value = value + MAX(IFNULL(NEW.fee, 0), 0) WHERE name = 'fees_collected'; END",
+        "CREATE TRIGGER trg_matches_status AFTER UPDATE OF status ON active_matches WHEN (NEW.status IS 'completed') <> (OLD.status IS 'completed') BEGIN UPDATE counters SET value = value + (NEW.status IS 'completed') - (OLD.status IS 'completed') WHERE name = 'completed_matches'; UPDATE counters SET value = value + ((NEW.status IS 'completed') - (OLD.status IS 'completed')) * MAX(IFNULL(NEW.fee, 0), 0) WHERE name = 'fees_collected'; END",
+    ):
+        cur.execute(sql)
+    for table, name in (('deposit_requests', 'pending_deposits'), ('withdrawal_requests', 'pending_withdrawals')):
+        cur.execute(f"CREATE TRIGGER trg_{table}_ins AFTER INSERT ON {table} WHEN NEW.status IS 'pending' BEGIN UPDATE counters SET value = value + 1 WHERE name = '{name}'; END")
+        cur.execute(f"CREATE TRIGGER trg_{table}_status AFTER UPDATE OF status ON {table} WHEN (NEW.status IS 'pending') <> (OLD.status IS 'pending') BEGIN UPDATE counters SET value = value + (NEW.status IS 'pending') - (OLD.status IS 'pending') WHERE name = '{name}'; END")
+        cur.execute(f"CREATE TRIGGER trg_{table}_del AFTER DELETE ON {table} WHEN OLD.status IS 'pending' BEGIN UPDATE counters SET value = value - 1 WHERE name = '{name}'; END")
+    # Active users: last ledger activity per user instead of COUNT(DISTINCT) over transactions.
+    cur.execute("ALTER TABLE users ADD COLUMN last_tx_at INTEGER")
+    cur.execute("UPDATE users SET last_tx_at = (SELECT MAX(created_at) FROM transactions t WHERE t.user_id = users.user_id)")
+    cur.execute("CREATE INDEX idx_users_last_tx ON users (last_tx_at) WHERE last_tx_at IS NOT NULL")
+
+def _migration_4_match_deadlines(cur):
+    cur.execute("ALTER TABLE active_matches ADD COLUMN deadline_at INTEGER")
+    # Timers of matches started before this migration were in memory only; expire them from their start.
+    cur.execute("UPDATE active_matches SET deadline_at = created_at + ? WHERE status = 'in_progress'", (config.MATCH_TIMEOUT,))
+    cur.execute("CREATE INDEX idx_matches_deadline ON active_matches (deadline_at) WHERE status = 'in_progress'")
+
+def _migration_5_review_queue(cur):
+    # Matches with both screenshots wait for an admin; this is the pending-review queue.
+    cur.execute("CREATE INDEX idx_matches_review ON active_matches (status, created_at) WHERE p1_screenshot_id IS NOT NULL AND p2_screenshot_id IS NOT NULL")
+
+def _migration_6_conversations(cur):
+    # Startup reloads in-flight conversations; only a handful of users have a state at any time.
+    cur.execute("CREATE INDEX idx_users_state ON users (user_id) WHERE state IS NOT NULL")
+
+def _migration_7_archive(cur):
+    # Closed months of the ledger and finished matches move to compressed files (archive.py).
+    cur.execute("CREATE TABLE archive_segments (id INTEGER PRIMARY KEY, kind TEXT NOT NULL, period TEXT NOT NULL, path TEXT NOT NULL UNIQUE, rows INTEGER NOT NULL, first_id INTEGER, last_id INTEGER, created_at INTEGER)")
+    # Running balance of each user's archived ledger at the end of each archived month.
+    cur.execute("CREATE TABLE balance_checkpoints (user_id INTEGER NOT NULL, period TEXT NOT NULL, net REAL NOT NULL, tx_count INTEGER NOT NULL, balance REAL NOT NULL, PRIMARY KEY (user_id, period)) WITHOUT ROWID")
+    cur.execute("CREATE INDEX idx_matches_closed ON active_matches (created_at) WHERE status IN ('completed', 'cancelled')")
+
+def _migration_8_tournaments(cur):
+    # Tournament matches are ordinary active_matches rows; tournament_matches links them to their round.
+    cur.execute("CREATE TABLE tournaments (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, format TEXT NOT NULL, fee REAL NOT NULL DEFAULT 0, max_players INTEGER NOT NULL, rounds INTEGER, round INTEGER NOT NULL DEFAULT 0, status TEXT NOT NULL DEFAULT 'registering', created_at INTEGER, finished_at INTEGER, winner_id INTEGER)")
+    cur.execute("CREATE TABLE tournament_players (tournament_id INTEGER NOT NULL, user_id INTEGER NOT NULL, joined_at INTEGER, seed INTEGER, points REAL NOT NULL DEFAULT 0, slot INTEGER, byes INTEGER NOT NULL DEFAULT 0, eliminated_round INTEGER, place INTEGER, PRIMARY KEY (tournament_id, user_id)) WITHOUT ROWID")
+    cur.execute("CREATE TABLE tournament_matches (match_id TEXT PRIMARY KEY, tournament_id INTEGER NOT NULL, round INTEGER NOT NULL) WITHOUT ROWID")
+    cur.execute("CREATE INDEX idx_tournament_matches_round ON tournament_matches (tournament_id, round)")
+    cur.execute("CREATE INDEX idx_tournaments_open ON tournaments (id) WHERE status IN ('registering', 'running')")
+
+MIGRATIONS = [_migration_1_baseline, _migration_2_indexes, _migration_3_counters, _migration_4_match_deadlines, _migration_5_review_queue, _migration_6_conversations, _migration_7_archive, _migration_8_tournaments]
+
+def init_db():
+    conn = get_conn(); cur = conn.cursor()
+    cur.execute('PRAGMA journal_mode=WAL')
+    version = cur.execute('PRAGMA user_version').fetchone()[0]
+    for number, migrate in enumerate(MIGRATIONS[version:], start=version + 1):
+        logger.info(f"Applying DB migration {number}: {migrate.__name__}")
+        cur.execute('BEGIN')
+        try:
+            migrate(cur); cur.execute(f'PRAGMA user_version = {number}'); conn.commit()
+        except Exception:
+            conn.rollback(); raise
+    cur.execute('PRAGMA optimize')
+    load_settings_sync()
+
+# --- Settings cache: the whole settings table lives in memory ---
+# Loaded by init_db and replaced after each set_setting commits, so handlers never
+# query SQLite for a setting. Keys listed in CONFIG_OVERRIDES are config.py names:
+# a stored value replaces that config attribute at runtime; deleting it restores
+# the value from config.py.
+SETTING_DEFAULTS = {'free_play_status': 'off', 'rules_text': None}
+
+def _number_list(text):
+    values = [float(v) for v in str(text).replace(',', ' ').split()]
+    if not values or any(v <= 0 for v in values): raise ValueError(f"need positive numbers: {text!r}")
+    return [int(v) if v.is_integer() else v for v in values]
+
+CONFIG_OVERRIDES = {'FEE_TIERS': _number_list, 'MINIMUM_DEPOSIT': float, 'MINIMUM_WITHDRAWAL': float, 'REFERRAL_BONUS': float,
+                    'ELO_K_FACTOR': float, 'ELO_PROVISIONAL_K': float, 'ELO_PROVISIONAL_GAMES': int}
+_settings = {}
+_config_defaults = {name: getattr(config, name) for name in CONFIG_OVERRIDES}
+
+def _cache_setting(key, value):
+    if value is None: _settings.pop(key, None)
+    else: _settings[key] = value
+    if key in CONFIG_OVERRIDES:
+        setattr(config, key, _config_defaults[key] if value is None else CONFIG_OVERRIDES[key](value))
+
+def load_settings_sync():
+    """ডাটাবেস থেকে সব সেটিং ক্যাশে লোড করে (init_db থেকে কল হয়)।"""
+    cache_settings([tuple(r) for r in get_conn().execute("SELECT key, value FROM settings")])
+
+def cache_settings(rows):
+    """সেটিং ক্যাশ (key, value) সারি দিয়ে প্রতিস্থাপন করে; storage.MemoryStorage ও এটি ব্যবহার করে।"""
+    for key in list(_settings): _cache_setting(key, None)
+    for key, value in rows:
+        try: _cache_setting(key, value)
+        except ValueError as e: logger.error(f"Ignoring invalid setting {key}={value!r}: {e}")
+
+def setting(key, default=None):
+    """ক্যাশ থেকে সেটিং; `default` এর টাইপে রূপান্তরিত (bool: on/1/true)।"""
+    if default is None: default = SETTING_DEFAULTS.get(key)
+    value = _settings.get(key)
+    if value is None: return default
+    if default is None or isinstance(default, str): return value
+    if isinstance(default, bool): return value.lower() in ('on', '1', 'true', 'yes')
+    try: return type(default)(value)
+    except ValueError: return default
 
 def get_setting_sync(key):
     conn = get_conn(); cur = conn.cursor()
     cur.execute("SELECT value FROM settings WHERE key=?", (key,))
     row = cur.fetchone()
     return row['value'] if row else None
-async def get_setting(key): return await run_db(get_setting_sync, key)
+async def get_setting(key): return _settings.get(key)
 
 def set_setting_sync(key, value):
+    if key in CONFIG_OVERRIDES and value is not None: CONFIG_OVERRIDES[key](value)  # ValueError before anything is written
     conn = get_conn(); cur = conn.cursor()
-    cur.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
-    conn.commit()
-async def set_setting(key, value): await run_db(set_setting_sync, key, value)
+    if value is None: cur.execute("DELETE FROM settings WHERE key = ?", (key,))
+    else: cur.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, str(value)))
+    _after_commit(_cache_setting, key, None if value is None else str(value))
+async def set_setting(key, value): await run_write(set_setting_sync, key, value)
 
 def get_all_user_ids_sync():
     """নোটিফিকেশন পাঠানোর জন্য সকল রেজিস্টার্ড ব্যবহারকারীর আইডি সংগ্রহ করে।"""
@@ -61,8 +328,9 @@ def get_all_user_ids_sync():
 async def get_all_user_ids(): return await run_db(get_all_user_ids_sync)
 
 async def run_db(func, *args, **kwargs):
+    if _readers is None: _start()
     loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, lambda: func(*args, **kwargs))
+    return await loop.run_in_executor(_readers, _timed, func, 'read', args, kwargs)
 # ... (অন্যান্য সব ডাটাবেস ফাংশন অপরিবর্তিত) ...
 def create_user_if_not_exists_sync(user_id, username, referrer_id=None): 
     conn = get_conn(); cur = conn.cursor()
@@ -71,137 +339,530 @@ def create_user_if_not_exists_sync(user_id, username, referrer_id=None):
         cur.execute("SELECT changes()")
         if cur.fetchone()[0] > 0:
             cur.execute("UPDATE users SET referrer_id = ? WHERE user_id = ?", (referrer_id, user_id))
-    conn.commit()
+    _touch_user(user_id)
 async def create_user_if_not_exists(user_id, username, referrer_id=None): 
-    await run_db(create_user_if_not_exists_sync, user_id, username, referrer_id)
-def get_user_sync(user_id): 
+    await run_write(create_user_if_not_exists_sync, user_id, username, referrer_id)
+def _select_user(user_id):
     conn=get_conn();cur=conn.cursor();cur.execute('SELECT * FROM users WHERE user_id=?',(user_id,));r=cur.fetchone();return dict(r) if r else None
+def get_user_sync(user_id):
+    global _user_cache_hits, _user_cache_misses
+    if getattr(_local, 'is_writer', False): return _select_user(user_id)  # may see uncommitted rows
+    with _user_cache_lock:
+        row = _user_cache.get(user_id)
+        if row is not None:
+            _user_cache.move_to_end(user_id); _user_cache_hits += 1; return dict(row)
+        _user_cache_misses += 1; token = _user_cache_fills[user_id] = object()
+    row = _select_user(user_id)
+    with _user_cache_lock:
+        if _user_cache_fills.get(user_id) is token:
+            del _user_cache_fills[user_id]
+            if row is not None:
+                _user_cache[user_id] = dict(row)
+                if len(_user_cache) > config.USER_CACHE_SIZE: _user_cache.popitem(last=False)
+    return row
 async def get_user(user_id): return await run_db(get_user_sync, user_id)
+_RANK_FIELDS = {'is_registered', 'elo_rating', 'wins', 'ingame_name', 'username'}
+def _refresh_rank(user_id):
+    row = _select_user(user_id)
+    if row: leaderboard.board.upsert(row)
+def get_ranked_users_sync():
+    """স্টার্টআপে লিডারবোর্ড লোড করার জন্য সকল রেজিস্টার্ড ব্যবহারকারী।"""
+    conn = get_conn(); cur = conn.cursor()
+    cur.execute("SELECT user_id, ingame_name, username, wins, elo_rating FROM users WHERE is_registered = 1")
+    return [dict(r) for r in cur.fetchall()]
 def update_user_fields_sync(user_id, data): 
-    conn=get_conn();cur=conn.cursor();sets=','.join([f"{k}=?" for k in data.keys()]);params=list(data.values())+[user_id];cur.execute(f'UPDATE users SET {sets} WHERE user_id=?', params);conn.commit()
-async def update_user_fields(user_id, data): await run_db(update_user_fields_sync, user_id, data)
+    conn=get_conn();cur=conn.cursor();sets=','.join([f"{k}=?" for k in data.keys()]);params=list(data.values())+[user_id];cur.execute(f'UPDATE users SET {sets} WHERE user_id=?', params);_touch_user(user_id)
+    if _RANK_FIELDS.intersection(data): _after_commit(_refresh_rank, user_id)
+async def update_user_fields(user_id, data): await run_write(update_user_fields_sync, user_id, data)
 async def set_user_state(user_id, state, state_data=None): 
     await update_user_fields(user_id, {'state': state, 'state_data': state_data})
+def get_user_states_sync():
+    """চলমান কথোপকথন (state সহ সব ইউজার), স্টার্টআপে conversation.store এ লোড হয়।"""
+    return [tuple(r) for r in get_conn().execute("SELECT user_id, state, state_data FROM users WHERE state IS NOT NULL")]
+def save_user_states_sync(rows):
+    """(user_id, state, state_data) সারিগুলো এক ব্যাচে লেখে।"""
+    get_conn().executemany("UPDATE users SET state = ?, state_data = ? WHERE user_id = ?", [(state, data, user_id) for user_id, state, data in rows])
+    for user_id, *_ in rows: _touch_user(user_id)
+async def save_user_states(rows): await run_write(save_user_states_sync, rows)
+def _adjust_balance(cur, user_id, amount, tx_type, note):
+    _touch_user(user_id)
+    now=int(time.time());cur.execute('UPDATE users SET balance=balance+?, last_tx_at=? WHERE user_id=?',(amount,now,user_id));cur.execute('INSERT INTO transactions(user_id, amount, type, note, created_at) VALUES(?,?,?,?,?)',(user_id, amount, tx_type, note, now))
 def adjust_balance_sync(user_id, amount, tx_type='adjust', note=''): 
-    conn=get_conn();cur=conn.cursor();cur.execute('UPDATE users SET balance=balance+? WHERE user_id=?',(amount,user_id));cur.execute('INSERT INTO transactions(user_id, amount, type, note, created_at) VALUES(?,?,?,?,?)',(user_id, amount, tx_type, note, int(time.time())));conn.commit()
+    conn=get_conn();cur=conn.cursor();_adjust_balance(cur, user_id, amount, tx_type, note)
 async def adjust_balance(user_id, amount, tx_type='adjust', note=''): 
-    await run_db(adjust_balance_sync, user_id, amount, tx_type, note)
+    await run_write(adjust_balance_sync, user_id, amount, tx_type, note)
 def resolve_match_sync(match_id, winner_id): 
     conn=get_conn();cur=conn.cursor();match=get_match_sync(match_id)
-    if not match or match['status'] == 'completed': return False
+    if not match or match['status'] != 'in_progress': return False  # settled, expired or never started
     p1_id, p2_id, fee = match['player1_id'], match['player2_id'], match['fee']
     loser_id = p2_id if winner_id == p1_id else p1_id
     winner_user = get_user_sync(winner_id); loser_user = get_user_sync(loser_id)
     if winner_user and loser_user:
         winner_old_elo = winner_user.get('elo_rating', 1000); loser_old_elo = loser_user.get('elo_rating', 1000)
-        winner_new_elo = calculate_elo(winner_old_elo, loser_old_elo, 1)
-        loser_new_elo = calculate_elo(loser_old_elo, winner_old_elo, 0)
+        winner_new_elo = calculate_elo(winner_old_elo, loser_old_elo, 1, elo_k_factor((winner_user['wins'] or 0) + (winner_user['losses'] or 0)))
+        loser_new_elo = calculate_elo(loser_old_elo, winner_old_elo, 0, elo_k_factor((loser_user['wins'] or 0) + (loser_user['losses'] or 0)))
         cur.execute('UPDATE users SET elo_rating = ? WHERE user_id = ?', (winner_new_elo, winner_id))
         cur.execute('UPDATE users SET elo_rating = ? WHERE user_id = ?', (loser_new_elo, loser_id))
+        _after_commit(leaderboard.board.set_score, winner_id, winner_new_elo, (winner_user['wins'] or 0) + 1)
+        _after_commit(leaderboard.board.set_score, loser_id, loser_new_elo, loser_user['wins'] or 0)
     if fee > 0:
         prize = fee*2*0.9
-        adjust_balance_sync(winner_id, prize, 'match_win', f'Won match {match_id}')
+        _adjust_balance(cur, winner_id, prize, 'match_win', f'Won match {match_id}')
     cur.execute('UPDATE users SET wins = wins + 1 WHERE user_id=?',(winner_id,))
     cur.execute('UPDATE users SET losses = losses + 1 WHERE user_id=?',(loser_id,))
+    _touch_user(winner_id); _touch_user(loser_id)
     cur.execute("UPDATE active_matches SET status='completed', winner_id=? WHERE match_id=?",(winner_id, match_id))
-    conn.commit();return True
-async def resolve_match(match_id, winner_id): return await run_db(resolve_match_sync, match_id, winner_id)
+    return True
+async def resolve_match(match_id, winner_id): return await run_write(resolve_match_sync, match_id, winner_id)
 def get_top_wins_sync(limit=10): 
     conn=get_conn();cur=conn.cursor();cur.execute('SELECT ingame_name, username, wins, elo_rating FROM users WHERE is_registered=1 ORDER BY elo_rating DESC, wins DESC LIMIT ?',(limit,));return [dict(r) for r in cur.fetchall()]
 async def get_top_wins(limit=10): return await run_db(get_top_wins_sync, limit)
+
+# --- ELO replay (see elo_replay.py) ---
+def get_completed_matches_sync(exclude=()):
+    """`exclude` এর বাইরের সব completed ম্যাচ (created_at, rowid, winner_id, loser_id), পুরনোগুলো আগে।"""
+    # A full scan plus SQLite's sorter beats walking idx_matches_closed, which
+    # visits the table rows in random order; this runs offline, not per update.
+    cur = get_conn().cursor(); cur.row_factory = None
+    cur.execute("""SELECT created_at, rowid, winner_id, CASE WHEN winner_id = player1_id THEN player2_id ELSE player1_id END
+                   FROM active_matches NOT INDEXED WHERE status = 'completed' AND winner_id IS NOT NULL
+                   AND match_id NOT IN (SELECT value FROM json_each(?)) ORDER BY created_at, rowid""", (json.dumps(sorted(exclude)),))
+    return cur.fetchall()
+
+def get_elo_changes_sync(ratings, default):
+    """রিপ্লে করা রেটিং বর্তমানের সাথে তুলনা: বদলাবে এমন (user_id, old, new); যাদের হিসাবে কোনো ম্যাচ নেই তারা `default`।"""
+    cur = get_conn().cursor()
+    cur.execute('SELECT user_id, elo_rating FROM users')
+    return [(r['user_id'], r['elo_rating'], ratings.get(r['user_id'], default)) for r in cur.fetchall() if r['elo_rating'] != ratings.get(r['user_id'], default)]
+
+def set_elo_ratings_sync(ratings, default):
+    """রিপ্লে করা রেটিং এক ট্রানজ্যাকশনে লেখে ও লিডারবোর্ড নতুন করে লোড করে; বদলানো (user_id, old, new) ফেরত দেয়।"""
+    changes = get_elo_changes_sync(ratings, default)
+    get_conn().executemany('UPDATE users SET elo_rating = ? WHERE user_id = ?', [(new, user_id) for user_id, _, new in changes])
+    for user_id, _, _ in changes: _touch_user(user_id)
+    if changes: _after_commit(leaderboard.board.load, get_ranked_users_sync())
+    return changes
 def find_opponent_in_queue_sync(fee, player_id_to_exclude):
     conn = get_conn(); cur = conn.cursor()
     cur.execute('SELECT * FROM matchmaking_queue WHERE fee = ? AND user_id != ? ORDER BY joined_at ASC LIMIT 1', (fee, player_id_to_exclude))
     r = cur.fetchone(); return dict(r) if r else None
 async def find_opponent_in_queue(fee, player_id_to_exclude): return await run_db(find_opponent_in_queue_sync, fee, player_id_to_exclude)
 def create_deposit_request_sync(user_id, txid, amount): 
-    conn=get_conn();cur=conn.cursor();cur.execute('INSERT INTO deposit_requests(user_id,txid,amount,created_at) VALUES(?,?,?,?)',(user_id,txid,amount,int(time.time())));conn.commit(); return cur.lastrowid
-async def create_deposit_request(user_id, txid, amount): return await run_db(create_deposit_request_sync, user_id, txid, amount)
+    conn=get_conn();cur=conn.cursor();cur.execute('INSERT INTO deposit_requests(user_id,txid,amount,created_at) VALUES(?,?,?,?)',(user_id,txid,amount,int(time.time())));return cur.lastrowid
+async def create_deposit_request(user_id, txid, amount): return await run_write(create_deposit_request_sync, user_id, txid, amount)
 def get_deposit_request_sync(req_id): 
     conn=get_conn();cur=conn.cursor();cur.execute('SELECT * FROM deposit_requests WHERE id=?', (req_id,));r=cur.fetchone();return dict(r) if r else None
 async def get_deposit_request(req_id): return await run_db(get_deposit_request_sync, req_id)
 def update_deposit_status_sync(req_id, status): 
-    conn=get_conn();cur=conn.cursor();cur.execute('UPDATE deposit_requests SET status=? WHERE id=?',(status, req_id));conn.commit()
-async def update_deposit_status(req_id, status): await run_db(update_deposit_status_sync, req_id, status)
+    conn=get_conn();cur=conn.cursor();cur.execute('UPDATE deposit_requests SET status=? WHERE id=?',(status, req_id))
+async def update_deposit_status(req_id, status): await run_write(update_deposit_status_sync, req_id, status)
 def create_withdrawal_request_sync(user_id, amount, method, account_number): 
-    conn=get_conn();cur=conn.cursor();cur.execute('INSERT INTO withdrawal_requests(user_id, amount, method, account_number, created_at) VALUES(?,?,?,?,?)', (user_id, amount, method, account_number, int(time.time())));conn.commit(); return cur.lastrowid
-async def create_withdrawal_request(user_id, amount, method, account_number): return await run_db(create_withdrawal_request_sync, user_id, amount, method, account_number)
+    conn=get_conn();cur=conn.cursor();cur.execute('INSERT INTO withdrawal_requests(user_id, amount, method, account_number, created_at) VALUES(?,?,?,?,?)', (user_id, amount, method, account_number, int(time.time())));return cur.lastrowid
+async def create_withdrawal_request(user_id, amount, method, account_number): return await run_write(create_withdrawal_request_sync, user_id, amount, method, account_number)
 def get_withdrawal_request_sync(req_id): 
     conn=get_conn();cur=conn.cursor();cur.execute('SELECT * FROM withdrawal_requests WHERE id=?', (req_id,));r=cur.fetchone();return dict(r) if r else None
 async def get_withdrawal_request(req_id): return await run_db(get_withdrawal_request_sync, req_id)
 def update_withdrawal_status_sync(req_id, status): 
-    conn=get_conn();cur=conn.cursor();cur.execute('UPDATE withdrawal_requests SET status=? WHERE id=?',(status, req_id));conn.commit()
-async def update_withdrawal_status(req_id, status): await run_db(update_withdrawal_status_sync, req_id, status)
+    conn=get_conn();cur=conn.cursor();cur.execute('UPDATE withdrawal_requests SET status=? WHERE id=?',(status, req_id))
+async def update_withdrawal_status(req_id, status): await run_write(update_withdrawal_status_sync, req_id, status)
+
+# --- Bulk review of deposit/withdrawal requests ---
+# (kind, action) -> (new status, ledger type or None, ledger note, sign of the balance change)
+SETTLEMENTS = {
+    ('deposit', 'approve'): ('approved', 'deposit', 'Deposit ID {id}', 1),
+    ('deposit', 'reject'): ('rejected', None, None, 0),
+    ('withdrawal', 'approve'): ('approved', None, None, 0),  # the amount left the balance when the request was made
+    ('withdrawal', 'reject'): ('rejected', 'withdrawal_rejected', 'Withdrawal ID {id} rejected', 1),
+}
+REQUEST_TABLES = {'deposit': 'deposit_requests', 'withdrawal': 'withdrawal_requests'}
+
+def get_pending_requests_sync(kind, offset=0, limit=10):
+    """অপেক্ষমাণ অনুরোধের এক পেজ (পুরনোগুলো আগে) ও মোট সংখ্যা।"""
+    conn = get_conn(); cur = conn.cursor()
+    cur.execute(f"SELECT * FROM {REQUEST_TABLES[kind]} WHERE status = 'pending' ORDER BY created_at, id LIMIT ? OFFSET ?", (limit, offset))
+    rows = [dict(r) for r in cur.fetchall()]
+    return rows, _counter(f'pending_{kind}s')
+async def get_pending_requests(kind, offset=0, limit=10): return await run_db(get_pending_requests_sync, kind, offset, limit)
+
+def settle_requests_sync(kind, action, req_ids):
+    """অনেকগুলো অনুরোধ এক ট্রানজ্যাকশনে অনুমোদন/বাতিল করে; শুধু যেগুলো তখনও pending ছিল সেগুলো (dict) ফেরত দেয়।
+
+    status = 'pending' শর্ত একই UPDATE এ থাকায় একই অনুরোধ দুবার (দুই অ্যাডমিন বা দুই কমান্ডে) প্রক্রিয়া হয় না।
+    """
+    status, tx_type, note, sign = SETTLEMENTS[(kind, action)]
+    conn = get_conn(); cur = conn.cursor(); settled = []; ids = sorted(set(req_ids))
+    for i in range(0, len(ids), 500):  # stay well below SQLite's bound-parameter limit
+        chunk = ids[i:i + 500]
+        cur.execute(f"UPDATE {REQUEST_TABLES[kind]} SET status = ? WHERE status = 'pending' AND id IN ({','.join('?' * len(chunk))}) RETURNING id, user_id, amount",
+                    (status, *chunk))
+        settled += [dict(r) for r in cur.fetchall()]
+    settled.sort(key=lambda r: r['id'])
+    if tx_type:
+        now = int(time.time())
+        cur.executemany('UPDATE users SET balance = balance + ?, last_tx_at = ? WHERE user_id = ?', [(sign * r['amount'], now, r['user_id']) for r in settled])
+        cur.executemany('INSERT INTO transactions(user_id, amount, type, note, created_at) VALUES(?,?,?,?,?)',
+                        [(r['user_id'], sign * r['amount'], tx_type, note.format(id=r['id']), now) for r in settled])
+        for user_id in {r['user_id'] for r in settled}: _touch_user(user_id)
+    return settled
+async def settle_requests(kind, action, req_ids): return await run_write(settle_requests_sync, kind, action, req_ids)
 def add_to_queue_sync(user_id, fee, lobby_message_id): 
-    conn=get_conn();cur=conn.cursor();cur.execute('INSERT OR REPLACE INTO matchmaking_queue(user_id,fee,joined_at,lobby_message_id) VALUES(?,?,?,?)',(user_id,fee,int(time.time()),lobby_message_id));conn.commit()
-async def add_to_queue(user_id, fee, lobby_message_id): await run_db(add_to_queue_sync, user_id, fee, lobby_message_id)
+    conn=get_conn();cur=conn.cursor();cur.execute('INSERT OR REPLACE INTO matchmaking_queue(user_id,fee,joined_at,lobby_message_id) VALUES(?,?,?,?)',(user_id,fee,int(time.time()),lobby_message_id))
+async def add_to_queue(user_id, fee, lobby_message_id): await run_write(add_to_queue_sync, user_id, fee, lobby_message_id)
 def get_from_queue_sync(user_id): 
     conn=get_conn();cur=conn.cursor();cur.execute('SELECT * FROM matchmaking_queue WHERE user_id=?',(user_id,));r=cur.fetchone();return dict(r) if r else None
 async def get_from_queue(user_id): return await run_db(get_from_queue_sync, user_id)
 def remove_from_queue_sync(user_id): 
-    conn=get_conn();cur=conn.cursor();cur.execute('DELETE FROM matchmaking_queue WHERE user_id=?',(user_id,));conn.commit();return cur.rowcount > 0
-async def remove_from_queue(user_id): return await run_db(remove_from_queue_sync, user_id)
-def create_match_sync(p1_id, p2_id, fee): 
-    conn=get_conn();cur=conn.cursor();match_id=str(uuid.uuid4())[:8]
+    conn=get_conn();cur=conn.cursor();cur.execute('DELETE FROM matchmaking_queue WHERE user_id=?',(user_id,));return cur.rowcount > 0
+async def remove_from_queue(user_id): return await run_write(remove_from_queue_sync, user_id)
+def set_queue_lobby_message_sync(user_id, lobby_message_id):
+    conn=get_conn();cur=conn.cursor();cur.execute('UPDATE matchmaking_queue SET lobby_message_id=? WHERE user_id=?',(lobby_message_id, user_id))
+async def set_queue_lobby_message(user_id, lobby_message_id): await run_write(set_queue_lobby_message_sync, user_id, lobby_message_id)
+def get_queue_sync():
+    """স্টার্টআপে ম্যাচমেকিং ইঞ্জিন লোড করার জন্য পুরো কিউ (পুরাতন আগে)।"""
+    conn = get_conn(); cur = conn.cursor()
+    cur.execute('SELECT * FROM matchmaking_queue ORDER BY joined_at ASC')
+    return [dict(r) for r in cur.fetchall()]
+def _insert_match(cur, p1_id, p2_id, fee):
+    match_id=str(uuid.uuid4())[:8]
     cur.execute('INSERT INTO active_matches(match_id, player1_id, player2_id, fee, status, created_at) VALUES(?,?,?,?,?,?)',(match_id, p1_id, p2_id, fee, 'waiting_for_code', int(time.time())))
     if fee > 0:
-        adjust_balance_sync(p1_id, -fee, 'match_entry', f'Match {match_id}')
-        adjust_balance_sync(p2_id, -fee, 'match_entry', f'Match {match_id}')
-    conn.commit();return match_id
-async def create_match(p1_id, p2_id, fee): return await run_db(create_match_sync, p1_id, p2_id, fee)
+        _adjust_balance(cur, p1_id, -fee, 'match_entry', f'Match {match_id}')
+        _adjust_balance(cur, p2_id, -fee, 'match_entry', f'Match {match_id}')
+    return match_id
+def create_match_sync(p1_id, p2_id, fee): 
+    conn=get_conn();cur=conn.cursor();match_id=_insert_match(cur, p1_id, p2_id, fee);return match_id
+async def create_match(p1_id, p2_id, fee): return await run_write(create_match_sync, p1_id, p2_id, fee)
+def create_match_from_queue_sync(p1_id, p2_id, fee):
+    """ম্যাচমেকিং ইঞ্জিনের জোড়া একটি ট্রানজ্যাকশনে সংরক্ষণ করে: কিউ থেকে মুছে ম্যাচ তৈরি ও ফি কাটা।"""
+    conn = get_conn(); cur = conn.cursor()
+    cur.execute('DELETE FROM matchmaking_queue WHERE user_id IN (?, ?)', (p1_id, p2_id))
+    match_id = _insert_match(cur, p1_id, p2_id, fee)
+    return match_id
+async def create_match_from_queue(p1_id, p2_id, fee): return await run_write(create_match_from_queue_sync, p1_id, p2_id, fee)
 def set_room_code_sync(match_id, room_code): 
-    conn=get_conn();cur=conn.cursor();cur.execute("UPDATE active_matches SET room_code=?, status='in_progress' WHERE match_id=?", (room_code, match_id));conn.commit()
-async def set_room_code(match_id, room_code): await run_db(set_room_code_sync, match_id, room_code)
+    conn=get_conn();cur=conn.cursor();deadline_at=int(time.time())+config.MATCH_TIMEOUT;cur.execute("UPDATE active_matches SET room_code=?, status='in_progress', deadline_at=? WHERE match_id=?", (room_code, deadline_at, match_id));return deadline_at
+async def set_room_code(match_id, room_code): return await run_write(set_room_code_sync, match_id, room_code)
 def get_match_sync(match_id): 
     conn=get_conn();cur=conn.cursor();cur.execute('SELECT * FROM active_matches WHERE match_id=?',(match_id,));r=cur.fetchone();return dict(r) if r else None
 async def get_match(match_id): return await run_db(get_match_sync, match_id)
 def submit_screenshot_sync(match_id, player_id, screenshot_id): 
-    conn=get_conn();cur=conn.cursor();match=get_match_sync(match_id);is_p1=(player_id == match['player1_id']);field_to_update='p1_screenshot_id' if is_p1 else 'p2_screenshot_id';cur.execute(f'UPDATE active_matches SET {field_to_update}=? WHERE match_id=?',(screenshot_id, match_id));conn.commit();return get_match_sync(match_id)
-async def submit_screenshot(match_id, player_id, screenshot_id): return await run_db(submit_screenshot_sync, match_id, player_id, screenshot_id)
+    """চলমান ম্যাচে খেলোয়াড়ের স্ক্রিনশট রাখে; ম্যাচ আর চলমান না থাকলে (যেমন টাইমআউটে বাতিল) None।"""
+    conn=get_conn();cur=conn.cursor();match=get_match_sync(match_id)
+    if not match or match['status'] != 'in_progress': return None
+    is_p1=(player_id == match['player1_id']);field_to_update='p1_screenshot_id' if is_p1 else 'p2_screenshot_id';cur.execute(f'UPDATE active_matches SET {field_to_update}=? WHERE match_id=?',(screenshot_id, match_id));return get_match_sync(match_id)
+async def submit_screenshot(match_id, player_id, screenshot_id): return await run_write(submit_screenshot_sync, match_id, player_id, screenshot_id)
 def cancel_match_sync(match_id): 
-    conn=get_conn();cur=conn.cursor();cur.execute("UPDATE active_matches SET status='cancelled' WHERE match_id=?", (match_id,));conn.commit()
-async def cancel_match(match_id): await run_db(cancel_match_sync, match_id)
+    conn=get_conn();cur=conn.cursor();cur.execute("UPDATE active_matches SET status='cancelled' WHERE match_id=?", (match_id,))
+async def cancel_match(match_id): await run_write(cancel_match_sync, match_id)
+def get_pending_deadlines_sync():
+    """স্টার্টআপে টাইমআউট শিডিউলার লোড করার জন্য চলমান ম্যাচের ডেডলাইন (রিভিউয়ের অপেক্ষায় থাকাগুলো বাদে)।"""
+    conn = get_conn(); cur = conn.cursor()
+    cur.execute("SELECT match_id, deadline_at FROM active_matches WHERE status = 'in_progress' AND deadline_at IS NOT NULL AND (p1_screenshot_id IS NULL OR p2_screenshot_id IS NULL)")
+    return [(r['match_id'], r['deadline_at']) for r in cur.fetchall()]
+async def get_pending_deadlines(): return await run_db(get_pending_deadlines_sync)
+def match_expirable(match, now):
+    """চলমান ম্যাচ, অথবা ডেডলাইনসহ রুম কোডের অপেক্ষায় থাকা টুর্নামেন্ট ম্যাচ, যার সময় পেরিয়েছে।"""
+    if not match or (match['deadline_at'] or 0) > now: return False
+    return match['status'] == 'in_progress' or (match['status'] == 'waiting_for_code' and match['deadline_at'] is not None)
+def expire_matches_sync(match_ids):
+    """মেয়াদোত্তীর্ণ ম্যাচগুলো এক ট্রানজ্যাকশনে নিষ্পত্তি করে: একজন স্ক্রিনশট দিলে সে বিজয়ী, নইলে ফি ফেরত ও বাতিল।"""
+    conn = get_conn(); cur = conn.cursor(); now = int(time.time()); outcomes = []
+    for match_id in match_ids:
+        match = get_match_sync(match_id)
+        if not match_expirable(match, now): continue
+        p1, p2 = match['player1_id'], match['player2_id']
+        ss1, ss2 = match.get('p1_screenshot_id'), match.get('p2_screenshot_id')
+        if ss1 and ss2: continue  # waiting in the admin review queue
+        winner = p1 if ss1 and not ss2 else p2 if ss2 and not ss1 else None
+        if winner:
+            resolve_match_sync(match_id, winner)
+        else:
+            if match['fee'] > 0:
+                _adjust_balance(cur, p1, match['fee'], 'refund', f'Match {match_id} cancelled (timeout)')
+                _adjust_balance(cur, p2, match['fee'], 'refund', f'Match {match_id} cancelled (timeout)')
+            cancel_match_sync(match_id)
+        outcomes.append({'match_id': match_id, 'player1_id': p1, 'player2_id': p2, 'fee': match['fee'], 'winner_id': winner})
+    return outcomes
+async def expire_matches(match_ids): return await run_write(expire_matches_sync, match_ids)
+def get_pending_reviews_sync(limit=50):
+    """দুই স্ক্রিনশটই জমা হয়েছে এমন ম্যাচ, পুরনোগুলো আগে।"""
+    conn = get_conn(); cur = conn.cursor()
+    cur.execute("SELECT * FROM active_matches WHERE status = 'in_progress' AND p1_screenshot_id IS NOT NULL AND p2_screenshot_id IS NOT NULL ORDER BY created_at LIMIT ?", (limit,))
+    return [dict(r) for r in cur.fetchall()]
+async def get_pending_reviews(limit=50): return await run_db(get_pending_reviews_sync, limit)
 
 # --- NEW PERFORMANCE FUNCTIONS ---
+# Totals live in the `counters` table and are kept current by triggers (migration 3),
+# so they change in the same transaction as the rows they count.
+COUNTER_QUERIES = {
+    'registered_users': "SELECT COUNT(*) FROM users WHERE is_registered = 1",
+    # Archived matches are gone from active_matches; their totals were added to archived_* when they moved.
+    'completed_matches': "SELECT (SELECT COUNT(*) FROM active_matches WHERE status = 'completed') + IFNULL((SELECT value FROM counters WHERE name = 'archived_completed_matches'), 0)",
+    'fees_collected': "SELECT (SELECT IFNULL(SUM(fee), 0) FROM active_matches WHERE fee > 0 AND status = 'completed') + IFNULL((SELECT value FROM counters WHERE name = 'archived_fees_collected'), 0)",
+    'pending_deposits': "SELECT COUNT(*) FROM deposit_requests WHERE status = 'pending'",
+    'pending_withdrawals': "SELECT COUNT(*) FROM withdrawal_requests WHERE status = 'pending'",
+}
+ACTIVE_WINDOW = 7*86400
+
+def _rebuild_counters(cur):
+    for name, query in COUNTER_QUERIES.items():
+        cur.execute("INSERT OR REPLACE INTO counters (name, value) VALUES (?, (%s))" % query, (name,))
+
+def rebuild_counters_sync():
+    """কাউন্টার ভুল হলে পুরো টেবিল থেকে আবার গণনা করে (ধীর, শুধু মেরামতের জন্য)।"""
+    conn = get_conn(); cur = conn.cursor()
+    _rebuild_counters(cur)
+async def rebuild_counters(): await run_write(rebuild_counters_sync)
+
+def _counter(name):
+    conn = get_conn(); cur = conn.cursor()
+    cur.execute("SELECT value FROM counters WHERE name = ?", (name,))
+    row = cur.fetchone(); return row['value'] if row else 0
+
+def get_stats_sync():
+    """/stats এর সব সংখ্যা এক রিডে: কাউন্টার টেবিল + সক্রিয় ব্যবহারকারী (ইনডেক্স রেঞ্জ)।"""
+    conn = get_conn(); cur = conn.cursor()
+    cur.execute("SELECT name, value FROM counters")
+    stats = {name: 0 for name in COUNTER_QUERIES}
+    stats.update({r['name']: r['value'] for r in cur.fetchall() if r['name'] in stats})
+    stats['active_users'] = get_active_users_sync()
+    return stats
+async def get_stats(): return await run_db(get_stats_sync)
+
 def get_total_users_sync():
     """মোট রেজিস্টার্ড ব্যবহারকারী সংখ্যা।"""
-    conn = get_conn(); cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) as count FROM users WHERE is_registered = 1")
-    return cur.fetchone()['count']
+    return _counter('registered_users')
 async def get_total_users(): return await run_db(get_total_users_sync)
 
 def get_active_users_sync():
     """গত ৭ দিনে সক্রিয় ব্যবহারকারী।"""
     conn = get_conn(); cur = conn.cursor()
-    cur.execute("SELECT COUNT(DISTINCT user_id) as count FROM transactions WHERE created_at > ?", (int(time.time()) - 7*86400,))
+    cur.execute("SELECT COUNT(*) as count FROM users WHERE last_tx_at > ?", (int(time.time()) - ACTIVE_WINDOW,))
     return cur.fetchone()['count']
 async def get_active_users(): return await run_db(get_active_users_sync)
 
 def get_total_matches_sync():
     """মোট খেলা সংখ্যা।"""
-    conn = get_conn(); cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) as count FROM active_matches WHERE status = 'completed'")
-    return cur.fetchone()['count']
+    return _counter('completed_matches')
 async def get_total_matches(): return await run_db(get_total_matches_sync)
 
 def get_pending_deposits_count_sync():
     """অপেক্ষণীয় ডিপোজিট সংখ্যা।"""
-    conn = get_conn(); cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) as count FROM deposit_requests WHERE status = 'pending'")
-    return cur.fetchone()['count']
+    return _counter('pending_deposits')
 async def get_pending_deposits_count(): return await run_db(get_pending_deposits_count_sync)
 
 def get_pending_withdrawals_count_sync():
     """অপেক্ষণীয় উইথড্র সংখ্যা।"""
-    conn = get_conn(); cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) as count FROM withdrawal_requests WHERE status = 'pending'")
-    return cur.fetchone()['count']
+    return _counter('pending_withdrawals')
 async def get_pending_withdrawals_count(): return await run_db(get_pending_withdrawals_count_sync)
 
 def get_total_fees_collected_sync():
     """সংগৃহীত মোট ফি।"""
-    conn = get_conn(); cur = conn.cursor()
-    cur.execute("SELECT SUM(fee) as total FROM active_matches WHERE fee > 0 AND status = 'completed'")
-    result = cur.fetchone()['total']
-    return result or 0
+    return _counter('fees_collected')
 async def get_total_fees_collected(): return await run_db(get_total_fees_collected_sync)
+
+# --- Archive (see archive.py) ---
+CLOSED_MATCH_STATUSES = ('completed', 'cancelled')
+
+def get_archivable_transactions_sync(before, limit):
+    """`before` এর আগের লেজার সারি, পুরোনোগুলো আগে।"""
+    cur = get_conn().execute("SELECT * FROM transactions WHERE created_at < ? ORDER BY created_at, user_id, id LIMIT ?", (before, limit))
+    return [dict(r) for r in cur.fetchall()]
+
+def get_archivable_matches_sync(before, limit):
+    """`before` এর আগে তৈরি শেষ হওয়া (completed/cancelled) ম্যাচ, পুরোনোগুলো আগে।"""
+    # Without the hint the planner prefers idx_matches_status and sorts every finished match.
+    cur = get_conn().execute("SELECT rowid AS rid, * FROM active_matches INDEXED BY idx_matches_closed WHERE status IN ('completed', 'cancelled') AND created_at < ? ORDER BY created_at LIMIT ?", (before, limit))
+    return [dict(r) for r in cur.fetchall()]
+
+def _record_segments(cur, kind, segments):
+    now = int(time.time())
+    cur.executemany("INSERT OR REPLACE INTO archive_segments (kind, period, path, rows, first_id, last_id, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(kind, period, path, rows, first_id, last_id, now) for period, path, rows, first_id, last_id in segments])
+
+def archive_transactions_sync(rows, segments):
+    """আর্কাইভ ফাইলে লেখা লেজার সারি মুছে দেয় এবং ব্যালেন্স চেকপয়েন্ট হালনাগাদ করে (এক ট্রানজ্যাকশনে)।
+
+    `rows` must be in created_at order so that months are checkpointed oldest first.
+    Each checkpoint's balance is the previous month's balance plus this month's net.
+    """
+    cur = get_conn().cursor(); per_month = {}
+    for r in rows:
+        entry = per_month.setdefault((r['user_id'], datetime.fromtimestamp(r['created_at']).strftime('%Y-%m')), [0.0, 0])
+        entry[0] += r['amount'] or 0; entry[1] += 1
+    cur.executemany("""INSERT INTO balance_checkpoints (user_id, period, net, tx_count, balance)
+        SELECT ?1, ?2, ?3, ?4, ?3 + IFNULL((SELECT balance FROM balance_checkpoints WHERE user_id = ?1 AND period < ?2 ORDER BY period DESC LIMIT 1), 0) WHERE true
+        ON CONFLICT (user_id, period) DO UPDATE SET net = net + excluded.net, tx_count = tx_count + excluded.tx_count, balance = balance + excluded.net""",
+        [(user_id, period, net, count) for (user_id, period), (net, count) in sorted(per_month.items(), key=lambda kv: kv[0][1])])
+    cur.executemany("DELETE FROM transactions WHERE id = ?", [(r['id'],) for r in rows])
+    if cur.rowcount != len(rows): raise RuntimeError(f"Ledger changed while archiving: deleted {cur.rowcount} of {len(rows)} rows")
+    _record_segments(cur, 'transactions', segments)
+
+def archive_matches_sync(rows, segments):
+    """আর্কাইভ ফাইলে লেখা শেষ হওয়া ম্যাচ মুছে দেয়; মোট ম্যাচ/ফি কাউন্টার অপরিবর্তিত থাকে।"""
+    cur = get_conn().cursor()
+    cur.executemany("DELETE FROM active_matches WHERE rowid = ? AND status = ?", [(r['rid'], r['status']) for r in rows])
+    if cur.rowcount != len(rows): raise RuntimeError(f"Matches changed while archiving: deleted {cur.rowcount} of {len(rows)} rows")
+    completed = [r for r in rows if r['status'] == 'completed']
+    for name, delta in (('archived_completed_matches', len(completed)), ('archived_fees_collected', sum(max(r['fee'] or 0, 0) for r in completed))):
+        cur.execute("INSERT INTO counters (name, value) VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = value + excluded.value", (name, delta))
+    _record_segments(cur, 'matches', segments)
+
+def get_archive_segments_sync(kind=None):
+    cur = get_conn().execute("SELECT * FROM archive_segments WHERE ?1 IS NULL OR kind = ?1 ORDER BY kind, period, first_id", (kind,))
+    return [dict(r) for r in cur.fetchall()]
+
+def audit_user_sync(user_id):
+    """ব্যালেন্স বনাম লেজার: সর্বশেষ আর্কাইভ চেকপয়েন্ট + হট লেজারের যোগফল।"""
+    conn = get_conn()
+    checkpoint = conn.execute("SELECT period, balance, (SELECT IFNULL(SUM(tx_count), 0) FROM balance_checkpoints WHERE user_id = ?1) AS tx_count FROM balance_checkpoints WHERE user_id = ?1 ORDER BY period DESC LIMIT 1", (user_id,)).fetchone()
+    hot = conn.execute("SELECT IFNULL(SUM(amount), 0) AS total, COUNT(*) AS n FROM transactions WHERE user_id = ?", (user_id,)).fetchone()
+    user = conn.execute("SELECT balance FROM users WHERE user_id = ?", (user_id,)).fetchone()
+    archived = checkpoint['balance'] if checkpoint else 0.0
+    return {'balance': user['balance'] if user else None, 'archived_through': checkpoint['period'] if checkpoint else None,
+            'archived_total': archived, 'archived_count': checkpoint['tx_count'] if checkpoint else 0,
+            'hot_total': hot['total'], 'hot_count': hot['n'], 'ledger_total': archived + hot['total']}
+async def audit_user(user_id): return await run_db(audit_user_sync, user_id)
+
+# --- Broadcast campaigns ---
+def create_campaign_sync(text, parse_mode, created_by):
+    """নতুন ক্যাম্পেইন তৈরি করে এবং প্রাপকদের তালিকা (ব্লক করা ব্যবহারকারী বাদে) সংরক্ষণ করে।"""
+    conn = get_conn(); cur = conn.cursor()
+    cur.execute("INSERT INTO broadcast_campaigns (text, parse_mode, created_by, created_at) VALUES (?, ?, ?, ?)", (text, parse_mode, created_by, int(time.time())))
+    campaign_id = cur.lastrowid
+    cur.execute("INSERT INTO broadcast_recipients (campaign_id, user_id) SELECT ?, user_id FROM users WHERE is_registered = 1 AND is_blocked = 0", (campaign_id,))
+    cur.execute("UPDATE broadcast_campaigns SET total = ? WHERE id = ?", (cur.rowcount, campaign_id))
+    return campaign_id
+async def create_campaign(text, parse_mode, created_by): return await run_write(create_campaign_sync, text, parse_mode, created_by)
+
+def get_campaign_sync(campaign_id=None):
+    """একটি ক্যাম্পেইন, অথবা আইডি না দিলে সর্বশেষটি।"""
+    conn = get_conn(); cur = conn.cursor()
+    if campaign_id is None: cur.execute("SELECT * FROM broadcast_campaigns ORDER BY id DESC LIMIT 1")
+    else: cur.execute("SELECT * FROM broadcast_campaigns WHERE id = ?", (campaign_id,))
+    r = cur.fetchone(); return dict(r) if r else None
+async def get_campaign(campaign_id=None): return await run_db(get_campaign_sync, campaign_id)
+
+def get_running_campaign_ids_sync():
+    conn = get_conn(); cur = conn.cursor()
+    cur.execute("SELECT id FROM broadcast_campaigns WHERE status = 'running' ORDER BY id")
+    return [r['id'] for r in cur.fetchall()]
+async def get_running_campaign_ids(): return await run_db(get_running_campaign_ids_sync)
+
+def get_pending_recipients_sync(campaign_id, after_user_id, limit):
+    """কার্সর অনুযায়ী পরবর্তী পাঠানো-বাকি প্রাপকদের আইডি।"""
+    conn = get_conn(); cur = conn.cursor()
+    cur.execute("SELECT user_id FROM broadcast_recipients WHERE campaign_id = ? AND user_id > ? AND status = 'pending' ORDER BY user_id LIMIT ?", (campaign_id, after_user_id, limit))
+    return [r['user_id'] for r in cur.fetchall()]
+async def get_pending_recipients(campaign_id, after_user_id, limit): return await run_db(get_pending_recipients_sync, campaign_id, after_user_id, limit)
+
+def record_broadcast_results_sync(campaign_id, results):
+    """এক ব্যাচ প্রাপকের ফলাফল (sent/failed/blocked) ও ক্যাম্পেইন কাউন্টার একসাথে আপডেট করে।"""
+    conn = get_conn(); cur = conn.cursor()
+    cur.executemany("UPDATE broadcast_recipients SET status = ? WHERE campaign_id = ? AND user_id = ?", [(status, campaign_id, uid) for uid, status in results])
+    counts = {s: sum(1 for _, st in results if st == s) for s in ('sent', 'failed', 'blocked')}
+    cur.execute("UPDATE broadcast_campaigns SET sent = sent + ?, failed = failed + ?, blocked = blocked + ? WHERE id = ?", (counts['sent'], counts['failed'], counts['blocked'], campaign_id))
+    blocked = [uid for uid, st in results if st == 'blocked']
+    cur.executemany("UPDATE users SET is_blocked = 1 WHERE user_id = ?", [(uid,) for uid in blocked])
+    for uid in blocked: _touch_user(uid)
+async def record_broadcast_results(campaign_id, results): await run_write(record_broadcast_results_sync, campaign_id, results)
+
+def finish_campaign_sync(campaign_id, status='done'):
+    conn = get_conn(); cur = conn.cursor()
+    cur.execute("UPDATE broadcast_campaigns SET status = ?, finished_at = ? WHERE id = ?", (status, int(time.time()), campaign_id))
+async def finish_campaign(campaign_id, status='done'): await run_write(finish_campaign_sync, campaign_id, status)
+
+# --- Tournaments (see tournament.py) ---
+def create_tournament_sync(name, fmt, fee, max_players, rounds=None):
+    cur = get_conn().cursor()
+    cur.execute("INSERT INTO tournaments (name, format, fee, max_players, rounds, created_at) VALUES (?, ?, ?, ?, ?, ?)", (name, fmt, fee, max_players, rounds, int(time.time())))
+    return cur.lastrowid
+async def create_tournament(name, fmt, fee, max_players, rounds=None): return await run_write(create_tournament_sync, name, fmt, fee, max_players, rounds)
+
+def get_tournament_sync(tournament_id):
+    r = get_conn().execute("SELECT * FROM tournaments WHERE id = ?", (tournament_id,)).fetchone(); return dict(r) if r else None
+async def get_tournament(tournament_id): return await run_db(get_tournament_sync, tournament_id)
+
+def get_open_tournaments_sync():
+    """রেজিস্ট্রেশন চলছে বা খেলা চলছে এমন টুর্নামেন্ট, পুরনোগুলো আগে।"""
+    cur = get_conn().execute("SELECT * FROM tournaments WHERE status IN ('registering', 'running') ORDER BY id")
+    return [dict(r) for r in cur.fetchall()]
+async def get_open_tournaments(): return await run_db(get_open_tournaments_sync)
+
+def join_tournament_sync(tournament_id, user_id):
+    """এন্ট্রি ফি কেটে খেলোয়াড় যোগ করে; 'joined', 'closed', 'full', 'already' বা 'balance' ফেরত দেয়।"""
+    cur = get_conn().cursor(); t = get_tournament_sync(tournament_id)
+    if not t or t['status'] != 'registering': return 'closed'
+    if cur.execute("SELECT 1 FROM tournament_players WHERE tournament_id = ? AND user_id = ?", (tournament_id, user_id)).fetchone(): return 'already'
+    if cur.execute("SELECT COUNT(*) FROM tournament_players WHERE tournament_id = ?", (tournament_id,)).fetchone()[0] >= t['max_players']: return 'full'
+    user = get_user_sync(user_id)
+    if not user or user['balance'] < t['fee']: return 'balance'
+    cur.execute("INSERT INTO tournament_players (tournament_id, user_id, joined_at) VALUES (?, ?, ?)", (tournament_id, user_id, int(time.time())))
+    if t['fee'] > 0: _adjust_balance(cur, user_id, -t['fee'], 'tournament_entry', f'Tournament {tournament_id}')
+    return 'joined'
+async def join_tournament(tournament_id, user_id): return await run_write(join_tournament_sync, tournament_id, user_id)
+
+def cancel_tournament_sync(tournament_id):
+    """রেজিস্ট্রেশন চলাকালীন টুর্নামেন্ট বাতিল করে সবার ফি ফেরত দেয়; খেলোয়াড়দের আইডি, অথবা বাতিলযোগ্য না হলে None।"""
+    cur = get_conn().cursor(); t = get_tournament_sync(tournament_id)
+    if not t or t['status'] != 'registering': return None
+    user_ids = [r[0] for r in cur.execute("SELECT user_id FROM tournament_players WHERE tournament_id = ?", (tournament_id,)).fetchall()]
+    if t['fee'] > 0:
+        for user_id in user_ids: _adjust_balance(cur, user_id, t['fee'], 'refund', f'Tournament {tournament_id} cancelled')
+    cur.execute("UPDATE tournaments SET status = 'cancelled', finished_at = ? WHERE id = ?", (int(time.time()), tournament_id))
+    return user_ids
+async def cancel_tournament(tournament_id): return await run_write(cancel_tournament_sync, tournament_id)
+
+TOURNAMENT_PLAYER_FIELDS = ('seed', 'points', 'slot', 'byes', 'eliminated_round', 'place')
+
+def get_tournament_players_sync(tournament_id):
+    """টুর্নামেন্টের খেলোয়াড়, বর্তমান ELO ও নামসহ (ক্রম নির্দিষ্ট নয়)।"""
+    cur = get_conn().execute("""SELECT p.*, u.ingame_name, u.username, u.elo_rating FROM tournament_players p
+                                JOIN users u ON u.user_id = p.user_id WHERE p.tournament_id = ?""", (tournament_id,))
+    return [dict(r) for r in cur.fetchall()]
+async def get_tournament_players(tournament_id): return await run_db(get_tournament_players_sync, tournament_id)
+
+def get_tournament_matches_sync(tournament_id, round=None):
+    """টুর্নামেন্টের ম্যাচ (সব রাউন্ড, অথবা শুধু `round`), প্রতিটিতে রাউন্ড নম্বরসহ।"""
+    sql = "SELECT m.*, t.round FROM tournament_matches t JOIN active_matches m ON m.match_id = t.match_id WHERE t.tournament_id = ?"
+    cur = get_conn().execute(sql, (tournament_id,)) if round is None else get_conn().execute(sql + " AND t.round = ?", (tournament_id, round))
+    return [dict(r) for r in cur.fetchall()]
+async def get_tournament_matches(tournament_id, round=None): return await run_db(get_tournament_matches_sync, tournament_id, round)
+
+def _save_tournament_players(cur, tournament_id, players):
+    cur.executemany(f"UPDATE tournament_players SET {', '.join(f'{k} = ?' for k in TOURNAMENT_PLAYER_FIELDS)} WHERE tournament_id = ? AND user_id = ?",
+                    [tuple(p[k] for k in TOURNAMENT_PLAYER_FIELDS) + (tournament_id, p['user_id']) for p in players])
+
+def start_tournament_round_sync(tournament_id, round, rounds, players, pairs, deadline_at):
+    """একটি রাউন্ডের সব ম্যাচ এক ট্রানজ্যাকশনে তৈরি করে ও খেলোয়াড়দের অবস্থা লেখে; জোড়ার ক্রমে match_id ফেরত দেয়।"""
+    cur = get_conn().cursor(); now = int(time.time())
+    _save_tournament_players(cur, tournament_id, players)
+    match_ids = [str(uuid.uuid4())[:8] for _ in pairs]
+    cur.executemany("INSERT INTO active_matches (match_id, player1_id, player2_id, fee, status, created_at, deadline_at) VALUES (?, ?, ?, 0, 'waiting_for_code', ?, ?)",
+                    [(match_id, p1, p2, now, deadline_at) for match_id, (p1, p2) in zip(match_ids, pairs)])
+    cur.executemany("INSERT INTO tournament_matches (match_id, tournament_id, round) VALUES (?, ?, ?)", [(match_id, tournament_id, round) for match_id in match_ids])
+    cur.execute("UPDATE tournaments SET status = 'running', round = ?, rounds = ? WHERE id = ?", (round, rounds, tournament_id))
+    return match_ids
+async def start_tournament_round(tournament_id, round, rounds, players, pairs, deadline_at):
+    return await run_write(start_tournament_round_sync, tournament_id, round, rounds, players, pairs, deadline_at)
+
+def finish_tournament_sync(tournament_id, players, payouts):
+    """চূড়ান্ত অবস্থান লেখে ও পুরস্কার (user_id, amount) এক ট্রানজ্যাকশনে দেয়।"""
+    cur = get_conn().cursor(); t = get_tournament_sync(tournament_id)
+    if not t or t['status'] != 'running': return False
+    _save_tournament_players(cur, tournament_id, players)
+    for user_id, amount in payouts: _adjust_balance(cur, user_id, amount, 'tournament_prize', f'Tournament {tournament_id}')
+    winner = next((p['user_id'] for p in players if p['place'] == 1), None)
+    cur.execute("UPDATE tournaments SET status = 'finished', finished_at = ?, winner_id = ? WHERE id = ?", (int(time.time()), winner, tournament_id))
+    return True
+async def finish_tournament(tournament_id, players, payouts): return await run_write(finish_tournament_sync, tournament_id, players, payouts)
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='ডাটাবেস রক্ষণাবেক্ষণ')
+    parser.add_argument('--rebuild-counters', action='store_true', help='/stats কাউন্টারগুলো টেবিল থেকে পুনরায় গণনা করুন')
+    args = parser.parse_args()
+    init_db()
+    if args.rebuild_counters:
+        write_sync(rebuild_counters_sync); close()
+        print(get_stats_sync())
@@ -0,0 +1,95 @@
+# dispatcher.py - Concurrent update processing, serialized per user
+import asyncio, time
+from collections import OrderedDict
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+import config, floodcontrol
+
+def serialization_key(update):
+    """Updates sharing a key run strictly in arrival order; None runs unordered."""
+    if isinstance(update, Update):
+        if update.effective_user: return update.effective_user.id
+        if update.effective_chat: return update.effective_chat.id
+    return None
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Runs updates from different users in parallel, each user's updates in order.
+
+    PTB starts one task per update in arrival order and admits up to
+    `max_pending` of them (the base class semaphore, FIFO). Each admitted update
+    then waits on its user's lock (FIFO as well, so order is kept) and finally on
+    one of `workers` slots. Waiting on a busy user never occupies a worker, so a
+    slow handler only delays that user's own later updates.
+
+    Queueing delay (admission -> handler start) is tracked per key. `gate(update)`
+    (floodcontrol.guard.check) runs first; an update it returns a reason for is
+    dropped before it waits for anything.
+    """
+
+    def __init__(self, workers, max_pending=None, tracked_keys=10000, gate=None):
+        super().__init__(max_pending or workers * 16)
+        self.workers = workers
+        self.gate = gate
+        self._slots = None
+        self._locks = {}          # key -> [asyncio.Lock, pending count]
+        self._delays = OrderedDict()  # key -> [count, total, max, last] (LRU, tracked_keys entries)
+        self._tracked_keys = tracked_keys
+        self.processed = self.shed = 0
+        self.total_delay = self.max_delay = 0.0
+
+    async def initialize(self):
+        self._slots = asyncio.Semaphore(self.workers)
+
+    async def shutdown(self):
+        pass
+
+    async def do_process_update(self, update, coroutine):
+        if self.gate is not None and self.gate(update):
+            coroutine.close(); self.shed += 1; return
+        queued_at = time.perf_counter()
+        key = serialization_key(update)
+        if key is None:
+            async with self._slots:
+                self._record(key, time.perf_counter() - queued_at)
+                await coroutine
+            return
+        entry = self._locks.get(key)
+        if entry is None: entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0], self._slots:
+                self._record(key, time.perf_counter() - queued_at)
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]: del self._locks[key]
+
+    def _record(self, key, delay):
+        self.processed += 1; self.total_delay += delay; self.max_delay = max(self.max_delay, delay)
+        if key is None: return
+        stats = self._delays.get(key)
+        if stats is None:
+            stats = self._delays[key] = [0, 0.0, 0.0, 0.0]
+            if len(self._delays) > self._tracked_keys: self._delays.popitem(last=False)
+        else: self._delays.move_to_end(key)
+        stats[0] += 1; stats[1] += delay; stats[2] = max(stats[2], delay); stats[3] = delay
+
+    @property
+    def busy_keys(self): return len(self._locks)
+
+    def key_stats(self, key):
+        stats = self._delays.get(key)
+        return stats and {'count': stats[0], 'avg': stats[1] / stats[0], 'max': stats[2], 'last': stats[3]}
+
+    def slowest_keys(self, limit=5):
+        """Keys with the highest average queueing delay (recently active keys only)."""
+        ranked = sorted(self._delays.items(), key=lambda kv: kv[1][1] / kv[1][0], reverse=True)[:limit]
+        return [(key, self.key_stats(key)) for key, _ in ranked]
+
+    def stats(self):
+        return {'workers': self.workers, 'active': self.current_concurrent_updates, 'busy_keys': self.busy_keys,
+                'processed': self.processed, 'shed': self.shed, 'avg_delay': self.total_delay / self.processed if self.processed else 0.0,
+                'max_delay': self.max_delay}
+
+def build_processor():
+    return PerUserUpdateProcessor(config.CONCURRENT_UPDATES, config.UPDATE_MAX_PENDING, gate=floodcontrol.guard.check)
@@ -0,0 +1,186 @@
+# elo_replay.py - Recomputes every player's ELO rating by replaying the completed match history
+import argparse, heapq, logging, time
+import config, db, archive
+
+try: import numpy as np
+except ImportError: np = None
+
+logger = logging.getLogger(__name__)
+
+INITIAL_RATING = 1000          # users.elo_rating default
+EXCLUDED_SETTING = 'elo_excluded_matches'
+MIN_WAVE_SIZE = 8              # narrower waves are cheaper as a plain loop than as NumPy calls
+
+def excluded_matches():
+    """Match ids left out of every replay (space separated in the settings table)."""
+    return set((db.setting(EXCLUDED_SETTING) or '').split())
+
+def load_history(exclude=()):
+    """(user_ids, winners, losers, version): completed matches in created_at order.
+
+    Players are dense indices into user_ids. Archived matches are merged with
+    the live table by (created_at, rowid), so a match resolved after its month
+    was archived still lands in its place. `version` is the completed-match
+    counter at load time; applying refuses to write if it has moved since.
+    """
+    version = db.get_total_matches_sync(); exclude = set(exclude)
+    archived = sorted((r['created_at'], r['rid'], r['winner_id'], r['player2_id'] if r['winner_id'] == r['player1_id'] else r['player1_id'])
+                      for s in db.get_archive_segments_sync('matches') for r in archive.read_segment(s['path'])
+                      if r['status'] == 'completed' and r['winner_id'] is not None and r['match_id'] not in exclude)
+    live = db.get_completed_matches_sync(exclude)
+    rows = list(heapq.merge(archived, live)) if archived else live
+    winners = [r[2] for r in rows]; losers = [r[3] for r in rows]
+    index = {user_id: i for i, user_id in enumerate(set(winners).union(losers))}
+    winners = list(map(index.__getitem__, winners)); losers = list(map(index.__getitem__, losers))
+    return list(index), winners, losers, version
+
+def waves(winners, losers, players):
+    """Wave of each match: one past the latest wave of either player.
+
+    Matches of one wave share no player, so they can be rated together, and
+    every player still meets their opponents in the original order.
+    """
+    last = [0] * players; out = []; append = out.append
+    for w, l in zip(winners, losers):
+        wave = (last[w] if last[w] > last[l] else last[l]) + 1
+        last[w] = last[l] = wave; append(wave)
+    return out
+
+def replay_scalar(winners, losers, players, k_factor, provisional_k, provisional_games):
+    """Reference path: db.calculate_elo one match at a time, exactly like resolve_match_sync."""
+    ratings = [INITIAL_RATING] * players; games = [0] * players
+    for w, l in zip(winners, losers):
+        rw, rl = ratings[w], ratings[l]
+        ratings[w] = db.calculate_elo(rw, rl, 1, provisional_k if games[w] < provisional_games else k_factor)
+        ratings[l] = db.calculate_elo(rl, rw, 0, provisional_k if games[l] < provisional_games else k_factor)
+        games[w] += 1; games[l] += 1
+    return ratings
+
+def _stable_order(keys):
+    """argsort(keys, kind='stable') for non-negative keys below 2**32, as 16-bit radix passes."""
+    order = np.argsort((keys & 0xFFFF).astype(np.uint16), kind='stable')
+    if len(keys) and keys.max() > 0xFFFF: order = order[np.argsort((keys[order] >> 16).astype(np.uint16), kind='stable')]
+    return order
+
+def _games_before(seq):
+    """For every position of `seq`, how often the same player occurs earlier."""
+    order = _stable_order(seq); ordered = seq[order]
+    starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+    before = np.empty_like(seq)
+    before[order] = np.arange(len(seq)) - np.repeat(starts, np.diff(np.r_[starts, len(seq)]))
+    return before
+
+def _replay_narrow(ratings, columns, start, end):
+    """Plain loop over a run of consecutive narrow waves (already in dependency order)."""
+    players, opponents, k, score = (c[start:end].tolist() for c in columns)
+    touched = np.unique(columns[0][start:end])
+    local = dict(zip(touched.tolist(), ratings[touched].tolist()))
+    for i in range(0, len(players), 2):  # a narrow run is stored one match (winner, loser) at a time
+        w, l = players[i], players[i + 1]; rw, rl = local[w], local[l]
+        local[w] = int(round(rw + k[i] * (1 - 1 / (1 + 10**((rl - rw) / 400)))))
+        local[l] = int(round(rl + k[i + 1] * (0 - 1 / (1 + 10**((rw - rl) / 400)))))
+    ratings[touched] = list(local.values())
+
+def replay_numpy(winners, losers, players, k_factor, provisional_k, provisional_games, wave=None):
+    """Same arithmetic as replay_scalar, vectorised over each wave of independent matches.
+
+    Matches are laid out wave by wave as [winners..., losers...] so one wave is
+    a single slice of every column: two gathers, one rating formula with the
+    score as an array, one scatter. Late in a long history only the most
+    active players are left and waves shrink to a few matches; runs of waves
+    narrower than MIN_WAVE_SIZE go through a plain loop instead.
+    """
+    n = len(winners)
+    w_all = np.asarray(winners, dtype=np.int64); l_all = np.asarray(losers, dtype=np.int64)
+    if provisional_games:
+        seq = np.empty(2 * n, dtype=np.int64); seq[0::2] = w_all; seq[1::2] = l_all
+        k_all = np.where(_games_before(seq) < provisional_games, provisional_k, k_factor).astype(np.float64)
+    else: k_all = np.full(2 * n, float(k_factor))
+    wave = np.asarray(waves(winners, losers, players) if wave is None else wave, dtype=np.int64)
+    order = _stable_order(wave)
+    bounds = np.r_[0, np.flatnonzero(np.diff(wave[order])) + 1, n]
+    sizes = np.diff(bounds); narrow = np.repeat(sizes < MIN_WAVE_SIZE, sizes)
+    # Position of each (wave-ordered) match's winner and loser in the 2n-long columns.
+    offset = np.arange(n) - np.repeat(bounds[:-1], sizes)
+    at_w = np.where(narrow, 2 * np.arange(n), 2 * np.repeat(bounds[:-1], sizes) + offset)
+    at_l = np.where(narrow, at_w + 1, at_w + np.repeat(sizes, sizes))
+    columns = tuple(np.empty(2 * n, dtype=dtype) for dtype in (np.int64, np.int64, np.float64, np.float64))
+    for column, for_w, for_l in zip(columns, (w_all, l_all, k_all[0::2], 1.0), (l_all, w_all, k_all[1::2], 0.0)):
+        column[at_w] = for_w[order] if isinstance(for_w, np.ndarray) else for_w
+        column[at_l] = for_l[order] if isinstance(for_l, np.ndarray) else for_l
+    ratings = np.full(players, INITIAL_RATING, dtype=np.int64); run = None
+    for start, end, size in zip(bounds[:-1].tolist(), bounds[1:].tolist(), sizes.tolist()):
+        if size < MIN_WAVE_SIZE:
+            if run is None: run = start
+            continue
+        if run is not None: _replay_narrow(ratings, columns, 2 * run, 2 * start); run = None
+        idx, opp, k, score = (c[2 * start:2 * end] for c in columns)
+        r, ro = ratings[idx], ratings[opp]
+        ratings[idx] = np.rint(r + k * (score - 1 / (1 + 10.0 ** ((ro - r) / 400))))
+    if run is not None: _replay_narrow(ratings, columns, 2 * run, 2 * n)
+    return ratings.tolist()
+
+def replay(user_ids, winners, losers, k_factor=None, provisional_k=None, provisional_games=None, engine='auto'):
+    """{user_id: rating} after replaying the history; K options default to the current config.
+
+    engine='auto' uses NumPy when it is installed, otherwise the scalar loop.
+    """
+    options = (config.ELO_K_FACTOR if k_factor is None else k_factor, config.ELO_PROVISIONAL_K if provisional_k is None else provisional_k,
+               config.ELO_PROVISIONAL_GAMES if provisional_games is None else provisional_games)
+    engine = replay_scalar if engine == 'scalar' or np is None or not winners else replay_numpy
+    return dict(zip(user_ids, engine(winners, losers, len(user_ids), *options)))
+
+def _apply_sync(ratings, version, exclude, options):
+    if db.get_total_matches_sync() != version:
+        raise RuntimeError("matches were completed during the replay; run it again")
+    changes = db.set_elo_ratings_sync(ratings, INITIAL_RATING)
+    if set(exclude) != excluded_matches(): db.set_setting_sync(EXCLUDED_SETTING, ' '.join(sorted(exclude)) or None)
+    for name, value in options.items():
+        if value is not None and value != getattr(config, name): db.set_setting_sync(name, str(value))
+    return changes
+
+def run_sync(exclude=(), k_factor=None, provisional_k=None, provisional_games=None, engine='auto', apply=False):
+    """Loads, replays and (with apply=True) writes everything in one transaction.
+
+    `exclude` is added to the persisted exclusions, so later replays keep
+    leaving those matches out. Applying also stores the K options as config
+    overrides, so live matches continue with the rules the history was
+    replayed under. Returns a report dict; `changes` holds (user_id, old, new).
+    """
+    exclude = excluded_matches() | set(exclude)
+    started = time.perf_counter()
+    user_ids, winners, losers, version = load_history(exclude)
+    loaded = time.perf_counter()
+    ratings = replay(user_ids, winners, losers, k_factor, provisional_k, provisional_games, engine)
+    replayed = time.perf_counter()
+    options = {'ELO_K_FACTOR': k_factor, 'ELO_PROVISIONAL_K': provisional_k, 'ELO_PROVISIONAL_GAMES': provisional_games}
+    if apply: changes = db.write_sync(_apply_sync, ratings, version, exclude, options)
+    else: changes = db.get_elo_changes_sync(ratings, INITIAL_RATING)
+    changes.sort(key=lambda c: c[2] - c[1])
+    return {'matches': len(winners), 'players': len(user_ids), 'excluded': len(exclude), 'changes': changes, 'applied': apply,
+            'load_seconds': loaded - started, 'replay_seconds': replayed - loaded, 'total_seconds': time.perf_counter() - started}
+
+def format_report(report, top=5):
+    """Timings plus the `top` largest gains and losses."""
+    changes = report['changes']
+    lines = [f"{report['matches']} matches, {report['players']} players, {report['excluded']} excluded; "
+             f"load {report['load_seconds']:.2f}s, replay {report['replay_seconds']:.2f}s",
+             f"{len(changes)} ratings {'changed' if report['applied'] else 'would change'}"]
+    shown = changes if len(changes) <= 2 * top else changes[-top:][::-1] + changes[:top]
+    lines += [f"  {user_id}: {old} -> {new} ({new - old:+d})" for user_id, old, new in shown]
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Recompute all ELO ratings from the completed match history')
+    parser.add_argument('--k', type=float, help=f'K-factor (default ELO_K_FACTOR = {config.ELO_K_FACTOR})')
+    parser.add_argument('--provisional-k', type=float, help='K for players with fewer than --provisional-games matches')
+    parser.add_argument('--provisional-games', type=int)
+    parser.add_argument('--exclude', nargs='*', default=[], metavar='MATCH_ID', help='matches to leave out from now on (e.g. fraudulent ones)')
+    parser.add_argument('--engine', choices=('auto', 'numpy', 'scalar'), default='auto')
+    parser.add_argument('--apply', action='store_true', help='write the ratings (default: report only)')
+    args = parser.parse_args()
+    if args.engine == 'numpy' and np is None: parser.error('numpy is not installed')
+    logging.basicConfig(level=logging.INFO)
+    db.init_db()
+    print(format_report(run_sync(args.exclude, args.k, args.provisional_k, args.provisional_games, args.engine, args.apply)))
+    db.close()
@@ -0,0 +1,145 @@
+"""
+লোকাল ফেক Telegram Bot API দিয়ে polling বনাম webhook মোডের end-to-end ল্যাটেন্সি মাপে।
+
+    python fake_telegram.py --updates 500 --rate 100 --modes polling webhook --concurrency 1 8
+
+বটটি একই প্রসেসে একটি অস্থায়ী ডাটাবেসে চলে; ফেক সার্ভার getUpdates/sendMessage ইত্যাদির
+উত্তর দেয়। প্রতিটি সিনথেটিক "📋 Profile" আপডেট পাঠানো থেকে সংশ্লিষ্ট চ্যাটে প্রথম
+sendMessage আসা পর্যন্ত সময় মাপা হয়। আপডেটগুলো --rate হারে (প্রতি সেকেন্ডে) পাঠানো হয়।
+--storage memory দিলে ডিস্ক I/O ছাড়া একই মাপ পাওয়া যায় (storage.MemoryStorage বেসলাইন)।
+"""
+import argparse, asyncio, json, os, tempfile, time
+from urllib.parse import parse_qsl
+import httpx
+import config, httpserver
+
+config.LOCAL_DB = os.path.join(tempfile.mkdtemp(prefix='fake_tg_'), 'bench.db')
+config.TELEGRAM_API_URL = 'http://127.0.0.1:8081'
+config.WEBHOOK_SECRET = 'harness-secret'
+config.ADMINS = []
+config.FLOOD_GLOBAL_LIMITS = {}  # measure latency, not load shedding
+import bot, storage, webhook, matchmaking, leaderboard
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Harness', 'username': config.BOT_USERNAME}
+
+class FakeTelegram:
+    """Answers the Bot API methods the bot calls; records reply latency per chat."""
+
+    def __init__(self):
+        self.updates = []          # pending for getUpdates
+        self.new_update = asyncio.Event()
+        self.sent_at = {}          # chat_id -> time the update was injected
+        self.latencies = []
+        self.done = asyncio.Event()
+        self.expected = 0
+        self.webhook_url = None
+        self._message_id = 0
+
+    def expect(self, n):
+        self.sent_at.clear(); self.latencies = []; self.expected = n; self.done.clear()
+
+    async def handle(self, method, path, headers, body):
+        name = path.rsplit('/', 1)[-1]
+        if headers.get('content-type', '').startswith('application/json'): params = json.loads(body or b'{}')
+        else: params = dict(parse_qsl(body.decode()))
+        result = await self.dispatch(name, params)
+        return 200, 'application/json', json.dumps({'ok': True, 'result': result}).encode()
+
+    async def dispatch(self, name, params):
+        if name == 'getMe': return BOT_USER
+        if name == 'getUpdates': return await self.get_updates(int(params.get('offset') or 0), float(params.get('timeout') or 0))
+        if name == 'setWebhook': self.webhook_url = params.get('url'); return True
+        if name == 'deleteWebhook': self.webhook_url = None; return True
+        if name == 'getChatMember':
+            return {'status': 'member', 'user': {'id': int(params['user_id']), 'is_bot': False, 'first_name': 'u'}}
+        if name in ('sendMessage', 'editMessageText'):
+            chat_id = int(params['chat_id'])
+            started = self.sent_at.pop(chat_id, None)
+            if started is not None:
+                self.latencies.append(time.perf_counter() - started)
+                if len(self.latencies) >= self.expected: self.done.set()
+            self._message_id += 1
+            return {'message_id': self._message_id, 'date': int(time.time()), 'chat': {'id': chat_id, 'type': 'private'},
+                    'from': BOT_USER, 'text': params.get('text', '')}
+        return True
+
+    async def get_updates(self, offset, timeout):
+        self.updates = [u for u in self.updates if u['update_id'] >= offset]
+        if not self.updates and timeout:
+            self.new_update.clear()
+            try: await asyncio.wait_for(self.new_update.wait(), timeout)
+            except asyncio.TimeoutError: pass
+        batch, self.updates = self.updates[:100], self.updates
+        return batch
+
+def profile_update(update_id, user_id):
+    user = {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}'}
+    return {'update_id': update_id, 'message': {'message_id': update_id, 'date': int(time.time()), 'from': user,
+            'chat': {'id': user_id, 'type': 'private'}, 'text': '📋 Profile'}}
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else 0.0
+
+async def run_mode(fake, mode, n, concurrency, rate, base_id):
+    config.CONCURRENT_UPDATES = concurrency
+    app = bot.build_application()
+    updates = [profile_update(base_id + i, base_id + i) for i in range(n)]
+    fake.expect(n)
+    if mode == 'polling':
+        await app.initialize(); await app.post_init(app); await app.start()
+        await app.updater.start_polling(poll_interval=0, timeout=10)
+        for u in updates:
+            fake.sent_at[u['message']['chat']['id']] = time.perf_counter()
+            fake.updates.append(u); fake.new_update.set()
+            await asyncio.sleep(1 / rate)
+        await asyncio.wait_for(fake.done.wait(), 120)
+        await app.updater.stop(); await app.stop(); await app.shutdown(); await app.post_shutdown(app)
+    else:
+        config.WEBHOOK_URL = f'http://{config.WEBHOOK_LISTEN}:{config.WEBHOOK_PORT}'
+        stop = asyncio.Event()
+        server = asyncio.create_task(webhook.serve(app, stop))
+        while fake.webhook_url is None: await asyncio.sleep(0.01)
+        await asyncio.sleep(0.1)  # listener comes up right after setWebhook
+        async with httpx.AsyncClient(limits=httpx.Limits(max_connections=config.WEBHOOK_MAX_CONNECTIONS)) as client:
+            async def post(u):
+                fake.sent_at[u['message']['chat']['id']] = time.perf_counter()
+                r = await client.post(fake.webhook_url, json=u, headers={'X-Telegram-Bot-Api-Secret-Token': config.WEBHOOK_SECRET})
+                r.raise_for_status()
+            posts = []
+            for u in updates:
+                posts.append(asyncio.create_task(post(u)))
+                await asyncio.sleep(1 / rate)
+            await asyncio.gather(*posts)
+        await asyncio.wait_for(fake.done.wait(), 120)
+        stop.set(); await server
+        fake.webhook_url = None
+    lat = [x * 1000 for x in fake.latencies]
+    print(f"{mode:8s} concurrency={concurrency:<3d} n={len(lat):<5d} p50={percentile(lat, 50):7.2f}ms p95={percentile(lat, 95):7.2f}ms p99={percentile(lat, 99):7.2f}ms")
+
+async def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--updates', type=int, default=300)
+    ap.add_argument('--modes', nargs='+', default=['polling', 'webhook'], choices=['polling', 'webhook'])
+    ap.add_argument('--rate', type=float, default=100.0, help='updates per second')
+    ap.add_argument('--concurrency', nargs='+', type=int, default=[1, 8])
+    ap.add_argument('--storage', choices=sorted(storage.BACKENDS), default=config.STORAGE_BACKEND)
+    args = ap.parse_args()
+    store = storage.use(args.storage); store.open()
+    matchmaking.engine.load(store.load_queue())
+    leaderboard.board.load(store.load_ranked_users())
+    fake = FakeTelegram()
+    server = await httpserver.start_server(fake.handle, '127.0.0.1', 8081)
+    base_id = 10_000
+    try:
+        for concurrency in args.concurrency:
+            for mode in args.modes:
+                await run_mode(fake, mode, args.updates, concurrency, args.rate, base_id)
+                base_id += args.updates
+    finally:
+        fake.new_update.set()  # release long polls abandoned by updater.stop()
+        await asyncio.sleep(0.1)
+        server.close(); await server.wait_closed()
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+# floodcontrol.py - Per-user and global token buckets that shed floods before any handler runs
+import asyncio, logging, time
+from collections import Counter, OrderedDict
+from telegram import Update
+import config, metrics, outbound
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+SLOW_DOWN = "⏳ একটু ধীরে! আপনি খুব দ্রুত বার্তা পাঠাচ্ছেন, কয়েক সেকেন্ড পর আবার চেষ্টা করুন।"
+
+def update_kind(update):
+    """'command', 'callback' or 'text' (every other user message, photos included); None is never limited."""
+    if not isinstance(update, Update): return None
+    if update.callback_query: return 'callback'
+    message = update.message or update.edited_message
+    if message is None or not update.effective_user: return None
+    return 'command' if (message.text or '').startswith('/') else 'text'
+
+class _UserState:
+    __slots__ = ('buckets', 'last_data', 'last_press', 'warned_at')
+
+    def __init__(self):
+        self.buckets = {}; self.last_data = None; self.last_press = self.warned_at = float('-inf')
+
+class FloodControl:
+    """Decides, per update, whether it may reach the handlers at all.
+
+    The update processor (dispatcher.py) asks check() before the update waits
+    for its user's lock or a worker slot, so a user mashing buttons or a spam
+    bot costs one dict lookup per update instead of executor calls and API
+    requests, and can't fill the pending-update queue for everyone else.
+
+    Each user gets a token bucket per kind (FLOOD_LIMITS), and every kind has
+    a global bucket shared by all users (FLOOD_GLOBAL_LIMITS) that sheds load
+    when the bot as a whole is flooded; kinds missing from a dict are not
+    limited. Pressing the same button again within FLOOD_CALLBACK_DEBOUNCE
+    seconds is dropped (each press restarts the window). Admins are exempt.
+    """
+
+    def __init__(self, limits=None, global_limits=None, debounce=None, tracked_users=None):
+        self.limits = config.FLOOD_LIMITS if limits is None else limits
+        self.global_buckets = {kind: TokenBucket(rate, burst) for kind, (rate, burst) in (config.FLOOD_GLOBAL_LIMITS if global_limits is None else global_limits).items()}
+        self.debounce = config.FLOOD_CALLBACK_DEBOUNCE if debounce is None else debounce
+        self.tracked_users = tracked_users or config.FLOOD_TRACKED_USERS
+        self._users = OrderedDict()  # user_id -> _UserState (LRU; an evicted user starts with full buckets)
+        self.shed = Counter()        # (kind, reason) -> updates dropped
+
+    def _state(self, user_id):
+        state = self._users.get(user_id)
+        if state is None:
+            state = self._users[user_id] = _UserState()
+            if len(self._users) > self.tracked_users: self._users.popitem(last=False)
+        else: self._users.move_to_end(user_id)
+        return state
+
+    def _allowed(self, state, kind):
+        if kind in self.limits:
+            bucket = state.buckets.get(kind)
+            if bucket is None: bucket = state.buckets[kind] = TokenBucket(*self.limits[kind])
+            if not bucket.try_acquire(): return 'user'
+        if kind in self.global_buckets and not self.global_buckets[kind].try_acquire(): return 'global'
+        return None
+
+    def check(self, update):
+        """None if the update may be handled, otherwise why it was shed: 'duplicate', 'user' or 'global'."""
+        kind = update_kind(update)
+        if kind is None or update.effective_user.id in config.ADMINS: return None
+        state = self._state(update.effective_user.id); reason = None
+        if kind == 'callback':
+            now = time.monotonic(); data = update.callback_query.data
+            if data == state.last_data and now - state.last_press < self.debounce: reason = 'duplicate'
+            state.last_data, state.last_press = data, now
+        reason = reason or self._allowed(state, kind)
+        if reason:
+            self.shed[kind, reason] += 1; metrics.inc('updates_shed_total', kind=kind, reason=reason)
+            if reason != 'global': self._notify(update, kind, state)  # when the whole bot is flooded, stay silent
+        return reason
+
+    def _notify(self, update, kind, state):
+        try: bot = update.get_bot()
+        except RuntimeError: return  # built without a bot (tests)
+        if kind == 'callback':
+            # Unanswered presses keep a spinner on the button; the answer is not a chat message, so it skips the outbound queue.
+            asyncio.get_running_loop().create_task(_answer(update.callback_query))
+        elif time.monotonic() - state.warned_at >= config.FLOOD_WARN_INTERVAL:
+            state.warned_at = time.monotonic()
+            outbound.pipeline.send(bot.send_message, update.effective_chat.id, SLOW_DOWN)
+
+    def stats(self):
+        return {'tracked_users': len(self._users), 'shed': dict(self.shed), 'total': sum(self.shed.values())}
+
+async def _answer(query):
+    try: await query.answer()
+    except Exception as e: logger.debug(f"Answering a shed callback failed: {e}")
+
+guard = FloodControl()
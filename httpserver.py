@@ -0,0 +1,42 @@
+# httpserver.py - Minimal asyncio HTTP/1.1 listener (webhook, metrics, test harness)
+import asyncio, logging
+
+logger = logging.getLogger(__name__)
+
+REASONS = {200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+MAX_BODY = 1 << 20
+
+async def start_server(handler, host, port):
+    """Serves `await handler(method, path, headers, body) -> (status, content_type, bytes)`.
+
+    Supports keep-alive and Content-Length bodies only (no chunked uploads), which
+    is all Telegram and our local tooling send. Returns the asyncio Server.
+    """
+    async def on_connection(reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line: break
+                method, path, _ = line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    raw = await reader.readline()
+                    if raw in (b'\r\n', b'\n', b''): break
+                    name, _, value = raw.decode('latin-1').partition(':'); headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY:
+                    status, ctype, payload = 413, 'text/plain', b''
+                    headers['connection'] = 'close'
+                else:
+                    body = await reader.readexactly(length)
+                    try: status, ctype, payload = await handler(method, path, headers, body)
+                    except Exception as e:
+                        logger.error(f"HTTP handler failed for {method} {path}: {e}", exc_info=True)
+                        status, ctype, payload = 500, 'text/plain', b''
+                writer.write(f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: {ctype}\r\nContent-Length: {len(payload)}\r\n\r\n".encode('latin-1') + payload)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close': break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError): pass
+        finally:
+            writer.close()
+    return await asyncio.start_server(on_connection, host, port)
@@ -0,0 +1,59 @@
+# leaderboard.py - In-memory ranking of registered players by (ELO, wins)
+import threading
+from sortedcontainers import SortedList
+
+class Leaderboard:
+    """Order-statistic view of registered users, loaded once at startup.
+
+    db.py keeps it current from after-commit hooks on the writer thread, and
+    handlers read it from the event loop, hence the lock. top() and rank() are
+    O(log n) instead of sorting the users table on every request.
+    """
+
+    def __init__(self):
+        self._ranked = SortedList()  # (-elo, -wins, user_id)
+        self._rows = {}              # user_id -> {'ingame_name', 'username', 'wins', 'elo_rating'}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(user_id, row):
+        return (-(row['elo_rating'] or 0), -(row['wins'] or 0), user_id)
+
+    def _discard(self, user_id):
+        row = self._rows.pop(user_id, None)
+        if row: self._ranked.discard(self._key(user_id, row))
+
+    def load(self, rows):
+        with self._lock:
+            self._rows = {r['user_id']: {k: r[k] for k in ('ingame_name', 'username', 'wins', 'elo_rating')} for r in rows}
+            self._ranked = SortedList(self._key(uid, row) for uid, row in self._rows.items())
+
+    def upsert(self, row):
+        """Applies a users row; unregistered users drop out of the ranking."""
+        user_id = row['user_id']
+        with self._lock:
+            self._discard(user_id)
+            if row.get('is_registered') == 1:
+                self._rows[user_id] = {k: row[k] for k in ('ingame_name', 'username', 'wins', 'elo_rating')}
+                self._ranked.add(self._key(user_id, self._rows[user_id]))
+
+    def set_score(self, user_id, elo_rating, wins):
+        with self._lock:
+            row = self._rows.get(user_id)
+            if row is None: return
+            self._ranked.discard(self._key(user_id, row))
+            row['elo_rating'] = elo_rating; row['wins'] = wins
+            self._ranked.add(self._key(user_id, row))
+
+    def top(self, limit=10):
+        with self._lock:
+            return [dict(self._rows[key[2]]) for key in self._ranked.islice(0, limit)]
+
+    def rank(self, user_id):
+        """(rank, total) of a registered user, or None."""
+        with self._lock:
+            row = self._rows.get(user_id)
+            if row is None: return None
+            return self._ranked.index(self._key(user_id, row)) + 1, len(self._ranked)
+
+board = Leaderboard()
@@ -0,0 +1,144 @@
+# lobby.py - Lobby channel: one live board per fee tier, or the legacy post per challenge
+import asyncio, json, logging
+from functools import partial
+from telegram.error import BadRequest
+import config, matchmaking, metrics, outbound, storage
+
+logger = logging.getLogger(__name__)
+
+SETTING_KEY = 'lobby_board_messages'  # settings row: {"<fee>": message_id}
+
+async def _edit_text(bot, chat_id, message_id, text):
+    await bot.edit_message_text(text, chat_id=chat_id, message_id=message_id)
+
+def _tier_title(fee):
+    return f"💰 এন্ট্রি ফি: {fee:g} TK" if fee > 0 else "🎮 Fun Match (Free)"
+
+class LobbyBoard:
+    """Announces waiting players in config.LOBBY_CHANNEL_ID.
+
+    In 'board' mode (LOBBY_MODE) each fee tier has a single pinned message that
+    lists the players queued in matchmaking.engine, oldest first. Queue changes
+    only mark their tier dirty; one task re-renders the dirty tiers after
+    LOBBY_BOARD_DEBOUNCE seconds and then rests LOBBY_BOARD_INTERVAL seconds,
+    so a burst of joins and leaves costs at most one edit per tier per cycle and
+    a render that comes out unchanged costs none. Edits go through the outbound
+    pipeline and are awaited, so the channel's rate limit also throttles the
+    cycle. A board that was deleted from the channel is posted and pinned
+    again; board message ids are kept in the settings table across restarts.
+
+    In 'posts' mode every challenge is its own message, deleted again when the
+    player is paired or leaves the queue.
+    """
+
+    def __init__(self):
+        self._messages = {}  # fee -> board message_id
+        self._rendered = {}  # fee -> text currently shown
+        self._dirty = set()
+        self._wake = None
+        self._task = None
+        self._bot = None
+
+    @property
+    def boards(self): return config.LOBBY_MODE == 'board'
+
+    async def start(self, bot):
+        if not self.boards: return
+        self._bot = bot; self._wake = asyncio.Event()
+        self._messages = {float(fee): message_id for fee, message_id in json.loads(storage.backend.setting(SETTING_KEY) or '{}').items()}
+        # The queue survived the restart but the boards may not show it; re-render everything once.
+        self._dirty.update(self._messages); self._dirty.update(fee for fee in matchmaking.engine.fees() if matchmaking.engine.size(fee))
+        if self._dirty: self._wake.set()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try: await self._task
+            except asyncio.CancelledError: pass
+            self._task = None
+
+    def changed(self, fee):
+        """Marks a tier's board stale; cheap enough to call on every queue change."""
+        if not self.boards: return
+        self._dirty.add(fee)
+        if self._wake: self._wake.set()
+
+    async def joined(self, bot, player, fee):
+        """Announces a newly queued player. False if they were paired before the announcement landed."""
+        if self.boards:
+            self.changed(fee); return True
+        fee_text = f"**এন্ট্রি ফি:** {fee:.2f} TK" if fee > 0 else "**ধরন:** Fun Match (Free)"
+        text = f"🔥 **নতুন চ্যালেঞ্জ!** 🔥\n\n**প্লেয়ার:** {player.get('ingame_name')} (ELO: {player.get('elo_rating', 1000)})\n{fee_text}"
+        message = await bot.send_message(config.LOBBY_CHANNEL_ID, text, parse_mode='Markdown')
+        if not matchmaking.engine.attach_lobby_message(player['user_id'], message.message_id):
+            # Paired while the lobby post was in flight; the post is already stale.
+            await self._delete(bot, message.message_id)
+            return False
+        await storage.backend.set_queue_lobby_message(player['user_id'], message.message_id)
+        return True
+
+    async def left(self, bot, entry):
+        """`entry` (a removed queue entry) was paired or cancelled."""
+        if self.boards: self.changed(entry['fee'])
+        elif entry.get('lobby_message_id'): await self._delete(bot, entry['lobby_message_id'])
+
+    @staticmethod
+    async def _delete(bot, message_id):
+        try: await bot.delete_message(config.LOBBY_CHANNEL_ID, message_id)
+        except Exception: pass
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            await asyncio.sleep(config.LOBBY_BOARD_DEBOUNCE)
+            self._wake.clear(); dirty, self._dirty = self._dirty, set()
+            for fee in sorted(dirty):
+                try: await self._render(fee)
+                except Exception as e:
+                    logger.error(f"Failed to update the {fee:g} TK lobby board: {e}")
+                    self._dirty.add(fee); self._wake.set()  # retried next cycle
+            await asyncio.sleep(config.LOBBY_BOARD_INTERVAL)
+
+    async def render_text(self, fee):
+        entries = matchmaking.engine.entries(fee)
+        lines = [_tier_title(fee), ""]
+        if not entries: lines.append("এখন কেউ অপেক্ষায় নেই।")
+        else:
+            lines.append(f"⏳ অপেক্ষায়: {len(entries)} জন")
+            for i, entry in enumerate(entries[:config.LOBBY_BOARD_ROWS], 1):
+                user = await storage.backend.get_user(entry['user_id']) or {}
+                lines.append(f"{i}. {user.get('ingame_name') or entry['user_id']} (ELO: {user.get('elo_rating', 1000)})")
+            if len(entries) > config.LOBBY_BOARD_ROWS: lines.append(f"… আরও {len(entries) - config.LOBBY_BOARD_ROWS} জন")
+        lines += ["", f"চ্যালেঞ্জ নিতে @{config.BOT_USERNAME} এ 🎮 Play 1v1 চাপুন।"]
+        return "\n".join(lines)
+
+    async def _render(self, fee):
+        text = await self.render_text(fee)
+        message_id = self._messages.get(fee)
+        if text == self._rendered.get(fee): result = 'unchanged'
+        elif message_id is None and not matchmaking.engine.size(fee): return  # no board yet and nothing to show
+        elif message_id is not None and await self._edit(fee, message_id, text): result = 'edited'
+        else:
+            await self._post(fee, text); result = 'posted'
+        self._rendered[fee] = text
+        metrics.inc('lobby_board_renders_total', result=result)
+
+    async def _edit(self, fee, message_id, text):
+        """False if the board message no longer exists."""
+        try: await outbound.pipeline.call(partial(_edit_text, self._bot), config.LOBBY_CHANNEL_ID, message_id, text)
+        except BadRequest as e:
+            if 'not modified' in str(e).lower(): return True
+            if 'not found' not in str(e).lower(): raise
+            logger.warning(f"The {fee:g} TK lobby board is gone, posting a new one")
+            return False
+        return True
+
+    async def _post(self, fee, text):
+        message = await outbound.pipeline.call(self._bot.send_message, config.LOBBY_CHANNEL_ID, text)
+        self._messages[fee] = message.message_id
+        await storage.backend.set_setting(SETTING_KEY, json.dumps({f'{f:g}': m for f, m in self._messages.items()}))
+        try: await outbound.pipeline.call(self._bot.pin_chat_message, config.LOBBY_CHANNEL_ID, message.message_id, disable_notification=True)
+        except Exception as e: logger.warning(f"Could not pin the {fee:g} TK lobby board: {e}")
+
+board = LobbyBoard()
@@ -0,0 +1,96 @@
+# matchmaking.py - In-memory matchmaking engine (per-fee FIFO buckets)
+import asyncio, time, logging
+from collections import OrderedDict
+import storage
+
+logger = logging.getLogger(__name__)
+
+class AlreadyQueued(Exception):
+    """The player is already waiting in one of the fee buckets."""
+
+class MatchmakingEngine:
+    """Keeps the matchmaking queue in memory, one FIFO bucket and one lock per fee.
+
+    Pairing is O(1): the oldest waiting player of the bucket is popped. Only the
+    queue insert of an unpaired player is awaited under the bucket lock (so a later
+    pairing can never be persisted before it); persisting a pairing and all
+    Telegram calls happen after the lock is released.
+    """
+
+    def __init__(self):
+        self._buckets = {}   # fee -> OrderedDict(user_id -> queue entry)
+        self._locks = {}     # fee -> asyncio.Lock
+        self._where = {}     # user_id -> fee
+
+    def _bucket(self, fee):
+        if fee not in self._buckets:
+            self._buckets[fee] = OrderedDict(); self._locks[fee] = asyncio.Lock()
+        return self._buckets[fee]
+
+    def load(self, rows):
+        """Rebuilds the buckets from `matchmaking_queue` rows ordered by joined_at."""
+        self._buckets.clear(); self._locks.clear(); self._where.clear()
+        for r in rows:
+            self._bucket(r['fee'])[r['user_id']] = dict(r); self._where[r['user_id']] = r['fee']
+        logger.info(f"Matchmaking engine loaded {len(self._where)} queued players.")
+
+    def get(self, user_id):
+        fee = self._where.get(user_id)
+        return None if fee is None else self._buckets[fee].get(user_id)
+
+    def size(self, fee=None):
+        if fee is None: return len(self._where)
+        return len(self._buckets.get(fee, ()))
+
+    def fees(self):
+        return list(self._buckets)
+
+    def entries(self, fee):
+        """Queued entries of one fee tier, oldest first."""
+        return list(self._buckets.get(fee, {}).values())
+
+    async def pair_or_enqueue(self, user_id, fee):
+        """Returns the waiting opponent's entry, or queues `user_id` and returns None."""
+        bucket = self._bucket(fee)
+        async with self._locks[fee]:
+            if user_id in self._where: raise AlreadyQueued(user_id)
+            if bucket:
+                opponent_id = next(iter(bucket))
+                del self._where[opponent_id]
+                return bucket.pop(opponent_id)
+            entry = {'user_id': user_id, 'fee': fee, 'joined_at': int(time.time()), 'lobby_message_id': None}
+            bucket[user_id] = entry; self._where[user_id] = fee
+            try: await storage.backend.add_to_queue(user_id, fee, None)
+            except Exception:
+                self.remove(user_id); raise
+            return None
+
+    def attach_lobby_message(self, user_id, lobby_message_id):
+        """Stores the lobby post on a queued entry. False if the player was paired meanwhile."""
+        entry = self.get(user_id)
+        if not entry: return False
+        entry['lobby_message_id'] = lobby_message_id
+        return True
+
+    async def requeue(self, entry):
+        """Puts a popped opponent back at the head of its bucket, e.g. when persisting the pairing failed.
+
+        Runs under the fee lock. False if they tapped Play again meanwhile: queued
+        in some tier (their one queue row already belongs to that entry) or paired
+        (the pairing deleted the row); then there is nothing left to restore.
+        """
+        user_id, fee = entry['user_id'], entry['fee']
+        bucket = self._bucket(fee)
+        async with self._locks[fee]:
+            if user_id in self._where: return False
+            row = await storage.backend.get_from_queue(user_id)
+            if not row or row['fee'] != fee: return False
+            bucket[user_id] = entry; bucket.move_to_end(user_id, last=False); self._where[user_id] = fee
+            return True
+
+    def remove(self, user_id):
+        """Drops the player from the queue and returns the removed entry (or None)."""
+        fee = self._where.pop(user_id, None)
+        return None if fee is None else self._buckets[fee].pop(user_id, None)
+
+engine = MatchmakingEngine()
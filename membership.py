@@ -0,0 +1,48 @@
+# membership.py - TTL cache for channel membership checks
+import asyncio, time, logging
+from collections import OrderedDict
+import config
+
+logger = logging.getLogger(__name__)
+
+class MembershipCache:
+    """Caches get_chat_member results for config.CHANNEL_ID.
+
+    Members are remembered for MEMBERSHIP_TTL_POSITIVE seconds, non-members for
+    MEMBERSHIP_TTL_NEGATIVE (so a user who just joined is not locked out for long).
+    Concurrent checks for the same user share one API call. ChatMember updates
+    from the channel overwrite the cached answer immediately.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()  # user_id -> (is_member, expires_at)
+        self._inflight = {}            # user_id -> asyncio.Task
+        self.hits = self.misses = 0
+
+    def _store(self, user_id, is_member):
+        ttl = config.MEMBERSHIP_TTL_POSITIVE if is_member else config.MEMBERSHIP_TTL_NEGATIVE
+        self._entries[user_id] = (is_member, time.monotonic() + ttl); self._entries.move_to_end(user_id)
+        while len(self._entries) > config.MEMBERSHIP_CACHE_SIZE: self._entries.popitem(last=False)
+
+    async def _lookup(self, bot, user_id):
+        member = await bot.get_chat_member(config.CHANNEL_ID, user_id)
+        is_member = member.status not in ('left', 'kicked')
+        self._store(user_id, is_member)
+        return is_member
+
+    async def is_member(self, bot, user_id):
+        entry = self._entries.get(user_id)
+        if entry and entry[1] > time.monotonic():
+            self.hits += 1; return entry[0]
+        self.misses += 1
+        task = self._inflight.get(user_id)
+        if task is None:
+            task = self._inflight[user_id] = asyncio.ensure_future(self._lookup(bot, user_id))
+            task.add_done_callback(lambda t: self._inflight.pop(user_id) if self._inflight.get(user_id) is t else None)
+        return await asyncio.shield(task)
+
+    def on_member_update(self, user_id, status):
+        """Applies a ChatMemberUpdated status from the channel."""
+        self._store(user_id, status not in ('left', 'kicked'))
+
+cache = MembershipCache()
@@ -0,0 +1,167 @@
+# metrics.py - Latency histograms, counters and gauges with a Prometheus text endpoint
+import bisect, contextvars, functools, logging, threading, time
+import config, httpserver
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds; anything slower lands in the implicit +Inf bucket.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+HELP = {
+    'bot_handler_seconds': 'Time spent in a handler, by handler and dispatch route',
+    'bot_handler_errors_total': 'Handlers that raised, by handler and dispatch route',
+    'db_call_seconds': 'Execution time of a db *_sync function on its reader or writer thread',
+    'db_commit_seconds': 'Duration of one group commit on the writer thread',
+    'telegram_api_seconds': 'Latency of outbound Bot API calls, by method',
+    'telegram_api_errors_total': 'Failed outbound Bot API calls, by method and error type',
+    'lobby_board_renders_total': 'Lobby board re-renders, by result (edited, posted, unchanged)',
+    'updates_shed_total': 'Updates dropped by flood control before dispatch, by kind and reason',
+}
+
+class Histogram:
+    """Fixed-bucket histogram; quantiles are interpolated within a bucket like histogram_quantile()."""
+    __slots__ = ('counts', 'count', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1); self.count = 0; self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1; self.count += 1; self.sum += value
+
+    def quantile(self, q):
+        if not self.count: return 0.0
+        rank = q * self.count; seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                if i == len(BUCKETS): return BUCKETS[-1]  # +Inf: the best we can say
+                lower = BUCKETS[i - 1] if i else 0.0
+                return lower + (BUCKETS[i] - lower) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+class Registry:
+    """Thread-safe store of labelled series; db timings arrive from reader and writer threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._counters = {}    # (name, labels) -> float
+        self._gauges = {}      # name -> (help, fn); fn returns a number or {((label, value), ...): number}
+
+    def observe(self, name, value, /, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None: hist = self._histograms[key] = Histogram()
+            hist.observe(value)
+
+    def inc(self, name, amount=1, /, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock: self._counters[key] = self._counters.get(key, 0) + amount
+
+    def gauge(self, name, fn, help=''):
+        """Registers `fn()` to be read at scrape time."""
+        self._gauges[name] = (help, fn)
+
+    def histograms(self, name):
+        """[(labels dict, Histogram copy)] for one metric."""
+        with self._lock:
+            return [(dict(labels), _copy(hist)) for (n, labels), hist in self._histograms.items() if n == name]
+
+    def counter(self, name, /, **labels):
+        with self._lock: return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def total(self, name):
+        """Sum of a counter over all its label sets."""
+        with self._lock: return sum(v for (n, _), v in self._counters.items() if n == name)
+
+    def render(self):
+        """The Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            histograms = sorted((key, _copy(hist)) for key, hist in self._histograms.items())
+            counters = sorted(self._counters.items())
+        lines = []; described = set()
+        def describe(name, kind, help=None):
+            if name in described: return
+            described.add(name)
+            lines.append(f"# HELP {name} {help or HELP.get(name, name)}"); lines.append(f"# TYPE {name} {kind}")
+        for (name, labels), hist in histograms:
+            describe(name, 'histogram'); cumulative = 0
+            for bound, n in zip(BUCKETS + ('+Inf',), hist.counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {hist.sum:.6f}"); lines.append(f"{name}_count{_labels(labels)} {hist.count}")
+        for (name, labels), value in counters:
+            describe(name, 'counter'); lines.append(f"{name}{_labels(labels)} {value}")
+        for name, (help, fn) in sorted(self._gauges.items()):
+            try: value = fn()
+            except Exception as e:
+                logger.warning(f"Gauge {name} failed: {e}"); continue
+            describe(name, 'gauge', help)
+            for labels, v in (sorted(value.items()) if isinstance(value, dict) else [((), value)]):
+                lines.append(f"{name}{_labels(labels)} {v}")
+        return '\n'.join(lines) + '\n'
+
+def _copy(hist):
+    clone = Histogram(); clone.counts = list(hist.counts); clone.count = hist.count; clone.sum = hist.sum
+    return clone
+
+def _labels(pairs):
+    if not pairs: return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+registry = Registry()
+observe, inc, gauge = registry.observe, registry.inc, registry.gauge
+
+# --- Handler timing ---
+_route = contextvars.ContextVar('metrics_route', default=None)
+
+def set_route(route):
+    """Refines the route label of the handler currently running (e.g. the user's state)."""
+    holder = _route.get()
+    if holder is not None: holder[0] = route
+
+def instrument(name, callback, route=None):
+    """Wraps a PTB callback so each call lands in bot_handler_seconds{handler=name, route=...}.
+
+    `route(update)` gives the initial route label; the callback may refine it with set_route().
+    Route values must come from a small fixed set, never from raw user input.
+    """
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        holder = [route(update) if route else '']
+        token = _route.set(holder); started = time.perf_counter()
+        try: return await callback(update, context)
+        except Exception:
+            inc('bot_handler_errors_total', handler=name, route=holder[0]); raise
+        finally:
+            _route.reset(token)
+            observe('bot_handler_seconds', time.perf_counter() - started, handler=name, route=holder[0])
+    return wrapper
+
+def summary(name, limit=None):
+    """[(labels, count, p50, p95, p99)] for `name`, slowest p95 first."""
+    rows = [(labels, h.count, h.quantile(0.5), h.quantile(0.95), h.quantile(0.99)) for labels, h in registry.histograms(name) if h.count]
+    rows.sort(key=lambda row: row[3], reverse=True)
+    return rows[:limit] if limit else rows
+
+# --- Exposition endpoint ---
+async def _handle(method, path, headers, body):
+    if path.split('?', 1)[0] != '/metrics': return 404, 'text/plain', b''
+    if method != 'GET': return 405, 'text/plain', b''
+    return 200, 'text/plain; version=0.0.4; charset=utf-8', registry.render().encode()
+
+_server = None
+
+async def start():
+    """Starts the /metrics listener on METRICS_LISTEN:METRICS_PORT (METRICS_PORT = 0 disables it)."""
+    global _server
+    if not config.METRICS_PORT or _server is not None: return
+    _server = await httpserver.start_server(_handle, config.METRICS_LISTEN, config.METRICS_PORT)
+    logger.info(f"Metrics on http://{config.METRICS_LISTEN}:{config.METRICS_PORT}/metrics")
+
+async def stop():
+    global _server
+    if _server is not None:
+        _server.close(); await _server.wait_closed()
+        _server = None
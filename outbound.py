@@ -0,0 +1,181 @@
+# outbound.py - Central send queue with priority lanes and Telegram rate limits
+import asyncio, heapq, itertools, logging, time
+from collections import OrderedDict
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+import config, metrics
+from ratelimit import TokenBucket, retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+CRITICAL, NORMAL, BULK = 0, 1, 2
+LANES = {CRITICAL: 'critical', NORMAL: 'normal', BULK: 'bulk'}
+
+def _method_name(method):
+    return getattr(getattr(method, 'func', method), '__name__', 'other')  # functools.partial -> wrapped function
+
+class _Job:
+    __slots__ = ('method', 'args', 'kwargs', 'lane', 'future', 'attempts', 'fire_and_forget')
+
+    def __init__(self, method, args, kwargs, lane, future, fire_and_forget):
+        self.method, self.args, self.kwargs, self.lane, self.future = method, args, kwargs, lane, future
+        self.attempts = 0; self.fire_and_forget = fire_and_forget
+
+class _Chat:
+    __slots__ = ('chat_id', 'jobs', 'bucket', 'busy', 'timer')
+
+    def __init__(self, chat_id):
+        self.chat_id = chat_id
+        self.jobs = []  # heap of (lane, seq, _Job)
+        # Private chats tolerate ~1 msg/s, groups and channels ~20 msgs/min
+        rate, burst = (config.OUTBOUND_CHAT_RATE, config.OUTBOUND_CHAT_BURST) if chat_id > 0 else (config.OUTBOUND_GROUP_RATE, config.OUTBOUND_CHAT_BURST)
+        self.bucket = TokenBucket(rate, burst)
+        self.busy = False; self.timer = None
+
+    @property
+    def idle(self): return not self.jobs and not self.busy and self.timer is None
+
+class OutboundPipeline:
+    """Every bot send goes through here instead of being awaited inline.
+
+    Jobs wait in per-chat heaps ordered by (lane, arrival), so one chat's messages
+    keep their order within a lane and at most one is in flight per chat. Chats
+    whose head job may go now sit in a global priority queue; a single dispatcher
+    takes the most urgent one, spends one per-chat and one global token, and
+    runs the send on one of OUTBOUND_WORKERS slots. RetryAfter pauses the chat
+    and the global bucket; network errors back off the chat. The job is then
+    put back with its original position, up to OUTBOUND_MAX_ATTEMPTS tries.
+    """
+
+    def __init__(self):
+        self.bucket = TokenBucket(config.OUTBOUND_RATE)
+        self._chats = OrderedDict()  # chat_id -> _Chat, idle ones evicted LRU
+        self._ready = None
+        self._seq = itertools.count()
+        self._slots = None
+        self._task = None
+        self._idle = None
+        self.pending = 0
+        self.sent = self.retried = self.failed = 0
+
+    def _ensure_started(self):
+        if self._task is None:
+            self._ready = asyncio.PriorityQueue()
+            self._slots = asyncio.Semaphore(config.OUTBOUND_WORKERS)
+            self._idle = asyncio.Event(); self._idle.set()
+            self._task = asyncio.create_task(self._dispatch())
+
+    def submit(self, method, chat_id, *args, lane=NORMAL, _fire_and_forget=False, **kwargs):
+        """Queues `method(chat_id, *args, **kwargs)` (a bound Bot method); returns an asyncio.Future."""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = _Chat(chat_id)
+            self._evict()
+        else: self._chats.move_to_end(chat_id)
+        heapq.heappush(chat.jobs, (lane, next(self._seq), _Job(method, args, kwargs, lane, future, _fire_and_forget)))
+        self.pending += 1; self._idle.clear()
+        self._wake(chat)
+        return future
+
+    def send(self, method, chat_id, *args, lane=NORMAL, **kwargs):
+        """Fire-and-forget: failures are logged, never raised to the caller."""
+        self.submit(method, chat_id, *args, lane=lane, _fire_and_forget=True, **kwargs)
+
+    async def call(self, method, chat_id, *args, lane=NORMAL, **kwargs):
+        """Queues the send and waits for Telegram's answer (raises its final error)."""
+        return await self.submit(method, chat_id, *args, lane=lane, **kwargs)
+
+    def _evict(self):
+        excess = len(self._chats) - config.OUTBOUND_CHAT_CACHE
+        for chat_id in [cid for cid, c in self._chats.items() if c.idle][:max(excess, 0)]:
+            del self._chats[chat_id]
+
+    def _wake(self, chat):
+        if chat.busy or not chat.jobs: return
+        delay = chat.bucket.delay()
+        if delay > 0:
+            if chat.timer is None: chat.timer = asyncio.get_running_loop().call_later(delay, self._timer_fired, chat)
+            return
+        lane, seq, _ = chat.jobs[0]
+        self._ready.put_nowait((lane, seq, chat.chat_id))
+
+    def _timer_fired(self, chat):
+        chat.timer = None; self._wake(chat)
+
+    async def _dispatch(self):
+        while True:
+            await self._slots.acquire()
+            while True:
+                _, _, chat_id = await self._ready.get()
+                chat = self._chats.get(chat_id)
+                if chat is None or chat.busy or not chat.jobs: continue  # stale duplicate entry
+                if chat.bucket.try_acquire(): break
+                self._wake(chat)
+            _, seq, job = heapq.heappop(chat.jobs)
+            chat.busy = True
+            await self.bucket.acquire()
+            asyncio.create_task(self._run(chat, seq, job))
+
+    async def _run(self, chat, seq, job):
+        try:
+            if job.future.done(): return self._finish(job)  # caller gave up
+            result = await self._call(chat, job)
+            self.sent += 1; self._finish(job, result=result)
+        except RetryAfter as e:
+            seconds = retry_after_seconds(e)
+            logger.warning(f"Flood limit sending to {chat.chat_id}, pausing {seconds}s")
+            chat.bucket.pause(seconds); self.bucket.pause(seconds)
+            self._retry(chat, seq, job, e)
+        except (Forbidden, BadRequest) as e:  # BadRequest subclasses NetworkError, so it goes first
+            self._finish(job, error=e)
+        except NetworkError as e:
+            chat.bucket.pause(min(2 ** job.attempts, config.OUTBOUND_MAX_BACKOFF))
+            self._retry(chat, seq, job, e)
+        except Exception as e:
+            self._finish(job, error=e)
+        finally:
+            chat.busy = False
+            self._slots.release()
+            self._wake(chat)
+
+    async def _call(self, chat, job):
+        method = _method_name(job.method); started = time.perf_counter()
+        try: return await job.method(chat.chat_id, *job.args, **job.kwargs)
+        except Exception as e:
+            metrics.inc('telegram_api_errors_total', method=method, error=type(e).__name__); raise
+        finally: metrics.observe('telegram_api_seconds', time.perf_counter() - started, method=method)
+
+    def _retry(self, chat, seq, job, error):
+        job.attempts += 1
+        if job.attempts >= config.OUTBOUND_MAX_ATTEMPTS: return self._finish(job, error=error)
+        self.retried += 1
+        heapq.heappush(chat.jobs, (job.lane, seq, job))
+
+    def _finish(self, job, result=None, error=None):
+        self.pending -= 1
+        if not self.pending: self._idle.set()
+        if error is not None:
+            self.failed += 1
+            if job.fire_and_forget: logger.warning(f"{_method_name(job.method)} failed: {error}")
+            if not job.future.done(): job.future.set_exception(error)
+            if job.fire_and_forget: job.future.exception()  # mark retrieved
+        elif not job.future.done(): job.future.set_result(result)
+
+    async def stop(self, timeout=10):
+        """Waits for queued sends (up to `timeout` seconds), then stops the dispatcher."""
+        if self._task is None: return
+        try: await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError: logger.warning(f"Outbound queue stopped with {self.pending} unsent messages")
+        self._task.cancel()
+        try: await self._task
+        except asyncio.CancelledError: pass
+        self._task = None
+
+    def stats(self):
+        queued = {name: 0 for name in LANES.values()}
+        for chat in self._chats.values():
+            for lane, _, _ in chat.jobs: queued[LANES[lane]] += 1
+        return {'pending': self.pending, 'queued': queued, 'sent': self.sent, 'retried': self.retried, 'failed': self.failed}
+
+pipeline = OutboundPipeline()
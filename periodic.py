@@ -0,0 +1,39 @@
+# periodic.py - Background task that runs a job on an interval (backups, archiving)
+import asyncio, logging
+
+logger = logging.getLogger(__name__)
+
+class PeriodicTask:
+    """Runs `job()` in one background task, waiting `wait()` seconds before each run.
+
+    `interval` and `wait` are callables so config changes apply from the next
+    wait; `wait` defaults to `interval`. A zero interval at start() leaves the
+    task off. With `run_first` the first run happens right away. A failed run
+    is logged and followed by `retry_delay` extra seconds before the next wait.
+    """
+
+    def __init__(self, name, job, interval, wait=None, run_first=False, retry_delay=0):
+        self.name, self.job, self.interval = name, job, interval
+        self.wait = wait or interval
+        self.run_first, self.retry_delay = run_first, retry_delay
+        self._task = None
+
+    def start(self):
+        if self.interval(): self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try: await self._task
+            except asyncio.CancelledError: pass
+            self._task = None
+
+    async def _run(self):
+        skip_wait = self.run_first
+        while True:
+            if not skip_wait: await asyncio.sleep(self.wait())
+            skip_wait = False
+            try: await self.job()
+            except Exception as e:
+                logger.error(f"{self.name} failed: {e}", exc_info=True)
+                await asyncio.sleep(self.retry_delay)
@@ -0,0 +1,42 @@
+# ratelimit.py - Token bucket shared by the senders that talk to Telegram
+import asyncio, time
+
+def retry_after_seconds(exc):
+    """RetryAfter.retry_after is an int on older PTB releases and a timedelta on newer ones."""
+    value = exc.retry_after
+    return value.total_seconds() if hasattr(value, 'total_seconds') else float(value)
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, bursts up to `capacity`.
+
+    `pause()` blocks every acquirer until a deadline, which is how a RetryAfter
+    from Telegram is propagated to all senders sharing the bucket.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate); self.capacity = float(capacity or rate)
+        self._tokens = self.capacity; self._updated = time.monotonic(); self._resume_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate); self._updated = now
+
+    def try_acquire(self, n=1):
+        now = time.monotonic()
+        if now < self._resume_at: return False
+        self._refill(now)
+        if self._tokens >= n:
+            self._tokens -= n; return True
+        return False
+
+    def delay(self, n=1):
+        """Seconds until `n` tokens would be available."""
+        now = time.monotonic(); self._refill(now)
+        return max(self._resume_at - now, (n - self._tokens) / self.rate, 0.0)
+
+    async def acquire(self, n=1):
+        async with self._lock:
+            while not self.try_acquire(n): await asyncio.sleep(self.delay(n))
+
+    def pause(self, seconds):
+        self._resume_at = max(self._resume_at, time.monotonic() + seconds)
@@ -0,0 +1,59 @@
+# review.py - Admin review of finished matches: one media group per admin
+import asyncio, logging
+from functools import partial
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
+import storage, config, outbound
+
+logger = logging.getLogger(__name__)
+
+async def _edit_text(bot, chat_id, message_id, text):
+    await bot.edit_message_text(text, chat_id=chat_id, message_id=message_id)
+
+class ReviewQueue:
+    """Sends each finished match to the admins and tracks who got which keyboard.
+
+    A match with both screenshots is the pending-review queue itself (see
+    db.get_pending_reviews), so nothing is lost on restart. Each admin gets the
+    two screenshots as one media group plus one follow-up message carrying the
+    resolve keyboard, queued on the outbound pipeline for all admins at once.
+    Follow-up message ids are kept in memory so that resolving from any admin
+    clears the keyboard for the others.
+    """
+
+    def __init__(self):
+        self._messages = {}  # match_id -> {admin_id: follow-up message_id}
+
+    @staticmethod
+    def keyboard(match, p1, p2):
+        match_id, p1_id, p2_id = match['match_id'], match['player1_id'], match['player2_id']
+        return InlineKeyboardMarkup([[InlineKeyboardButton(f"{p1.get('ingame_name') or p1_id} Wins", callback_data=f"admin_res_{match_id}_{p1_id}"),
+                                      InlineKeyboardButton(f"{p2.get('ingame_name') or p2_id} Wins", callback_data=f"admin_res_{match_id}_{p2_id}")]])
+
+    def dispatch(self, bot, match, p1, p2, admins=None):
+        """Queues the review for every admin (or `admins`) without waiting for delivery."""
+        match_id = match['match_id']
+        media = [InputMediaPhoto(match['p1_screenshot_id'], caption=f"P1 ({p1.get('ingame_name') or match['player1_id']}) এর স্ক্রিনশট"),
+                 InputMediaPhoto(match['p2_screenshot_id'], caption=f"P2 ({p2.get('ingame_name') or match['player2_id']}) এর স্ক্রিনশট")]
+        text = f"ম্যাচ #{match_id} এর ফলাফল পর্যালোচনার জন্য প্রস্তুত।" + (f"\nএন্ট্রি ফি: {match['fee']:.2f} TK" if match['fee'] else "")
+        keyboard = self.keyboard(match, p1, p2)
+        followups = {}
+        for admin_id in admins or config.ADMINS:
+            outbound.pipeline.send(bot.send_media_group, admin_id, media)
+            followups[admin_id] = outbound.pipeline.submit(bot.send_message, admin_id, text, reply_markup=keyboard)
+        asyncio.create_task(self._track(match_id, followups))
+
+    async def _track(self, match_id, followups):
+        results = await asyncio.gather(*followups.values(), return_exceptions=True)
+        for admin_id, message in zip(followups, results):
+            if isinstance(message, Exception): logger.error(f"Review of match {match_id} not delivered to admin {admin_id}: {message}")
+            else: self._messages.setdefault(match_id, {})[admin_id] = message.message_id
+
+    def close(self, bot, match_id, text, skip_chat=None):
+        """Replaces every admin's review keyboard for `match_id` with `text`."""
+        for admin_id, message_id in self._messages.pop(match_id, {}).items():
+            if admin_id != skip_chat: outbound.pipeline.send(partial(_edit_text, bot), admin_id, message_id, text)
+
+    async def pending(self, limit=10):
+        return await storage.backend.get_pending_reviews(limit)
+
+queue = ReviewQueue()
@@ -0,0 +1,465 @@
+# storage.py - Storage backends behind one interface: SQLite (db.py) or plain in-memory dicts
+import time, uuid, heapq, itertools
+from datetime import datetime
+import config, db, leaderboard
+
+class Storage:
+    """Everything the bot persists: users, queue, matches, ledger, requests and settings.
+
+    Each coroutine has the arguments, return value and side effects (leaderboard,
+    settings cache, config overrides) of the db.py wrapper with the same name.
+    The load_* methods are synchronous startup snapshots, taken before the event
+    loop runs. test_storage.py runs one conformance suite against every backend.
+    """
+    persistent = True  # False: backups, archiving, broadcasts and the ELO replay (SQLite tools) are unavailable; their commands say so
+
+    # Lifecycle
+    def open(self): raise NotImplementedError
+    def load_queue(self): raise NotImplementedError
+    def load_ranked_users(self): raise NotImplementedError
+    def load_user_states(self): raise NotImplementedError
+    async def flush(self): raise NotImplementedError
+    def close(self): raise NotImplementedError
+
+    # Users
+    async def get_user(self, user_id): raise NotImplementedError
+    async def create_user_if_not_exists(self, user_id, username, referrer_id=None): raise NotImplementedError
+    async def update_user_fields(self, user_id, data): raise NotImplementedError
+    async def set_user_state(self, user_id, state, state_data=None): await self.update_user_fields(user_id, {'state': state, 'state_data': state_data})
+    async def save_user_states(self, rows): raise NotImplementedError
+    async def get_top_wins(self, limit=10): raise NotImplementedError
+    async def get_all_user_ids(self): raise NotImplementedError
+
+    # Ledger
+    async def adjust_balance(self, user_id, amount, tx_type='adjust', note=''): raise NotImplementedError
+    async def audit_user(self, user_id): raise NotImplementedError
+
+    # Matchmaking queue
+    async def add_to_queue(self, user_id, fee, lobby_message_id): raise NotImplementedError
+    async def get_from_queue(self, user_id): raise NotImplementedError
+    async def remove_from_queue(self, user_id): raise NotImplementedError
+    async def set_queue_lobby_message(self, user_id, lobby_message_id): raise NotImplementedError
+    async def find_opponent_in_queue(self, fee, player_id_to_exclude): raise NotImplementedError
+
+    # Matches
+    async def create_match(self, p1_id, p2_id, fee): raise NotImplementedError
+    async def create_match_from_queue(self, p1_id, p2_id, fee): raise NotImplementedError
+    async def get_match(self, match_id): raise NotImplementedError
+    async def set_room_code(self, match_id, room_code): raise NotImplementedError
+    async def submit_screenshot(self, match_id, player_id, screenshot_id): raise NotImplementedError
+    async def resolve_match(self, match_id, winner_id): raise NotImplementedError
+    async def cancel_match(self, match_id): raise NotImplementedError
+    async def get_pending_deadlines(self): raise NotImplementedError
+    async def expire_matches(self, match_ids): raise NotImplementedError
+    async def get_pending_reviews(self, limit=50): raise NotImplementedError
+
+    # Tournaments
+    async def create_tournament(self, name, fmt, fee, max_players, rounds=None): raise NotImplementedError
+    async def get_tournament(self, tournament_id): raise NotImplementedError
+    async def get_open_tournaments(self): raise NotImplementedError
+    async def join_tournament(self, tournament_id, user_id): raise NotImplementedError
+    async def cancel_tournament(self, tournament_id): raise NotImplementedError
+    async def get_tournament_players(self, tournament_id): raise NotImplementedError
+    async def get_tournament_matches(self, tournament_id, round=None): raise NotImplementedError
+    async def start_tournament_round(self, tournament_id, round, rounds, players, pairs, deadline_at): raise NotImplementedError
+    async def finish_tournament(self, tournament_id, players, payouts): raise NotImplementedError
+
+    # Deposit and withdrawal requests
+    async def create_deposit_request(self, user_id, txid, amount): raise NotImplementedError
+    async def get_deposit_request(self, req_id): raise NotImplementedError
+    async def create_withdrawal_request(self, user_id, amount, method, account_number): raise NotImplementedError
+    async def get_withdrawal_request(self, req_id): raise NotImplementedError
+    async def get_pending_requests(self, kind, offset=0, limit=10): raise NotImplementedError
+    async def settle_requests(self, kind, action, req_ids): raise NotImplementedError
+
+    # Stats
+    async def get_stats(self): raise NotImplementedError
+    async def rebuild_counters(self): raise NotImplementedError
+
+    # Settings: both backends share db.py's in-memory settings cache and CONFIG_OVERRIDES
+    def setting(self, key, default=None): return db.setting(key, default)
+    async def get_setting(self, key): raise NotImplementedError
+    async def set_setting(self, key, value): raise NotImplementedError
+
+
+class SqliteStorage(Storage):
+    """The production backend: db.py's writer thread, reader pool and user cache."""
+
+    def open(self): db.init_db()
+    def load_queue(self): return db.get_queue_sync()
+    def load_ranked_users(self): return db.get_ranked_users_sync()
+    def load_user_states(self): return db.get_user_states_sync()
+    async def flush(self): await db.flush()
+    def close(self): db.close()
+
+    async def get_user(self, user_id): return await db.get_user(user_id)
+    async def create_user_if_not_exists(self, user_id, username, referrer_id=None): await db.create_user_if_not_exists(user_id, username, referrer_id)
+    async def update_user_fields(self, user_id, data): await db.update_user_fields(user_id, data)
+    async def save_user_states(self, rows): await db.save_user_states(rows)
+    async def get_top_wins(self, limit=10): return await db.get_top_wins(limit)
+    async def get_all_user_ids(self): return await db.get_all_user_ids()
+
+    async def adjust_balance(self, user_id, amount, tx_type='adjust', note=''): await db.adjust_balance(user_id, amount, tx_type, note)
+    async def audit_user(self, user_id): return await db.audit_user(user_id)
+
+    async def add_to_queue(self, user_id, fee, lobby_message_id): await db.add_to_queue(user_id, fee, lobby_message_id)
+    async def get_from_queue(self, user_id): return await db.get_from_queue(user_id)
+    async def remove_from_queue(self, user_id): return await db.remove_from_queue(user_id)
+    async def set_queue_lobby_message(self, user_id, lobby_message_id): await db.set_queue_lobby_message(user_id, lobby_message_id)
+    async def find_opponent_in_queue(self, fee, player_id_to_exclude): return await db.find_opponent_in_queue(fee, player_id_to_exclude)
+
+    async def create_match(self, p1_id, p2_id, fee): return await db.create_match(p1_id, p2_id, fee)
+    async def create_match_from_queue(self, p1_id, p2_id, fee): return await db.create_match_from_queue(p1_id, p2_id, fee)
+    async def get_match(self, match_id): return await db.get_match(match_id)
+    async def set_room_code(self, match_id, room_code): return await db.set_room_code(match_id, room_code)
+    async def submit_screenshot(self, match_id, player_id, screenshot_id): return await db.submit_screenshot(match_id, player_id, screenshot_id)
+    async def resolve_match(self, match_id, winner_id): return await db.resolve_match(match_id, winner_id)
+    async def cancel_match(self, match_id): await db.cancel_match(match_id)
+    async def get_pending_deadlines(self): return await db.get_pending_deadlines()
+    async def expire_matches(self, match_ids): return await db.expire_matches(match_ids)
+    async def get_pending_reviews(self, limit=50): return await db.get_pending_reviews(limit)
+
+    async def create_tournament(self, name, fmt, fee, max_players, rounds=None): return await db.create_tournament(name, fmt, fee, max_players, rounds)
+    async def get_tournament(self, tournament_id): return await db.get_tournament(tournament_id)
+    async def get_open_tournaments(self): return await db.get_open_tournaments()
+    async def join_tournament(self, tournament_id, user_id): return await db.join_tournament(tournament_id, user_id)
+    async def cancel_tournament(self, tournament_id): return await db.cancel_tournament(tournament_id)
+    async def get_tournament_players(self, tournament_id): return await db.get_tournament_players(tournament_id)
+    async def get_tournament_matches(self, tournament_id, round=None): return await db.get_tournament_matches(tournament_id, round)
+    async def start_tournament_round(self, tournament_id, round, rounds, players, pairs, deadline_at): return await db.start_tournament_round(tournament_id, round, rounds, players, pairs, deadline_at)
+    async def finish_tournament(self, tournament_id, players, payouts): return await db.finish_tournament(tournament_id, players, payouts)
+
+    async def create_deposit_request(self, user_id, txid, amount): return await db.create_deposit_request(user_id, txid, amount)
+    async def get_deposit_request(self, req_id): return await db.get_deposit_request(req_id)
+    async def create_withdrawal_request(self, user_id, amount, method, account_number): return await db.create_withdrawal_request(user_id, amount, method, account_number)
+    async def get_withdrawal_request(self, req_id): return await db.get_withdrawal_request(req_id)
+    async def get_pending_requests(self, kind, offset=0, limit=10): return await db.get_pending_requests(kind, offset, limit)
+    async def settle_requests(self, kind, action, req_ids): return await db.settle_requests(kind, action, req_ids)
+
+    async def get_stats(self): return await db.get_stats()
+    async def rebuild_counters(self): await db.rebuild_counters()
+
+    async def get_setting(self, key): return await db.get_setting(key)
+    async def set_setting(self, key, value): await db.set_setting(key, value)
+
+
+# users row of a new player, as the SQLite column defaults produce it
+USER_DEFAULTS = {'username': None, 'ingame_name': None, 'phone_number': None, 'is_registered': 0, 'balance': 0.0, 'welcome_given': 0,
+                 'wins': 0, 'losses': 0, 'created_at': None, 'state': None, 'state_data': None, 'referrer_id': None, 'elo_rating': 1000,
+                 'is_banned': 0, 'is_blocked': 0, 'last_tx_at': None}
+RANK_COLUMNS = ('user_id', 'ingame_name', 'username', 'wins', 'elo_rating')
+
+class MemoryStorage(Storage):
+    """Dicts on the event loop: no disk I/O, and nothing survives a restart.
+
+    No coroutine awaits anything, so each one runs to completion like a
+    db.py write and its changes are visible at once like a committed one.
+    Rows are the same dicts SQLite returns (REAL columns as floats) and are
+    copied on the way in and out. Used by the conformance tests and as the
+    zero-I/O baseline for load tests (STORAGE_BACKEND = 'memory').
+    """
+    persistent = False
+
+    def __init__(self): self._reset()
+
+    def _reset(self):
+        self.users = {}; self.queue = {}; self.matches = {}; self.settings = {}
+        self.ledger = {}  # user_id -> transactions rows, oldest first
+        self.requests = {'deposit': {}, 'withdrawal': {}}
+        self.pending = {'deposit': {}, 'withdrawal': {}}  # id -> row while status is 'pending', oldest first
+        self.counters = {'registered_users': 0, 'completed_matches': 0, 'fees_collected': 0}
+        self.tournaments = {}; self.tournament_players = {}  # id -> row; id -> {user_id: row}
+        self.tournament_matches = {}  # match_id -> (tournament_id, round)
+        self._tx_ids = itertools.count(1); self._tournament_ids = itertools.count(1); self._request_ids = {'deposit': itertools.count(1), 'withdrawal': itertools.count(1)}
+
+    def open(self):
+        self._reset(); db.cache_settings(())
+
+    def load_queue(self): return [dict(r) for r in sorted(self.queue.values(), key=lambda r: (r['joined_at'], r['user_id']))]
+    def load_ranked_users(self): return [{k: r[k] for k in RANK_COLUMNS} for r in self._registered()]
+    def load_user_states(self): return [(r['user_id'], r['state'], r['state_data']) for _, r in sorted(self.users.items()) if r['state'] is not None]
+    async def flush(self): pass
+    def close(self): pass
+
+    # --- Users ---
+    def _registered(self):
+        return [r for _, r in sorted(self.users.items()) if r['is_registered'] == 1]
+
+    async def get_user(self, user_id):
+        row = self.users.get(user_id); return dict(row) if row else None
+
+    async def create_user_if_not_exists(self, user_id, username, referrer_id=None):
+        if user_id not in self.users:
+            self.users[user_id] = {'user_id': user_id, **USER_DEFAULTS, 'username': username, 'created_at': str(datetime.now()), 'referrer_id': referrer_id or None}
+
+    def _update_user(self, user_id, data):
+        row = self.users.get(user_id)
+        if row is None: return
+        unknown = set(data) - row.keys()
+        if unknown: raise ValueError(f"no such column: {', '.join(sorted(unknown))}")
+        was_registered = row['is_registered'] == 1
+        row.update(data)
+        if 'balance' in data and row['balance'] is not None: row['balance'] = float(row['balance'])
+        self.counters['registered_users'] += (row['is_registered'] == 1) - was_registered
+        if db._RANK_FIELDS.intersection(data): leaderboard.board.upsert(dict(row))
+
+    async def update_user_fields(self, user_id, data): self._update_user(user_id, data)
+
+    async def save_user_states(self, rows):
+        for user_id, state, state_data in rows:
+            if user_id in self.users: self.users[user_id].update(state=state, state_data=state_data)
+
+    async def get_top_wins(self, limit=10):
+        top = heapq.nsmallest(limit, self._registered(), key=lambda r: (-r['elo_rating'], -r['wins'], r['user_id']))
+        return [{k: r[k] for k in ('ingame_name', 'username', 'wins', 'elo_rating')} for r in top]
+
+    async def get_all_user_ids(self): return [r['user_id'] for r in self._registered()]
+
+    # --- Ledger ---
+    def _adjust_balance(self, user_id, amount, tx_type, note):
+        now = int(time.time()); row = self.users.get(user_id)
+        if row: row['balance'] += amount; row['last_tx_at'] = now
+        self.ledger.setdefault(user_id, []).append({'id': next(self._tx_ids), 'user_id': user_id, 'amount': float(amount), 'type': tx_type, 'note': note, 'created_at': now})
+
+    async def adjust_balance(self, user_id, amount, tx_type='adjust', note=''): self._adjust_balance(user_id, amount, tx_type, note)
+
+    async def audit_user(self, user_id):
+        row = self.users.get(user_id); amounts = [t['amount'] for t in self.ledger.get(user_id, ())]
+        return {'balance': row['balance'] if row else None, 'archived_through': None, 'archived_total': 0.0, 'archived_count': 0,
+                'hot_total': sum(amounts), 'hot_count': len(amounts), 'ledger_total': 0.0 + sum(amounts)}
+
+    # --- Matchmaking queue ---
+    async def add_to_queue(self, user_id, fee, lobby_message_id):
+        self.queue.pop(user_id, None)
+        self.queue[user_id] = {'user_id': user_id, 'fee': float(fee), 'joined_at': int(time.time()), 'lobby_message_id': lobby_message_id}
+
+    async def get_from_queue(self, user_id):
+        row = self.queue.get(user_id); return dict(row) if row else None
+
+    async def remove_from_queue(self, user_id): return self.queue.pop(user_id, None) is not None
+
+    async def set_queue_lobby_message(self, user_id, lobby_message_id):
+        if user_id in self.queue: self.queue[user_id]['lobby_message_id'] = lobby_message_id
+
+    async def find_opponent_in_queue(self, fee, player_id_to_exclude):
+        rows = [r for r in self.queue.values() if r['fee'] == fee and r['user_id'] != player_id_to_exclude]
+        return dict(min(rows, key=lambda r: (r['joined_at'], r['user_id']))) if rows else None
+
+    # --- Matches ---
+    def _set_status(self, match, status):
+        delta = (status == 'completed') - (match['status'] == 'completed'); match['status'] = status
+        if delta:
+            self.counters['completed_matches'] += delta; self.counters['fees_collected'] += delta * max(match['fee'] or 0, 0)
+
+    def _insert_match(self, p1_id, p2_id, fee):
+        match_id = str(uuid.uuid4())[:8]
+        self.matches[match_id] = {'match_id': match_id, 'player1_id': p1_id, 'player2_id': p2_id, 'fee': float(fee), 'status': 'waiting_for_code', 'room_code': None,
+                                  'created_at': int(time.time()), 'p1_screenshot_id': None, 'p2_screenshot_id': None, 'winner_id': None, 'deadline_at': None}
+        if fee > 0:
+            self._adjust_balance(p1_id, -fee, 'match_entry', f'Match {match_id}')
+            self._adjust_balance(p2_id, -fee, 'match_entry', f'Match {match_id}')
+        return match_id
+
+    async def create_match(self, p1_id, p2_id, fee): return self._insert_match(p1_id, p2_id, fee)
+
+    async def create_match_from_queue(self, p1_id, p2_id, fee):
+        self.queue.pop(p1_id, None); self.queue.pop(p2_id, None)
+        return self._insert_match(p1_id, p2_id, fee)
+
+    async def get_match(self, match_id):
+        row = self.matches.get(match_id); return dict(row) if row else None
+
+    async def set_room_code(self, match_id, room_code):
+        deadline_at = int(time.time()) + config.MATCH_TIMEOUT; match = self.matches.get(match_id)
+        if match:
+            match.update(room_code=room_code, deadline_at=deadline_at); self._set_status(match, 'in_progress')
+        return deadline_at
+
+    async def submit_screenshot(self, match_id, player_id, screenshot_id):
+        match = self.matches.get(match_id)
+        if not match or match['status'] != 'in_progress': return None
+        match['p1_screenshot_id' if player_id == match['player1_id'] else 'p2_screenshot_id'] = screenshot_id
+        return dict(match)
+
+    def _resolve(self, match_id, winner_id):
+        match = self.matches.get(match_id)
+        if not match or match['status'] != 'in_progress': return False
+        fee = match['fee']; loser_id = match['player2_id'] if winner_id == match['player1_id'] else match['player1_id']
+        winner = self.users.get(winner_id); loser = self.users.get(loser_id)
+        if winner and loser:
+            winner_old, loser_old = winner['elo_rating'], loser['elo_rating']
+            winner['elo_rating'] = db.calculate_elo(winner_old, loser_old, 1, db.elo_k_factor((winner['wins'] or 0) + (winner['losses'] or 0)))
+            loser['elo_rating'] = db.calculate_elo(loser_old, winner_old, 0, db.elo_k_factor((loser['wins'] or 0) + (loser['losses'] or 0)))
+            leaderboard.board.set_score(winner_id, winner['elo_rating'], (winner['wins'] or 0) + 1)
+            leaderboard.board.set_score(loser_id, loser['elo_rating'], loser['wins'] or 0)
+        if fee > 0: self._adjust_balance(winner_id, fee*2*0.9, 'match_win', f'Won match {match_id}')
+        if winner: winner['wins'] += 1
+        if loser: loser['losses'] += 1
+        match['winner_id'] = winner_id; self._set_status(match, 'completed')
+        return True
+
+    async def resolve_match(self, match_id, winner_id): return self._resolve(match_id, winner_id)
+
+    async def cancel_match(self, match_id):
+        if match_id in self.matches: self._set_status(self.matches[match_id], 'cancelled')
+
+    async def get_pending_deadlines(self):
+        return [(m['match_id'], m['deadline_at']) for m in self.matches.values()
+                if m['status'] == 'in_progress' and m['deadline_at'] is not None and (m['p1_screenshot_id'] is None or m['p2_screenshot_id'] is None)]
+
+    async def expire_matches(self, match_ids):
+        now = int(time.time()); outcomes = []
+        for match_id in match_ids:
+            match = self.matches.get(match_id)
+            if not db.match_expirable(match, now): continue
+            p1, p2 = match['player1_id'], match['player2_id']
+            ss1, ss2 = match['p1_screenshot_id'], match['p2_screenshot_id']
+            if ss1 and ss2: continue  # waiting in the admin review queue
+            winner = p1 if ss1 and not ss2 else p2 if ss2 and not ss1 else None
+            if winner: self._resolve(match_id, winner)
+            else:
+                if match['fee'] > 0:
+                    self._adjust_balance(p1, match['fee'], 'refund', f'Match {match_id} cancelled (timeout)')
+                    self._adjust_balance(p2, match['fee'], 'refund', f'Match {match_id} cancelled (timeout)')
+                self._set_status(match, 'cancelled')
+            outcomes.append({'match_id': match_id, 'player1_id': p1, 'player2_id': p2, 'fee': match['fee'], 'winner_id': winner})
+        return outcomes
+
+    async def get_pending_reviews(self, limit=50):
+        waiting = [m for m in self.matches.values() if m['status'] == 'in_progress' and m['p1_screenshot_id'] is not None and m['p2_screenshot_id'] is not None]
+        return [dict(m) for m in sorted(waiting, key=lambda m: m['created_at'])[:limit]]
+
+    # --- Tournaments ---
+    async def create_tournament(self, name, fmt, fee, max_players, rounds=None):
+        tournament_id = next(self._tournament_ids)
+        self.tournaments[tournament_id] = {'id': tournament_id, 'name': name, 'format': fmt, 'fee': float(fee), 'max_players': max_players, 'rounds': rounds, 'round': 0,
+                                           'status': 'registering', 'created_at': int(time.time()), 'finished_at': None, 'winner_id': None}
+        self.tournament_players[tournament_id] = {}
+        return tournament_id
+
+    async def get_tournament(self, tournament_id):
+        row = self.tournaments.get(tournament_id); return dict(row) if row else None
+
+    async def get_open_tournaments(self):
+        return [dict(t) for _, t in sorted(self.tournaments.items()) if t['status'] in ('registering', 'running')]
+
+    async def join_tournament(self, tournament_id, user_id):
+        t = self.tournaments.get(tournament_id); players = self.tournament_players.get(tournament_id)
+        if not t or t['status'] != 'registering': return 'closed'
+        if user_id in players: return 'already'
+        if len(players) >= t['max_players']: return 'full'
+        user = self.users.get(user_id)
+        if not user or user['balance'] < t['fee']: return 'balance'
+        players[user_id] = {'tournament_id': tournament_id, 'user_id': user_id, 'joined_at': int(time.time()), 'seed': None, 'points': 0.0, 'slot': None,
+                            'byes': 0, 'eliminated_round': None, 'place': None}
+        if t['fee'] > 0: self._adjust_balance(user_id, -t['fee'], 'tournament_entry', f'Tournament {tournament_id}')
+        return 'joined'
+
+    async def cancel_tournament(self, tournament_id):
+        t = self.tournaments.get(tournament_id)
+        if not t or t['status'] != 'registering': return None
+        user_ids = list(self.tournament_players[tournament_id])
+        if t['fee'] > 0:
+            for user_id in user_ids: self._adjust_balance(user_id, t['fee'], 'refund', f'Tournament {tournament_id} cancelled')
+        t.update(status='cancelled', finished_at=int(time.time()))
+        return user_ids
+
+    async def get_tournament_players(self, tournament_id):
+        rows = []
+        for user_id, row in self.tournament_players.get(tournament_id, {}).items():
+            user = self.users.get(user_id, {})
+            rows.append({**row, 'ingame_name': user.get('ingame_name'), 'username': user.get('username'), 'elo_rating': user.get('elo_rating')})
+        return rows
+
+    async def get_tournament_matches(self, tournament_id, round=None):
+        return [{**self.matches[match_id], 'round': r} for match_id, (t, r) in self.tournament_matches.items()
+                if t == tournament_id and (round is None or r == round) and match_id in self.matches]
+
+    def _save_tournament_players(self, tournament_id, players):
+        rows = self.tournament_players[tournament_id]
+        for p in players:
+            if p['user_id'] in rows: rows[p['user_id']].update({k: p[k] for k in db.TOURNAMENT_PLAYER_FIELDS})
+
+    async def start_tournament_round(self, tournament_id, round, rounds, players, pairs, deadline_at):
+        self._save_tournament_players(tournament_id, players); match_ids = []
+        for p1, p2 in pairs:
+            match_id = self._insert_match(p1, p2, 0); self.matches[match_id]['deadline_at'] = deadline_at
+            self.tournament_matches[match_id] = (tournament_id, round); match_ids.append(match_id)
+        self.tournaments[tournament_id].update(status='running', round=round, rounds=rounds)
+        return match_ids
+
+    async def finish_tournament(self, tournament_id, players, payouts):
+        t = self.tournaments.get(tournament_id)
+        if not t or t['status'] != 'running': return False
+        self._save_tournament_players(tournament_id, players)
+        for user_id, amount in payouts: self._adjust_balance(user_id, amount, 'tournament_prize', f'Tournament {tournament_id}')
+        t.update(status='finished', finished_at=int(time.time()), winner_id=next((p['user_id'] for p in players if p['place'] == 1), None))
+        return True
+
+    # --- Deposit and withdrawal requests ---
+    def _add_request(self, kind, row):
+        row = {'id': next(self._request_ids[kind]), **row, 'status': 'pending', 'created_at': int(time.time())}
+        self.requests[kind][row['id']] = self.pending[kind][row['id']] = row
+        return row['id']
+
+    async def create_deposit_request(self, user_id, txid, amount):
+        return self._add_request('deposit', {'user_id': user_id, 'txid': txid, 'amount': float(amount)})
+
+    async def get_deposit_request(self, req_id):
+        row = self.requests['deposit'].get(req_id); return dict(row) if row else None
+
+    async def create_withdrawal_request(self, user_id, amount, method, account_number):
+        return self._add_request('withdrawal', {'user_id': user_id, 'amount': float(amount), 'method': method, 'account_number': account_number})
+
+    async def get_withdrawal_request(self, req_id):
+        row = self.requests['withdrawal'].get(req_id); return dict(row) if row else None
+
+    async def get_pending_requests(self, kind, offset=0, limit=10):
+        return [dict(r) for r in itertools.islice(self.pending[kind].values(), offset, offset + limit)], len(self.pending[kind])
+
+    async def settle_requests(self, kind, action, req_ids):
+        status, tx_type, note, sign = db.SETTLEMENTS[(kind, action)]; settled = []
+        for req_id in sorted(set(req_ids)):
+            row = self.pending[kind].pop(req_id, None)
+            if row:
+                row['status'] = status; settled.append({'id': req_id, 'user_id': row['user_id'], 'amount': row['amount']})
+        if tx_type:
+            for r in settled: self._adjust_balance(r['user_id'], sign * r['amount'], tx_type, note.format(id=r['id']))
+        return settled
+
+    # --- Stats ---
+    async def get_stats(self):
+        stats = {name: 0 for name in db.COUNTER_QUERIES}
+        stats.update(self.counters, pending_deposits=len(self.pending['deposit']), pending_withdrawals=len(self.pending['withdrawal']))
+        since = int(time.time()) - db.ACTIVE_WINDOW
+        stats['active_users'] = sum(1 for r in self.users.values() if r['last_tx_at'] is not None and r['last_tx_at'] > since)
+        return stats
+
+    async def rebuild_counters(self):
+        completed = [m for m in self.matches.values() if m['status'] == 'completed']
+        self.counters = {'registered_users': len(self._registered()), 'completed_matches': len(completed),
+                         'fees_collected': sum(m['fee'] for m in completed if m['fee'] and m['fee'] > 0)}
+
+    # --- Settings ---
+    async def get_setting(self, key): return self.settings.get(key)
+
+    async def set_setting(self, key, value):
+        if key in db.CONFIG_OVERRIDES and value is not None: db.CONFIG_OVERRIDES[key](value)  # ValueError before anything changes
+        if value is None: self.settings.pop(key, None)
+        else: self.settings[key] = str(value)
+        db.cache_settings(self.settings.items())
+
+
+BACKENDS = {'sqlite': SqliteStorage, 'memory': MemoryStorage}
+
+def create(name):
+    if name not in BACKENDS: raise ValueError(f"Unknown STORAGE_BACKEND {name!r}; expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+def use(store):
+    """Replaces the process-wide backend (a Storage or a BACKENDS name) and returns it."""
+    global backend
+    backend = create(store) if isinstance(store, str) else store
+    return backend
+
+backend = create(config.STORAGE_BACKEND)
@@ -0,0 +1,45 @@
+"""
+archive: বন্ধ মাসগুলো সরানোর পর অডিট (চেকপয়েন্ট + লেজার = ব্যালেন্স) ও কাউন্টার ঠিক থাকে কিনা যাচাই করে।
+
+    python -m pytest -q test_archive.py
+"""
+import asyncio, time
+import pytest
+import config, db, archive
+
+@pytest.fixture
+def fresh_db(fresh_db, monkeypatch):
+    monkeypatch.setattr(config, 'ARCHIVE_DIR', str(fresh_db / 'segments'))
+    monkeypatch.setattr(config, 'ARCHIVE_BATCH', 7)
+    return fresh_db
+
+def _age_everything(days_step):
+    now = int(time.time())
+    def age():
+        db.get_conn().execute("UPDATE transactions SET created_at = ? - (id % 12) * ? * 86400", (now, days_step))
+        db.get_conn().execute("UPDATE active_matches SET created_at = ? - (rowid % 12) * ? * 86400", (now, days_step))
+    db.write_sync(age)
+
+def test_archived_ledger_still_audits_and_counters_survive_rebuild(fresh_db):
+    for user_id in (1, 2, 3): db.write_sync(db.create_user_if_not_exists_sync, user_id, f'u{user_id}')
+    for i in range(60): db.write_sync(db.adjust_balance_sync, 1 + i % 3, 100 if i % 4 else -35, 'test', '')
+    matches = [db.write_sync(db.create_match_sync, 1, 2, 20) for _ in range(12)]
+    for match_id in matches[:8]: db.write_sync(db.set_room_code_sync, match_id, 'ROOM'); db.write_sync(db.resolve_match_sync, match_id, 1)
+    for match_id in matches[8:10]: db.write_sync(db.cancel_match_sync, match_id)
+    _age_everything(days_step=31)
+    balances = {u: db.get_user_sync(u)['balance'] for u in (1, 2, 3)}
+    stats = db.get_stats_sync()
+
+    moved = asyncio.run(archive.run())
+    assert moved['transactions'] > 0 and moved['matches'] > 0
+    assert db.get_conn().execute("SELECT COUNT(*) FROM transactions WHERE created_at < ?", (archive.cutoff(),)).fetchone()[0] == 0
+    for user_id, balance in balances.items():
+        audit = db.audit_user_sync(user_id)
+        assert audit['archived_count'] > 0 and audit['ledger_total'] == pytest.approx(balance)
+        assert len(archive.user_history_sync(user_id)) == audit['archived_count']
+    assert db.get_stats_sync() == stats
+    db.write_sync(db.rebuild_counters_sync)
+    assert db.get_stats_sync() == stats
+    archived = [m for m in matches if db.get_match_sync(m) is None]
+    assert archived and archive.find_match_sync(archived[0])['match_id'] == archived[0]
+    assert asyncio.run(archive.run()) == {'transactions': 0, 'matches': 0}
@@ -0,0 +1,65 @@
+"""
+broadcast: রিস্টার্টের পর ক্যাম্পেইন শুধু বাকি প্রাপকদের কাছে পাঠায়, Forbidden পাওয়া ইউজার blocked হয়ে পরের
+ক্যাম্পেইন থেকে বাদ পড়ে (অন্য ত্রুটি failed), আর BROADCAST_RATE পাঠানোর গতি সীমিত রাখে।
+
+    python -m pytest -q test_broadcast.py
+"""
+import asyncio, time
+from types import SimpleNamespace
+import pytest
+from telegram.error import BadRequest, Forbidden
+import broadcast, config, db, outbound
+
+BOT = SimpleNamespace(send_message=None)
+
+class Log(list): pass
+
+@pytest.fixture
+def sent(fresh_db, monkeypatch):
+    """Chat ids and times of the sends; chats listed in `sent.errors` raise instead."""
+    log = Log(); log.errors = {}
+    async def call(method, chat_id, **kwargs):
+        log.append((chat_id, time.monotonic()))
+        if chat_id in log.errors: raise log.errors[chat_id]
+    monkeypatch.setattr(outbound, 'pipeline', SimpleNamespace(call=call))
+    monkeypatch.setattr(config, 'BROADCAST_PAGE_SIZE', 3)
+    return log
+
+async def _register(*user_ids):
+    for user_id in user_ids:
+        await db.create_user_if_not_exists(user_id, f'u{user_id}'); await db.update_user_fields(user_id, {'is_registered': 1})
+
+async def _finish(engine):
+    await asyncio.gather(*engine._tasks.values())
+
+def test_resume_skips_recorded_pages(sent):
+    async def scenario():
+        await _register(*range(1, 8))
+        campaign_id = await db.create_campaign('hi', None, 0)
+        await db.record_broadcast_results(campaign_id, [(1, 'sent'), (2, 'sent'), (3, 'failed')])  # the page a previous process finished
+        engine = broadcast.BroadcastEngine(); await engine.resume(BOT); await _finish(engine)
+        return await db.get_campaign(campaign_id)
+    campaign = asyncio.run(scenario())
+    assert [chat_id for chat_id, _ in sent] == [4, 5, 6, 7]
+    assert (campaign['status'], campaign['total'], campaign['sent'], campaign['failed']) == ('done', 7, 6, 1)
+
+def test_forbidden_blocks_and_other_errors_fail(sent):
+    sent.errors.update({2: Forbidden('bot was blocked by the user'), 3: BadRequest('chat not found')})
+    async def scenario():
+        await _register(1, 2, 3, 4)
+        engine = broadcast.BroadcastEngine()
+        first = await engine.start(BOT, 'one', 0); await _finish(engine)
+        second = await engine.start(BOT, 'two', 0); await _finish(engine)
+        return await db.get_campaign(first), await db.get_campaign(second), (await db.get_user(2))['is_blocked'], (await db.get_user(3))['is_blocked']
+    first, second, blocked, failed = asyncio.run(scenario())
+    assert (first['sent'], first['failed'], first['blocked']) == (2, 1, 1) and (blocked, failed) == (1, 0)
+    assert second['total'] == 3 and [chat_id for chat_id, _ in sent[4:]] == [1, 3, 4]
+
+def test_rate_is_capped(sent, monkeypatch):
+    monkeypatch.setattr(config, 'BROADCAST_RATE', 20)
+    async def scenario():
+        await _register(*range(1, 31))
+        engine = broadcast.BroadcastEngine(); await engine.start(BOT, 'hi', 0); await _finish(engine)
+    asyncio.run(scenario())
+    times = [t for _, t in sent]
+    assert len(times) == 30 and times[-1] - times[0] >= 0.9 * (30 - 20) / 20  # a burst of 20, then 20 per second
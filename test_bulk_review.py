@@ -0,0 +1,30 @@
+"""
+একসাথে অনুমোদন/বাতিল: একটি ট্রানজ্যাকশনে শুধু pending অনুরোধগুলো প্রক্রিয়া হয়, ব্যালেন্স ও কাউন্টার ঠিক থাকে।
+
+    python -m pytest -q test_bulk_review.py
+"""
+import db
+
+def test_each_request_is_settled_once(fresh_db):
+    for user_id in (1, 2): db.write_sync(db.create_user_if_not_exists_sync, user_id, f'u{user_id}')
+    deposits = [db.write_sync(db.create_deposit_request_sync, 1 + i % 2, f'TX{i}', 100 + i) for i in range(6)]
+    settled = db.write_sync(db.settle_requests_sync, 'deposit', 'approve', deposits[:4] + [999])
+    assert [r['id'] for r in settled] == deposits[:4]
+    assert db.write_sync(db.settle_requests_sync, 'deposit', 'reject', deposits[2:]) == [{'id': d, 'user_id': 1 + i % 2, 'amount': 102 + i} for i, d in enumerate(deposits[4:], 2)]
+    assert db.get_user_sync(1)['balance'] == 100 + 102 and db.get_user_sync(2)['balance'] == 101 + 103
+    rows, total = db.get_pending_requests_sync('deposit')
+    assert rows == [] and total == 0 == db.get_pending_deposits_count_sync()
+
+def test_rejected_withdrawals_are_refunded(fresh_db):
+    db.write_sync(db.create_user_if_not_exists_sync, 1, 'u1')
+    db.write_sync(db.adjust_balance_sync, 1, 500, 'test', '')
+    requests = []
+    for amount in (100, 150, 200):
+        db.write_sync(db.adjust_balance_sync, 1, -amount, 'withdrawal_request', '')
+        requests.append(db.write_sync(db.create_withdrawal_request_sync, 1, amount, 'bkash', '017'))
+    db.write_sync(db.settle_requests_sync, 'withdrawal', 'approve', requests[:1])
+    rows, total = db.get_pending_requests_sync('withdrawal', 0, 1)
+    assert [r['id'] for r in rows] == requests[1:2] and total == 2
+    assert len(db.write_sync(db.settle_requests_sync, 'withdrawal', 'reject', requests)) == 2
+    assert db.get_user_sync(1)['balance'] == 400
+    assert db.audit_user_sync(1)['ledger_total'] == 400
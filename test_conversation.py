@@ -0,0 +1,40 @@
+"""
+conversation.store: টাইপড state, পুরোনো state_data ফরম্যাটের সাথে সামঞ্জস্য এবং write-behind ব্যাচিং যাচাই করে।
+
+    python -m pytest -q test_conversation.py
+"""
+import asyncio
+import pytest
+import conversation, db
+
+def test_states_round_trip_through_the_legacy_columns():
+    for state in (conversation.State('awaiting_room_code', match_id='ab12cd34'), conversation.State('admin_setbal_amount', target_id=42),
+                  conversation.State('awaiting_withdraw_account', amount=150.0, method='nagad'), conversation.State('awaiting_ign')):
+        again = conversation.State.decode(*state.encode())
+        assert repr(again) == repr(state)
+    assert conversation.State.decode('awaiting_withdraw_method', '{"amount": 200}').amount == 200  # written by older versions
+
+def test_changes_are_coalesced_and_requeued_on_failure(monkeypatch):
+    written = []; fail = [True]
+    async def save(rows):
+        if fail[0]: fail[0] = False; raise RuntimeError('disk full')
+        written.append(sorted(rows, key=lambda r: r[0]))
+    monkeypatch.setattr(db, 'save_user_states', save)
+    store = conversation.ConversationStore()
+    store.load([(1, 'awaiting_phone', None), (2, 'bogus_step_with_data', None), (3, 'admin_setbal_amount', 'not-a-number')])
+    assert store.get(1).step == 'awaiting_phone' and store.get(3) is None
+    store.set(1, 'awaiting_withdraw_amount'); store.set(1, 'awaiting_withdraw_method', amount=120.0)
+    store.set(5, 'awaiting_ign'); store.clear(5)
+    with pytest.raises(RuntimeError): asyncio.run(store.flush())
+    store.set(5, 'awaiting_phone')  # newer than the failed batch
+    asyncio.run(store.flush())
+    assert written == [[(1, 'awaiting_withdraw_method', '{"amount": 120.0}'), (5, 'awaiting_phone', None)]]
+
+def test_start_twice_is_refused(monkeypatch):
+    async def save(rows): pass
+    monkeypatch.setattr(db, 'save_user_states', save)
+    async def scenario():
+        store = conversation.ConversationStore(); store.start()
+        with pytest.raises(RuntimeError): store.start()
+        await store.stop(); store.start(); await store.stop()  # a stopped store starts again
+    asyncio.run(scenario())
@@ -0,0 +1,56 @@
+"""
+db রাইটার (group commit): এক ব্যাচে একটি রাইট ব্যর্থ হলে শুধু সেটিই রোলব্যাক হয়, after-commit হুক কমিটের পরে
+জমা দেওয়ার ক্রমে চলে (ব্যর্থটির হুক বাদ যায়) এবং flush() আগের সব রাইট কমিট হওয়া পর্যন্ত অপেক্ষা করে।
+
+    python -m pytest -q test_db_writer.py
+"""
+import asyncio, sqlite3, threading
+import pytest
+import config, db
+
+@pytest.fixture
+def batches(fresh_db, monkeypatch):
+    """Sizes of the batches committed from here on."""
+    sizes = []; commit = db._Writer._commit_batch
+    def recording(self, conn, batch):
+        sizes.append(len(batch)); commit(self, conn, batch)
+    monkeypatch.setattr(db._Writer, '_commit_batch', recording)
+    return sizes
+
+def _hold_writer():
+    """Blocks the writer thread until the returned event is set, so the writes queued meanwhile share one batch."""
+    release, held = threading.Event(), threading.Event()
+    def gate(): held.set(); release.wait(5)
+    db.submit_write(gate); held.wait(5)
+    return release
+
+def _committed_users():
+    conn = sqlite3.connect(config.LOCAL_DB)  # a separate connection only sees committed rows
+    try: return sorted(r[0] for r in conn.execute('SELECT user_id FROM users'))
+    finally: conn.close()
+
+def _create(user_id, order, seen):
+    db.create_user_if_not_exists_sync(user_id, f'u{user_id}')
+    db._after_commit(lambda: (order.append(user_id), seen.append(_committed_users())))
+
+def _create_then_fail(user_id, order, seen):
+    _create(user_id, order, seen); raise ValueError('boom')
+
+def test_failing_write_rolls_back_alone(batches):
+    order, seen = [], []
+    release = _hold_writer()
+    futures = [db.submit_write(op, user_id, order, seen) for op, user_id in ((_create, 1), (_create_then_fail, 2), (_create, 3))]
+    release.set()
+    assert [futures[0].result(5), futures[2].result(5)] == [None, None]
+    with pytest.raises(ValueError, match='boom'): futures[1].result(5)
+    assert batches[-1] == 3 and _committed_users() == [1, 3]
+    assert order == [1, 3] and seen == [[1, 3], [1, 3]]  # hooks run after COMMIT, in order; the failed op's is dropped
+
+def test_flush_waits_for_queued_writes(fresh_db):
+    async def scenario():
+        release = _hold_writer()
+        futures = [db.submit_write(db.create_user_if_not_exists_sync, user_id, f'u{user_id}') for user_id in range(1, 21)]
+        release.set(); await db.flush()
+        return all(f.done() for f in futures), _committed_users()
+    done, users = asyncio.run(scenario())
+    assert done and users == list(range(1, 21))
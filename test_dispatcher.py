@@ -0,0 +1,32 @@
+"""
+PerUserUpdateProcessor: একই ইউজারের আপডেট ক্রমানুসারে, ভিন্ন ইউজারের আপডেট সমান্তরালে চলে কিনা যাচাই করে।
+
+    python -m pytest -q test_dispatcher.py
+"""
+import asyncio
+from datetime import datetime
+from telegram import Update, User, Message, Chat
+import dispatcher
+
+def _update(update_id, user_id):
+    return Update(update_id, message=Message(update_id, datetime.now(), Chat(user_id, 'private'), from_user=User(user_id, 'u', False), text='t'))
+
+def test_per_user_order_with_parallel_users():
+    async def scenario():
+        processor = dispatcher.PerUserUpdateProcessor(workers=4, max_pending=64)
+        await processor.initialize()
+        log, running, peak = [], set(), [0]
+        async def handler(update_id, user_id):
+            assert user_id not in running  # never two updates of one user at once
+            running.add(user_id); peak[0] = max(peak[0], len(running))
+            log.append((user_id, update_id))
+            await asyncio.sleep(0.02 if user_id == 0 else 0.001)
+            running.discard(user_id)
+        await asyncio.gather(*(asyncio.create_task(processor.process_update(_update(i, i % 3), handler(i, i % 3))) for i in range(30)))
+        return processor, log, peak[0]
+    processor, log, peak = asyncio.run(scenario())
+    for user_id in range(3):
+        seen = [i for u, i in log if u == user_id]
+        assert seen == sorted(seen)
+    assert peak > 1
+    assert processor.busy_keys == 0 and processor.stats()['processed'] == 30
@@ -0,0 +1,56 @@
+"""
+elo_replay: পুরো ইতিহাস রিপ্লে লাইভ resolve_match এর রেটিং হুবহু মেলায়, বাদ দেওয়া ম্যাচ মনে রাখে এবং NumPy ও স্কেলার ইঞ্জিন একই ফল দেয়।
+
+    python -m pytest -q test_elo_replay.py
+"""
+import random
+import pytest
+import config, db, elo_replay
+
+@pytest.fixture
+def fresh_db(fresh_db, monkeypatch):
+    monkeypatch.setattr(config, 'ELO_PROVISIONAL_K', 48.0)
+    monkeypatch.setattr(config, 'ELO_PROVISIONAL_GAMES', 3)
+    return fresh_db
+
+def _play(rnd, players, matches):
+    played = []
+    for _ in range(matches):
+        p1, p2 = rnd.sample(players, 2)
+        match_id = db.write_sync(db.create_match_sync, p1, p2, 0); db.write_sync(db.set_room_code_sync, match_id, 'ROOM')
+        db.write_sync(db.resolve_match_sync, match_id, rnd.choice((p1, p2)))
+        played.append(match_id)
+    return played
+
+def test_replay_matches_live_ratings_and_remembers_exclusions(fresh_db):
+    players = list(range(1, 9))
+    for user_id in players: db.write_sync(db.create_user_if_not_exists_sync, user_id, f'u{user_id}')
+    played = _play(random.Random(3), players, 60)
+    assert db.get_elo_changes_sync(elo_replay.replay(*elo_replay.load_history()[:3]), elo_replay.INITIAL_RATING) == []
+
+    report = elo_replay.run_sync(exclude=played[:1], apply=True)
+    assert report['matches'] == 59 and report['changes']
+    assert elo_replay.excluded_matches() == {played[0]}
+    assert elo_replay.run_sync()['changes'] == []   # the exclusion sticks
+
+    report = elo_replay.run_sync(k_factor=40, apply=True)
+    assert config.ELO_K_FACTOR == 40 and report['changes']
+    _play(random.Random(4), players, 10)             # live matches continue under the replayed rules
+    assert elo_replay.run_sync()['changes'] == []
+
+def test_apply_refuses_when_matches_finished_meanwhile(fresh_db):
+    for user_id in (1, 2): db.write_sync(db.create_user_if_not_exists_sync, user_id, f'u{user_id}')
+    _play(random.Random(5), [1, 2], 3)
+    user_ids, winners, losers, version = elo_replay.load_history()
+    _play(random.Random(6), [1, 2], 1)
+    with pytest.raises(RuntimeError):
+        db.write_sync(elo_replay._apply_sync, elo_replay.replay(user_ids, winners, losers), version, set(), {})
+
+def test_numpy_engine_is_identical_to_calculate_elo():
+    pytest.importorskip('numpy')
+    rnd = random.Random(11); players = 300
+    weights = [1 / (i + 1) for i in range(players)]  # hot players make long chains of narrow waves
+    picks = rnd.choices(range(players), weights, k=40000)
+    winners, losers = picks[0::2], [b if b != a else (b + 1) % players for a, b in zip(picks[0::2], picks[1::2])]
+    for options in ((32, 32, 0), (24, 48, 15)):
+        assert elo_replay.replay_numpy(winners, losers, players, *options) == elo_replay.replay_scalar(winners, losers, players, *options)
@@ -0,0 +1,46 @@
+"""
+floodcontrol: ইউজার ও সার্বিক টোকেন বাকেট, একই বাটনের পুনরাবৃত্তি বাদ এবং ডিসপ্যাচারে হ্যান্ডলারের আগেই বাদ দেওয়া যাচাই করে।
+
+    python -m pytest -q test_floodcontrol.py
+"""
+import asyncio
+from datetime import datetime
+from telegram import Update, User, Message, Chat, CallbackQuery
+import config, dispatcher, floodcontrol
+
+def _message(update_id, user_id, text='hi'):
+    return Update(update_id, message=Message(update_id, datetime.now(), Chat(user_id, 'private'), from_user=User(user_id, 'u', False), text=text))
+
+def _press(update_id, user_id, data):
+    return Update(update_id, callback_query=CallbackQuery(str(update_id), User(user_id, 'u', False), 'chat', data=data))
+
+def test_user_and_global_buckets(monkeypatch):
+    monkeypatch.setattr(config, 'ADMINS', [99])
+    guard = floodcontrol.FloodControl({'text': (0.001, 3), 'command': (0.001, 1)}, {'text': (0.001, 5)}, debounce=1.0)
+    assert [guard.check(_message(i, 1)) for i in range(4)] == [None, None, None, 'user']
+    assert guard.check(_message(4, 1, '/start')) is None and guard.check(_message(5, 1, '/start')) == 'user'  # separate bucket per kind
+    assert [guard.check(_message(i, 2)) for i in range(3)] == [None, None, 'global']
+    assert all(guard.check(_message(i, 99)) is None for i in range(10))  # admins are never limited
+    assert guard.stats()['shed'] == {('text', 'user'): 1, ('command', 'user'): 1, ('text', 'global'): 1}
+
+def test_repeated_button_presses_are_debounced(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(floodcontrol.time, 'monotonic', lambda: clock[0])
+    guard = floodcontrol.FloodControl({'callback': (1000, 1000)}, {}, debounce=1.0)
+    assert guard.check(_press(1, 1, 'menu_wallet')) is None
+    clock[0] += 0.5; assert guard.check(_press(2, 1, 'menu_wallet')) == 'duplicate'
+    clock[0] += 0.9; assert guard.check(_press(3, 1, 'menu_wallet')) == 'duplicate'  # mashing keeps extending the window
+    assert guard.check(_press(4, 1, 'menu_profile')) is None and guard.check(_press(5, 2, 'menu_profile')) is None
+    clock[0] += 1.0; assert guard.check(_press(6, 1, 'menu_profile')) is None
+
+def test_shed_updates_never_reach_the_handler():
+    async def scenario():
+        guard = floodcontrol.FloodControl({'text': (0.001, 2)}, {})
+        processor = dispatcher.PerUserUpdateProcessor(workers=2, max_pending=16, gate=guard.check)
+        await processor.initialize()
+        handled = []
+        async def handler(update_id): handled.append(update_id)
+        await asyncio.gather(*(processor.process_update(_message(i, 1 + i % 2), handler(i)) for i in range(8)))
+        return processor, handled
+    processor, handled = asyncio.run(scenario())
+    assert sorted(handled) == [0, 1, 2, 3] and processor.stats()['shed'] == 4
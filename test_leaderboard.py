@@ -0,0 +1,27 @@
+"""
+লিডারবোর্ড: ম্যাচ নিষ্পত্তি, নাম বদল ও রেজিস্ট্রেশন বাতিলের পর মেমরির র‍্যাংকিং দুই ব্যাকএন্ডেই ডাটাবেসের
+get_top_wins ক্রমের সাথে হুবহু মেলে, আর rank() সেই তালিকায় ইউজারের অবস্থান দেয়।
+
+    python -m pytest -q test_leaderboard.py
+"""
+import asyncio
+import leaderboard
+
+RESULTS = [(1, 2, 1), (3, 4, 3), (5, 6, 6), (1, 3, 1), (2, 6, 6), (4, 5, 4), (1, 6, 6), (3, 2, 2), (6, 4, 6), (5, 1, 5), (5, 2, 5)]  # (p1, p2, winner)
+
+def test_board_matches_top_wins(store):
+    async def scenario():
+        for user_id in range(1, 8):
+            await store.create_user_if_not_exists(user_id, f'u{user_id}')
+            await store.update_user_fields(user_id, {'is_registered': 1, 'ingame_name': f'IGN{user_id}'})
+        for p1, p2, winner in RESULTS:
+            match_id = await store.create_match(p1, p2, 0)
+            await store.set_room_code(match_id, 'ROOM'); assert await store.resolve_match(match_id, winner)
+        await store.update_user_fields(7, {'is_registered': 0}); await store.update_user_fields(2, {'ingame_name': 'Renamed'})
+        return await store.get_top_wins(10)
+    top = asyncio.run(scenario())
+    assert len(top) == 6 and len({(r['elo_rating'], r['wins']) for r in top}) == 6  # no ties, so the SQL order is total
+    assert leaderboard.board.top(10) == top and leaderboard.board.top(3) == top[:3]
+    ids = {f'IGN{user_id}': user_id for user_id in range(1, 8)}; ids['Renamed'] = 2
+    assert [leaderboard.board.rank(ids[r['ingame_name']]) for r in top] == [(i, 6) for i in range(1, 7)]
+    assert leaderboard.board.rank(7) is None
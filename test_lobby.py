@@ -0,0 +1,63 @@
+"""
+lobby: প্রতি ফি-এর বোর্ড একবার পোস্ট ও পিন হয়, দ্রুত কিউ বদল একটি এডিটে মিশে যায় এবং মুছে ফেলা বোর্ড আবার পোস্ট হয়।
+
+    python -m pytest -q test_lobby.py
+"""
+import asyncio, json
+from types import SimpleNamespace
+from telegram.error import BadRequest
+import config, db, lobby, matchmaking, outbound, storage
+
+class FakeBot:
+    def __init__(self):
+        self.calls = []; self.missing = set(); self._message_id = 100
+
+    async def send_message(self, chat_id, text):
+        self._message_id += 1; self.calls.append(('send', self._message_id, text))
+        return SimpleNamespace(message_id=self._message_id)
+
+    async def pin_chat_message(self, chat_id, message_id, disable_notification=False): self.calls.append(('pin', message_id))
+
+    async def edit_message_text(self, text, chat_id, message_id):
+        if message_id in self.missing: raise BadRequest('Message to edit not found')
+        self.calls.append(('edit', message_id, text))
+
+def test_board_coalesces_queue_changes(monkeypatch):
+    monkeypatch.setattr(config, 'LOBBY_MODE', 'board'); monkeypatch.setattr(config, 'LOBBY_BOARD_DEBOUNCE', 0.05)
+    monkeypatch.setattr(config, 'LOBBY_BOARD_INTERVAL', 0.05); monkeypatch.setattr(config, 'OUTBOUND_GROUP_RATE', 1000)
+    store = storage.MemoryStorage(); store.open(); monkeypatch.setattr(storage, 'backend', store)
+    engine = matchmaking.MatchmakingEngine(); monkeypatch.setattr(matchmaking, 'engine', engine)
+    bot = FakeBot()
+    async def scenario():
+        monkeypatch.setattr(outbound, 'pipeline', outbound.OutboundPipeline())
+        for user_id in range(1, 6):
+            await store.create_user_if_not_exists(user_id, f'u{user_id}')
+            await store.update_user_fields(user_id, {'ingame_name': f'IGN{user_id}'})
+        async def tap(user_id, fee):
+            opponent = await engine.pair_or_enqueue(user_id, fee)
+            if opponent: await board.left(bot, opponent)
+            else: await board.joined(bot, {'user_id': user_id}, fee)
+        board = lobby.LobbyBoard(); await board.start(bot)
+        await tap(1, 20.0); await tap(2, 30.0)
+        await asyncio.sleep(0.2); posted = list(bot.calls); bot.calls.clear()
+        await tap(3, 20.0); await tap(4, 20.0); await tap(5, 20.0)  # pairs 1-3, then 4-5: four queue changes, one edit
+        await asyncio.sleep(0.2); edited = list(bot.calls); bot.calls.clear()
+        bot.missing.add(posted[0][1]); await tap(1, 20.0)
+        await asyncio.sleep(0.2); reposted = list(bot.calls)
+        await board.stop(); await outbound.pipeline.stop(timeout=1)
+        return posted, edited, reposted
+    posted, edited, reposted = asyncio.run(scenario())
+    assert [(c[0], c[1]) for c in posted] == [('send', 101), ('pin', 101), ('send', 102), ('pin', 102)]
+    assert 'IGN1 (ELO: 1000)' in posted[0][2] and '30 TK' in posted[2][2] and 'IGN2' in posted[2][2]
+    assert len(edited) == 1 and edited[0][:2] == ('edit', 101) and 'এখন কেউ অপেক্ষায় নেই' in edited[0][2]
+    assert [(c[0], c[1]) for c in reposted] == [('send', 103), ('pin', 103)] and 'IGN1' in reposted[0][2]
+    assert json.loads(store.setting(lobby.SETTING_KEY)) == {'20': 103, '30': 102}
+    db.cache_settings(())  # drop the board ids from the shared settings cache
+
+def test_board_lists_oldest_first_and_caps_rows(monkeypatch):
+    monkeypatch.setattr(config, 'LOBBY_BOARD_ROWS', 2)
+    engine = matchmaking.MatchmakingEngine(); monkeypatch.setattr(matchmaking, 'engine', engine)
+    store = storage.MemoryStorage(); store.open(); monkeypatch.setattr(storage, 'backend', store)
+    engine.load([{'user_id': uid, 'fee': 0.0, 'joined_at': uid, 'lobby_message_id': None} for uid in (7, 8, 9)])
+    text = asyncio.run(lobby.LobbyBoard().render_text(0.0))
+    assert text.splitlines()[:6] == ['🎮 Fun Match (Free)', '', '⏳ অপেক্ষায়: 3 জন', '1. 7 (ELO: 1000)', '2. 8 (ELO: 1000)', '… আরও 1 জন']
@@ -0,0 +1,27 @@
+"""
+matchmaking: জোড়া সংরক্ষণ ব্যর্থ হলে প্রতিপক্ষ কিউয়ের মাথায় ফেরে, আর এর মধ্যে সে অন্য কোথাও কিউ করলে দুই বাকেটে থাকে না।
+
+    python -m pytest -q test_matchmaking.py
+"""
+import asyncio
+import matchmaking
+
+def test_failed_pairing_requeues_the_opponent(store):
+    engine = matchmaking.MatchmakingEngine()
+    async def scenario():
+        await engine.pair_or_enqueue(1, 20.0)
+        opponent = await engine.pair_or_enqueue(4, 20.0)            # pops 1; saving the match fails ...
+        await engine.pair_or_enqueue(3, 20.0)                       # ... while 3 starts waiting
+        restored = await engine.requeue(opponent)
+        return opponent['user_id'], restored, [e['user_id'] for e in engine.entries(20.0)], (await store.get_from_queue(1))['fee']
+    assert asyncio.run(scenario()) == (1, True, [1, 3], 20.0)
+
+def test_requeue_skips_a_player_who_queued_again(store):
+    engine = matchmaking.MatchmakingEngine()
+    async def scenario():
+        await engine.pair_or_enqueue(1, 20.0)
+        opponent = await engine.pair_or_enqueue(2, 20.0)            # pops 1 ...
+        assert await engine.pair_or_enqueue(1, 50.0) is None        # ... who taps a 50 TK challenge meanwhile
+        restored = await engine.requeue(opponent)
+        return restored, engine.entries(20.0), [e['user_id'] for e in engine.entries(50.0)], (await store.get_from_queue(1))['fee']
+    assert asyncio.run(scenario()) == (False, [], [1], 50.0)
@@ -0,0 +1,40 @@
+"""
+metrics: হিস্টোগ্রামের কোয়ান্টাইল, Prometheus টেক্সট ফরম্যাট এবং হ্যান্ডলারের রুট লেবেল যাচাই করে।
+
+    python -m pytest -q test_metrics.py
+"""
+import asyncio
+import pytest
+import metrics
+
+def test_quantiles_interpolate_within_buckets():
+    hist = metrics.Histogram()
+    for _ in range(90): hist.observe(0.002)   # (0.001, 0.0025] bucket
+    for _ in range(10): hist.observe(0.3)     # (0.25, 0.5] bucket
+    assert 0.001 < hist.quantile(0.5) <= 0.0025
+    assert 0.25 < hist.quantile(0.99) <= 0.5
+    hist.observe(60)
+    assert hist.quantile(1.0) == metrics.BUCKETS[-1]
+
+def test_render_is_cumulative_and_escapes_labels():
+    registry = metrics.Registry()
+    registry.observe('x_seconds', 0.003, name='a"b'); registry.observe('x_seconds', 20, name='a"b')
+    registry.inc('x_errors_total', kind='timeout')
+    registry.gauge('x_depth', lambda: {(('lane', 'bulk'),): 3})
+    text = registry.render()
+    assert 'x_seconds_bucket{name="a\\"b",le="0.005"} 1' in text
+    assert 'x_seconds_bucket{name="a\\"b",le="+Inf"} 2' in text
+    assert 'x_seconds_count{name="a\\"b"} 2' in text
+    assert '# TYPE x_errors_total counter\nx_errors_total{kind="timeout"} 1' in text
+    assert 'x_depth{lane="bulk"} 3' in text
+
+def test_instrument_records_refined_route_and_errors():
+    async def handler(update, context):
+        metrics.set_route('awaiting_ign')
+        if update == 'boom': raise ValueError
+    wrapped = metrics.instrument('test_handler', handler, lambda update: 'text')
+    asyncio.run(wrapped('ok', None))
+    with pytest.raises(ValueError): asyncio.run(wrapped('boom', None))
+    rows = {tuple(labels.values()): count for labels, count, *_ in metrics.summary('bot_handler_seconds')}
+    assert rows[('test_handler', 'awaiting_ign')] == 2
+    assert metrics.registry.counter('bot_handler_errors_total', handler='test_handler', route='awaiting_ign') == 1
@@ -0,0 +1,44 @@
+"""
+OutboundPipeline: লেনের অগ্রাধিকার, একই চ্যাটে ক্রম এবং RetryAfter/নেটওয়ার্ক ত্রুটিতে পুনরায় চেষ্টা যাচাই করে।
+
+    python -m pytest -q test_outbound.py
+"""
+import asyncio
+from telegram.error import Forbidden, NetworkError, RetryAfter
+import config, outbound
+
+def _run(scenario):
+    async def wrapper():
+        pipeline = outbound.OutboundPipeline()
+        try: return await scenario(pipeline)
+        finally: await pipeline.stop(timeout=1)
+    return asyncio.run(wrapper())
+
+def test_critical_lane_overtakes_bulk_and_chat_order_is_kept(monkeypatch):
+    monkeypatch.setattr(config, 'OUTBOUND_WORKERS', 1)
+    sent = []
+    async def send(chat_id, text): sent.append((chat_id, text)); await asyncio.sleep(0)
+    async def scenario(pipeline):
+        futures = [pipeline.submit(send, 100 + i, 'bulk', lane=outbound.BULK) for i in range(5)]
+        futures += [pipeline.submit(send, 7, f'c{i}', lane=outbound.CRITICAL) for i in range(3)]
+        await asyncio.gather(*futures)
+    _run(scenario)
+    assert [t for c, t in sent if c == 7] == ['c0', 'c1', 'c2']
+    assert sent.index((7, 'c0')) < 2  # at most the bulk send already taken by the worker goes first
+
+def test_retries_then_reports_final_error(monkeypatch):
+    monkeypatch.setattr(config, 'OUTBOUND_MAX_BACKOFF', 0.01)
+    calls = {'flaky': 0}
+    async def flaky(chat_id, text):
+        calls['flaky'] += 1
+        if calls['flaky'] == 1: raise RetryAfter(0.01)
+        if calls['flaky'] == 2: raise NetworkError('reset')
+        return text
+    async def blocked(chat_id, text): raise Forbidden('blocked by user')
+    async def scenario(pipeline):
+        assert await pipeline.call(flaky, 1, 'ok') == 'ok'
+        try: await pipeline.call(blocked, 2, 'x'); assert False
+        except Forbidden: pass
+        return pipeline.stats()
+    stats = _run(scenario)
+    assert calls['flaky'] == 3 and stats['retried'] == 2 and stats['failed'] == 1 and stats['pending'] == 0
@@ -0,0 +1,64 @@
+"""
+হট কোয়েরিগুলো ইনডেক্স ব্যবহার করছে কিনা EXPLAIN QUERY PLAN দিয়ে যাচাই করে।
+
+    python -m pytest -q test_query_plans.py
+
+প্রতিটি db.*_sync ফাংশন একটি অস্থায়ী ডাটাবেসে চালিয়ে আসল SQL ধরা হয়,
+তারপর প্রতিটি SELECT এর প্ল্যানে টেবিল স্ক্যান বা পুরো টেবিল সর্টিং থাকলে টেস্ট ফেল করে।
+"""
+import pytest
+import db
+
+# (function, args) pairs that sit on hot paths; keep in sync when adding queries to db.py
+HOT_CALLS = [
+    (db.get_user_sync, (1,)),
+    (db.get_user_states_sync, ()),
+    (db.get_archivable_transactions_sync, (1, 100)),
+    (db.get_archivable_matches_sync, (1, 100)),
+    (db.audit_user_sync, (1,)),
+    (db.get_top_wins_sync, (10,)),
+    (db.get_all_user_ids_sync, ()),
+    (db.get_total_users_sync, ()),
+    (db.get_active_users_sync, ()),
+    (db.get_total_matches_sync, ()),
+    (db.get_pending_deposits_count_sync, ()),
+    (db.get_pending_withdrawals_count_sync, ()),
+    (db.get_total_fees_collected_sync, ()),
+    (db.find_opponent_in_queue_sync, (20.0, 1)),
+    (db.get_match_sync, ('abcd1234',)),
+    (db.get_deposit_request_sync, (1,)),
+    (db.get_withdrawal_request_sync, (1,)),
+    (db.get_pending_requests_sync, ('deposit', 0, 10)),
+    (db.get_pending_requests_sync, ('withdrawal', 10, 10)),
+    (db.get_setting_sync, ('rules_text',)),
+    (db.get_pending_recipients_sync, (1, 0, 200)),
+    (db.get_pending_deadlines_sync, ()),
+    (db.get_pending_reviews_sync, (50,)),
+    (db.get_open_tournaments_sync, ()),
+    (db.get_tournament_players_sync, (1,)),
+    (db.get_tournament_matches_sync, (1, 1)),
+]
+
+@pytest.fixture
+def conn(fresh_db):
+    return db.get_conn()
+
+def _bad_steps(conn, sql):
+    plan = conn.execute('EXPLAIN QUERY PLAN ' + sql).fetchall()
+    details = [row['detail'] for row in plan]
+    # A DISTINCT b-tree over an index range is fine; sorting a whole table is not.
+    return [d for d in details if (d.startswith('SCAN') and 'INDEX' not in d) or 'TEMP B-TREE FOR ORDER BY' in d]
+
+@pytest.mark.parametrize('func,args', HOT_CALLS, ids=[f.__name__ for f, _ in HOT_CALLS])
+def test_hot_query_uses_index(conn, func, args):
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try: func(*args)
+    finally: conn.set_trace_callback(None)
+    selects = [s for s in statements if s.lstrip().upper().startswith('SELECT')]
+    assert selects, f"{func.__name__} ran no SELECT"
+    for sql in selects:
+        assert not _bad_steps(conn, sql), f"{func.__name__}: {sql} -> {_bad_steps(conn, sql)}"
+
+def test_migrations_bump_user_version(conn):
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == len(db.MIGRATIONS)
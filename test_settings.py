@@ -0,0 +1,27 @@
+"""
+সেটিংস ক্যাশ: set_setting কমিটের পর ক্যাশ ও config ওভাররাইড আপডেট হয় এবং রিস্টার্টে আবার লোড হয়।
+
+    python -m pytest -q test_settings.py
+"""
+import pytest
+import config, db
+
+def test_set_setting_updates_cache_and_typed_defaults(fresh_db):
+    assert db.setting('free_play_status') == 'off'
+    assert db.setting('max_players', 4) == 4
+    db.write_sync(db.set_setting_sync, 'free_play_status', 'on')
+    db.write_sync(db.set_setting_sync, 'max_players', '6')
+    assert db.setting('free_play_status') == 'on'
+    assert db.setting('max_players', 4) == 6
+    assert db.setting('free_play_status', False) is True
+
+def test_config_override_applies_validates_and_reloads(fresh_db):
+    default = list(config.FEE_TIERS)
+    db.write_sync(db.set_setting_sync, 'FEE_TIERS', '10, 25.5 40')
+    assert config.FEE_TIERS == [10, 25.5, 40]
+    with pytest.raises(ValueError): db.write_sync(db.set_setting_sync, 'FEE_TIERS', 'ten')
+    assert config.FEE_TIERS == [10, 25.5, 40]
+    db._settings.clear(); db.load_settings_sync()
+    assert config.FEE_TIERS == [10, 25.5, 40]
+    db.write_sync(db.set_setting_sync, 'FEE_TIERS', None)
+    assert config.FEE_TIERS == default and db.setting('FEE_TIERS') is None
@@ -0,0 +1,141 @@
+"""
+storage: একই কনফরম্যান্স টেস্ট SQLite ও মেমরি দুই ব্যাকএন্ডেই চলে, আর একই ধাপের ফলাফল দুটিতে হুবহু মেলে।
+
+    python -m pytest -q test_storage.py
+"""
+import asyncio
+import pytest
+import config, leaderboard, storage
+
+def _pick(row, *keys):
+    return None if row is None else {k: row[k] for k in keys}
+
+async def _users(store):
+    for user_id in (1, 2, 3): await store.create_user_if_not_exists(user_id, f'u{user_id}', 1 if user_id == 3 else None)
+    await store.create_user_if_not_exists(3, 'again', 2)
+    user = await store.get_user(3)
+    assert (user['username'], user['referrer_id'], user['balance'], user['elo_rating'], user['is_registered']) == ('u3', 1, 0.0, 1000, 0)
+    assert await store.get_user(99) is None
+    for user_id, elo in ((1, 1100), (2, 1100), (3, 900)): await store.update_user_fields(user_id, {'ingame_name': f'IGN{user_id}', 'is_registered': 1, 'elo_rating': elo})
+    await store.update_user_fields(2, {'wins': 4})
+    await store.update_user_fields(3, {'is_registered': 0})
+    assert sorted(await store.get_all_user_ids()) == [1, 2]
+    assert [(r['ingame_name'], r['wins']) for r in await store.get_top_wins(5)] == [('IGN2', 4), ('IGN1', 0)]
+    assert [r['ingame_name'] for r in leaderboard.board.top(5)] == ['IGN2', 'IGN1']
+    await store.set_user_state(1, 'awaiting_phone')
+    await store.save_user_states([(2, 'awaiting_ign', '{"a": 1}'), (99, 'awaiting_ign', None)])
+    assert store.load_user_states() == [(1, 'awaiting_phone', None), (2, 'awaiting_ign', '{"a": 1}')]
+    stats = await store.get_stats()
+    assert (stats['registered_users'], stats['active_users']) == (2, 0)
+    return [_pick(await store.get_user(u), 'username', 'is_registered', 'elo_rating', 'state', 'referrer_id') for u in (1, 2, 3)], stats
+
+async def _settings(store):
+    default = list(config.FEE_TIERS)
+    assert store.setting('free_play_status') == 'off'
+    await store.set_setting('free_play_status', 'on'); await store.set_setting('FEE_TIERS', '10 20')
+    assert store.setting('free_play_status') == 'on' and await store.get_setting('FEE_TIERS') == '10 20' and config.FEE_TIERS == [10, 20]
+    with pytest.raises(ValueError): await store.set_setting('FEE_TIERS', 'ten')
+    await store.set_setting('FEE_TIERS', None)
+    assert config.FEE_TIERS == default and await store.get_setting('FEE_TIERS') is None
+
+async def _money(store):
+    for user_id in (1, 2): await store.create_user_if_not_exists(user_id, f'u{user_id}')
+    deposits = [await store.create_deposit_request(1 + i % 2, f'TX{i}', 100 + i) for i in range(5)]
+    rows, total = await store.get_pending_requests('deposit', 1, 2)
+    assert [r['txid'] for r in rows] == ['TX1', 'TX2'] and total == 5
+    assert [r['id'] for r in await store.settle_requests('deposit', 'approve', deposits[:3] + [999])] == deposits[:3]
+    assert [r['id'] for r in await store.settle_requests('deposit', 'reject', deposits)] == deposits[3:]
+    assert (await store.get_deposit_request(deposits[4]))['status'] == 'rejected'
+    await store.adjust_balance(2, -150, 'withdrawal_request', 'Withdrawal request')
+    withdrawal = await store.create_withdrawal_request(2, 150, 'bkash', '017')
+    assert _pick(await store.get_withdrawal_request(withdrawal), 'user_id', 'amount', 'method', 'status') == {'user_id': 2, 'amount': 150.0, 'method': 'bkash', 'status': 'pending'}
+    assert (await store.get_stats())['pending_withdrawals'] == 1
+    assert await store.settle_requests('withdrawal', 'reject', [withdrawal]) == [{'id': withdrawal, 'user_id': 2, 'amount': 150.0}]
+    assert await store.settle_requests('withdrawal', 'approve', [withdrawal]) == []
+    audits = [await store.audit_user(u) for u in (1, 2)]
+    assert [a['balance'] for a in audits] == [100 + 102, 101] and all(a['balance'] == a['ledger_total'] for a in audits)
+    stats = await store.get_stats()
+    assert (stats['pending_deposits'], stats['pending_withdrawals'], stats['active_users']) == (0, 0, 2)
+    return audits, stats
+
+async def _matches(store):
+    for user_id in (1, 2, 3, 4):
+        await store.create_user_if_not_exists(user_id, f'u{user_id}')
+        await store.update_user_fields(user_id, {'is_registered': 1, 'ingame_name': f'IGN{user_id}'})
+        await store.adjust_balance(user_id, 100, 'deposit', 'seed')
+    await store.add_to_queue(1, 20, None); await store.add_to_queue(2, 50, 7); await store.add_to_queue(3, 20, None)
+    assert (await store.find_opponent_in_queue(20, 3))['user_id'] == 1 and await store.find_opponent_in_queue(50, 2) is None
+    await store.set_queue_lobby_message(1, 11)
+    assert _pick(await store.get_from_queue(1), 'fee', 'lobby_message_id') == {'fee': 20.0, 'lobby_message_id': 11}
+    assert await store.remove_from_queue(2) and not await store.remove_from_queue(2)
+    first = await store.create_match_from_queue(1, 3, 20)
+    assert store.load_queue() == [] and (await store.get_user(1))['balance'] == 80.0
+    assert await store.set_room_code(first, 'ROOM') > 0
+    await store.submit_screenshot(first, 1, 'ss1')
+    match = await store.submit_screenshot(first, 3, 'ss3')
+    assert (match['status'], match['p1_screenshot_id'], match['p2_screenshot_id']) == ('in_progress', 'ss1', 'ss3')
+    assert [m['match_id'] for m in await store.get_pending_reviews()] == [first] and await store.get_pending_deadlines() == []
+    assert await store.resolve_match(first, 3) and not await store.resolve_match(first, 1)
+    winner, loser = await store.get_user(3), await store.get_user(1)
+    assert (winner['wins'], winner['elo_rating'], winner['balance'], loser['losses'], loser['elo_rating']) == (1, 1016, 80 + 36.0, 1, 984)
+    assert leaderboard.board.rank(3) == (1, 4)
+    # Timeouts: one screenshot wins, none refunds; a match still waiting for its code is left alone.
+    config.MATCH_TIMEOUT, timeout = -1, config.MATCH_TIMEOUT
+    try:
+        won, refunded, waiting = [await store.create_match(2, 4, 30) for _ in range(3)]
+        for match_id in (won, refunded): await store.set_room_code(match_id, 'ROOM')
+        await store.submit_screenshot(won, 4, 'ss4')
+        assert sorted(await store.get_pending_deadlines()) == sorted([(m, (await store.get_match(m))['deadline_at']) for m in (won, refunded)])
+        outcomes = await store.expire_matches([won, refunded, waiting, 'nope'])
+    finally: config.MATCH_TIMEOUT = timeout
+    assert [(o['match_id'], o['winner_id'], o['fee']) for o in outcomes] == [(won, 4, 30.0), (refunded, None, 30.0)]
+    # An expired match takes no late screenshot and cannot be paid out on top of the refund.
+    assert await store.submit_screenshot(refunded, 2, 'late') is None and not await store.resolve_match(refunded, 2)
+    await store.cancel_match(waiting)
+    assert [(await store.get_match(m))['status'] for m in (won, refunded, waiting)] == ['completed', 'cancelled', 'cancelled']
+    stats = await store.get_stats()
+    assert (stats['completed_matches'], stats['fees_collected']) == (2, 50)
+    await store.rebuild_counters()
+    assert await store.get_stats() == stats
+    users = [_pick(await store.get_user(u), 'balance', 'wins', 'losses', 'elo_rating') for u in (1, 2, 3, 4)]
+    return users, [await store.audit_user(u) for u in (1, 2, 3, 4)], stats, leaderboard.board.top(4)
+
+async def _counters(store):
+    """The running counters equal a full recount after every kind of change, including ones that undo another."""
+    async def recounted():
+        stats = await store.get_stats(); await store.rebuild_counters()
+        assert await store.get_stats() == stats
+        return stats
+    for user_id in (1, 2, 3, 4):
+        await store.create_user_if_not_exists(user_id, f'u{user_id}'); await store.adjust_balance(user_id, 100, 'deposit', 'seed')
+        await store.update_user_fields(user_id, {'is_registered': 1, 'ingame_name': f'IGN{user_id}'})
+    await store.update_user_fields(4, {'is_registered': 0}); await store.update_user_fields(3, {'is_registered': 0})
+    await store.update_user_fields(3, {'is_registered': 1}); await store.update_user_fields(2, {'is_registered': 1})
+    history = [await recounted()]
+    won, reversed_, cancelled = [await store.create_match(1, 2, fee) for fee in (20, 30, 40)]
+    for match_id in (won, reversed_):
+        await store.set_room_code(match_id, 'ROOM'); await store.resolve_match(match_id, 1)
+    history.append(await recounted())
+    await store.cancel_match(cancelled); await store.cancel_match(reversed_)  # a completed match that is cancelled stops counting
+    history.append(await recounted())
+    deposit = await store.create_deposit_request(2, 'TX', 50); withdrawal = await store.create_withdrawal_request(1, 10, 'bkash', '017')
+    history.append(await recounted())
+    await store.settle_requests('deposit', 'approve', [deposit]); await store.settle_requests('withdrawal', 'reject', [withdrawal])
+    history.append(await recounted())
+    assert [(s['registered_users'], s['completed_matches'], s['fees_collected'], s['pending_deposits'], s['pending_withdrawals']) for s in history] == [
+        (3, 0, 0, 0, 0), (3, 2, 50, 0, 0), (3, 1, 20, 0, 0), (3, 1, 20, 1, 1), (3, 1, 20, 0, 0)]
+    return history
+
+SCENARIOS = [_users, _settings, _money, _matches, _counters]
+
+@pytest.mark.parametrize('scenario', SCENARIOS, ids=lambda s: s.__name__[1:])
+def test_conformance(store, scenario):
+    asyncio.run(scenario(store))
+
+def test_backends_agree(make_store):
+    results = {}
+    for name in sorted(storage.BACKENDS):
+        for scenario in SCENARIOS:
+            store = make_store(name)
+            results.setdefault(name, []).append(asyncio.run(scenario(store)))
+    assert results['memory'] == results['sqlite']
@@ -0,0 +1,42 @@
+"""
+timeouts: স্টোরেজ কল একবার ব্যর্থ হলেও মেয়াদোত্তীর্ণ ম্যাচ পরের টিকে আবার চেষ্টা করে নিষ্পত্তি হয়, ফি ফেরত যায়
+এবং ম্যাচটির স্ক্রিনশটের অপেক্ষা মুছে যায়।
+
+    python -m pytest -q test_timeouts.py
+"""
+import asyncio
+from types import SimpleNamespace
+import config, conversation, outbound, storage, timeouts
+
+class FlakyStorage(storage.MemoryStorage):
+    def __init__(self):
+        super().__init__(); self.calls = 0
+
+    async def expire_matches(self, match_ids):
+        self.calls += 1
+        if self.calls == 1: raise RuntimeError('database is locked')
+        return await super().expire_matches(match_ids)
+
+def test_failed_batch_is_retried(monkeypatch):
+    monkeypatch.setattr(config, 'TIMEOUT_TICK', 0.05); monkeypatch.setattr(config, 'MATCH_TIMEOUT', -1)
+    store = FlakyStorage(); store.open(); monkeypatch.setattr(storage, 'backend', store)
+    monkeypatch.setattr(conversation, 'store', conversation.ConversationStore())
+    sent = []
+    monkeypatch.setattr(outbound, 'pipeline', SimpleNamespace(send=lambda method, chat_id, text, **kw: sent.append(chat_id)))
+    async def scenario():
+        for user_id in (1, 2):
+            await store.create_user_if_not_exists(user_id, f'u{user_id}'); await store.adjust_balance(user_id, 20, 'deposit', 'seed')
+        await store.add_to_queue(2, 20.0, None)
+        match_id = await store.create_match_from_queue(1, 2, 20.0)
+        scheduler = timeouts.MatchTimeoutScheduler(); await scheduler.start(SimpleNamespace(send_message=None))
+        scheduler.schedule(match_id, await store.set_room_code(match_id, 'ROOM1'))
+        conversation.store.set(1, 'awaiting_screenshot', match_id=match_id); conversation.store.set(2, 'awaiting_screenshot', match_id='other')
+        for _ in range(100):
+            if (await store.get_match(match_id))['status'] == 'cancelled': break
+            await asyncio.sleep(0.02)
+        await scheduler.stop()
+        return await store.get_match(match_id), await store.get_user(1), len(scheduler.wheel)
+    match, player1, pending = asyncio.run(scenario())
+    assert store.calls >= 2 and match['status'] == 'cancelled' and pending == 0
+    assert player1['balance'] == 20 and sorted(sent) == [1, 2]
+    assert conversation.store.get(1) is None and conversation.store.get(2).match_id == 'other'
@@ -0,0 +1,188 @@
+"""
+tournament: সিডিং ও ব্র্যাকেট, সুইস জোড়া, এবং দুই স্টোরেজ ব্যাকএন্ডে ১০২৪ জনের নকআউট ও টাইমআউটসহ সুইস টুর্নামেন্ট শেষ পর্যন্ত চালিয়ে যাচাই করে।
+
+    python -m pytest -q test_tournament.py
+"""
+import asyncio
+from types import SimpleNamespace
+import pytest
+import bot, config, conversation, matchmaking, outbound, storage, timeouts, tournament
+
+def _player(user_id, seed, **fields):
+    return {'user_id': user_id, 'seed': seed, 'points': 0.0, 'slot': None, 'byes': 0, 'eliminated_round': None, 'place': None, **fields}
+
+def test_bracket_and_pairings():
+    assert tournament.bracket_order(8) == [1, 8, 4, 5, 2, 7, 3, 6]
+    players = tournament.seed_players([{'user_id': u, 'elo_rating': 1000 + u, 'joined_at': 0, **_player(u, None)} for u in range(1, 6)])
+    assert [p['user_id'] for p in players] == [5, 4, 3, 2, 1] and tournament.place_in_bracket(players) == 3
+    pairs, byes = tournament.knockout_pairs(players)
+    assert [(a['seed'], b['seed']) for a, b in pairs] == [(4, 5)] and sorted(p['seed'] for p in byes) == [1, 2, 3]
+    swiss = [_player(u, u, points=float(u > 2)) for u in range(1, 6)]  # 3, 4, 5 lead; 5 players -> one bye
+    pairs, byes = tournament.swiss_pairs(swiss, {frozenset((3, 4))})
+    assert [p['user_id'] for p in byes] == [2] and [(a['user_id'], b['user_id']) for a, b in pairs] == [(3, 5), (4, 1)]
+
+@pytest.fixture
+def backend(store, monkeypatch):
+    """conftest's store (both backends) plus fresh timers and conversations, and an outbound pipeline that records."""
+    monkeypatch.setattr(timeouts, 'scheduler', timeouts.MatchTimeoutScheduler())
+    monkeypatch.setattr(conversation, 'store', conversation.ConversationStore())
+    sent = []
+    monkeypatch.setattr(outbound, 'pipeline', SimpleNamespace(send=lambda method, chat_id, text, **kw: sent.append((chat_id, text))))
+    return store, sent
+
+async def _register(store, count, fee):
+    for user_id in range(1, count + 1):
+        await store.create_user_if_not_exists(user_id, f'u{user_id}')
+        await store.update_user_fields(user_id, {'is_registered': 1, 'ingame_name': f'IGN{user_id}', 'elo_rating': 1000 + user_id})
+        await store.adjust_balance(user_id, fee, 'deposit', 'seed')
+
+async def _wait_round(engine, tournament_id, round):
+    for _ in range(500):
+        t = await storage.backend.get_tournament(tournament_id)
+        if t['status'] == 'finished' or (t['round'] == round and not engine._tasks): return t
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"round {round} never started")
+
+def test_knockout_of_1024_players(backend):
+    store, sent = backend
+    async def scenario():
+        engine = tournament.TournamentEngine(); await engine.start(SimpleNamespace(send_message=None))
+        await _register(store, 1024, 10)
+        tournament_id = await engine.create('Cup', 'knockout', 10, 1024)
+        assert [await store.join_tournament(tournament_id, u) for u in range(1, 1025)] == ['joined'] * 1024
+        assert await engine.begin(tournament_id) == 512 and await store.join_tournament(tournament_id, 1) == 'closed'
+        rounds = []
+        for round in range(1, 11):
+            t = await _wait_round(engine, tournament_id, round)
+            matches = [m for m in await store.get_tournament_matches(tournament_id, round)]
+            rounds.append(len(matches))
+            # The lower user id (the underdog) wins every match; all results land at once.
+            await asyncio.gather(*(store.set_room_code(m['match_id'], 'ROOM') for m in matches))
+            await asyncio.gather(*(store.resolve_match(m['match_id'], min(m['player1_id'], m['player2_id'])) for m in matches))
+            engine.matches_finished([m['match_id'] for m in matches])
+        t = await _wait_round(engine, tournament_id, 11)
+        players = {p['user_id']: p for p in await store.get_tournament_players(tournament_id)}
+        return t, rounds, players, await store.get_user(1), await store.get_user(2)
+    t, rounds, players, champion, runner_up = asyncio.run(scenario())
+    assert rounds == [512, 256, 128, 64, 32, 16, 8, 4, 2, 1] and t['status'] == 'finished' and t['winner_id'] == 1
+    assert players[1]['place'] == 1 and players[2]['place'] == 2 and players[3]['place'] == players[4]['place'] == 3
+    pool = 10 * 1024 * (1 - config.TOURNAMENT_RAKE)
+    assert champion['balance'] == pytest.approx(round(pool * 0.7, 2)) and runner_up['balance'] == pytest.approx(round(pool * 0.3, 2))
+    assert champion['wins'] == 10 and len(timeouts.scheduler.wheel) == 1023  # every match was scheduled; resolving is the caller's job
+    assert sum(1 for _, text in sent if 'চ্যাম্পিয়ন: IGN1' in text) == 1024
+
+def test_knockout_no_show_loses(backend, monkeypatch):
+    store, sent = backend
+    monkeypatch.setattr(config, 'TOURNAMENT_ROOM_CODE_TIMEOUT', -1)  # every room-code deadline has already passed
+    async def scenario():
+        engine = tournament.TournamentEngine(); await engine.start(SimpleNamespace(send_message=None))
+        await _register(store, 4, 0)
+        tournament_id = await engine.create('Cup', 'knockout', 0, 4)
+        for u in range(1, 5): await store.join_tournament(tournament_id, u)
+        await engine.begin(tournament_id)
+        top, other = sorted(await store.get_tournament_matches(tournament_id, 1), key=lambda m: -m['player1_id'])
+        assert (top['player1_id'], top['player2_id']) == (4, 1)  # seed 1 hosts seed 4
+        # Seed 1 never sends the room code; the sweep cancels the match without a result.
+        assert [o['winner_id'] for o in await store.expire_matches([top['match_id']])] == [None]
+        await store.set_room_code(other['match_id'], 'ROOM'); await store.resolve_match(other['match_id'], 3)
+        engine.matches_finished([top['match_id'], other['match_id']])
+        await _wait_round(engine, tournament_id, 2)
+        final, = await store.get_tournament_matches(tournament_id, 2)
+        return final, {p['user_id']: p for p in await store.get_tournament_players(tournament_id)}
+    final, players = asyncio.run(scenario())
+    assert {final['player1_id'], final['player2_id']} == {1, 3} and players[4]['eliminated_round'] == 1
+
+def test_busy_players_keep_their_flows(backend, monkeypatch):
+    store, sent = backend
+    monkeypatch.setattr(matchmaking, 'engine', matchmaking.MatchmakingEngine())
+    async def scenario():
+        engine = tournament.TournamentEngine(); await engine.start(SimpleNamespace(send_message=None))
+        await _register(store, 5, 0)
+        tournament_id = await engine.create('Cup', 'knockout', 0, 8)
+        await matchmaking.engine.pair_or_enqueue(1, 0.0)                          # waiting for a 1v1
+        conversation.store.set(2, 'awaiting_screenshot', match_id='1v1match')    # playing a 1v1
+        joined = [await engine.join(tournament_id, u) for u in (1, 2, 3, 4, 5, 3)]
+        conversation.store.set(4, 'awaiting_withdraw_method', amount=50.0)      # seed 2 hosts seed 3 mid-withdrawal
+        await engine.begin(tournament_id)
+        host = conversation.store.get(4).step
+        conversation.store.clear(4)
+        return joined, engine.playing(3), engine.playing(1), host, engine.resume_host(4), conversation.store.get(4)
+    joined, playing, queued, host, resumed, conv = asyncio.run(scenario())
+    assert joined == ['busy', 'busy', 'joined', 'joined', 'joined', 'already'] and playing and queued is None
+    assert host == 'awaiting_withdraw_method' and resumed and conv.step == 'awaiting_room_code'
+
+def test_restart_rebuilds_deferred_hosts(backend):
+    store, sent = backend
+    async def scenario():
+        engine = tournament.TournamentEngine(); await engine.start(SimpleNamespace(send_message=None))
+        await _register(store, 4, 0)
+        tournament_id = await engine.create('Cup', 'knockout', 0, 4)
+        for u in range(1, 5): await store.join_tournament(tournament_id, u)
+        conversation.store.set(4, 'awaiting_withdraw_method', amount=50.0)  # seed 1 is busy; seed 2 gets the prompt
+        await engine.begin(tournament_id)
+        hosted = {m['player1_id']: m['match_id'] for m in await store.get_tournament_matches(tournament_id, 1)}
+        restarted = tournament.TournamentEngine(); await restarted.start(SimpleNamespace(send_message=None))
+        deferred = dict(restarted._deferred)
+        conversation.store.clear(4)
+        return hosted, deferred, restarted.resume_host(4), conversation.store.get(4)
+    hosted, deferred, resumed, conv = asyncio.run(scenario())
+    assert deferred == {4: hosted[4]} and resumed and (conv.step, conv.match_id) == ('awaiting_room_code', hosted[4])
+
+def test_deferred_host_is_not_swallowed(backend, monkeypatch):
+    store, sent = backend
+    replies = []
+    async def reply_text(text, **kw): replies.append(text)
+    async def member(update, context): return True
+    monkeypatch.setattr(matchmaking, 'engine', matchmaking.MatchmakingEngine()); monkeypatch.setattr(bot, 'check_channel_member', member)
+    def message(user_id, text):
+        msg = SimpleNamespace(text=text, reply_text=reply_text)
+        return SimpleNamespace(effective_user=SimpleNamespace(id=user_id, username=f'u{user_id}', first_name='u'), message=msg, effective_message=msg)
+    async def say(user_id, text):
+        del replies[:]; await bot.main_text_handler(message(user_id, text), SimpleNamespace(bot=SimpleNamespace(send_message=None)))
+        conv = conversation.store.get(user_id); return list(replies), conv and conv.step
+    async def scenario():
+        engine = tournament.TournamentEngine(); await engine.start(SimpleNamespace(send_message=None)); monkeypatch.setattr(tournament, 'engine', engine)
+        await _register(store, 4, 0)
+        tournament_id = await engine.create('Cup', 'knockout', 0, 4)
+        for u in range(1, 5): await store.join_tournament(tournament_id, u)
+        conversation.store.set(4, 'awaiting_withdraw_method', amount=50.0); conversation.store.set(3, 'awaiting_withdraw_amount')
+        await engine.begin(tournament_id)
+        hosted = {m['player1_id']: m['match_id'] for m in await store.get_tournament_matches(tournament_id, 1)}
+        conversation.store.clear(4)  # seed 1's withdrawal ends (say, by the method button)
+        steps = [await say(4, '📋 Profile'), await say(4, 'ROOM42'), await say(3, '❌ Cancel'), await say(3, 'ROOM7')]
+        return steps, [await store.get_match(hosted[u]) for u in (4, 3)]
+    steps, matches = asyncio.run(scenario())
+    (profile, after_menu), (code, after_code), (cancel, after_cancel), (code3, after_code3) = steps
+    assert 'প্রোফাইল' in profile[0] and after_menu == 'awaiting_room_code'
+    assert code == [] and after_code is None and any(chat_id == 1 and 'ROOM42' in text for chat_id, text in sent)
+    assert 'রুম কোড' in cancel[0] and after_cancel == 'awaiting_room_code' and after_code3 is None
+    assert [(m['room_code'], m['status']) for m in matches] == [('ROOM42', 'in_progress'), ('ROOM7', 'in_progress')]
+
+def test_swiss_with_byes_and_timeouts(backend, monkeypatch):
+    store, sent = backend
+    monkeypatch.setattr(config, 'TOURNAMENT_ROOM_CODE_TIMEOUT', -1)  # every room-code deadline has already passed
+    async def scenario():
+        engine = tournament.TournamentEngine(); await engine.start(SimpleNamespace(send_message=None))
+        await _register(store, 5, 0)
+        tournament_id = await engine.create('Swiss', 'swiss', 0, 8, 3)
+        for u in range(1, 6): await store.join_tournament(tournament_id, u)
+        assert await engine.begin(tournament_id) == 2
+        history = []
+        for round in (1, 2, 3):
+            await _wait_round(engine, tournament_id, round)
+            matches = await store.get_tournament_matches(tournament_id, round); history += matches
+            expired, played = matches[0], matches[1:]
+            for m in played: await store.set_room_code(m['match_id'], 'ROOM'); await store.resolve_match(m['match_id'], max(m['player1_id'], m['player2_id']))
+            engine.matches_finished([m['match_id'] for m in played])
+            # Nobody sent a room code in the first pairing: the timeout sweep ends it without a result.
+            outcomes = await store.expire_matches([expired['match_id']])
+            assert [o['winner_id'] for o in outcomes] == [None]
+            engine.matches_finished([o['match_id'] for o in outcomes])
+        t = await _wait_round(engine, tournament_id, 4)
+        return t, history, await store.get_tournament_players(tournament_id)
+    t, history, players = asyncio.run(scenario())
+    assert t['status'] == 'finished' and len(history) == 6
+    pairs = [frozenset((m['player1_id'], m['player2_id'])) for m in history]
+    assert len(set(pairs)) == len(pairs)  # no rematches
+    assert sum(p['byes'] for p in players) == 3 and max(p['byes'] for p in players) == 1
+    assert sorted(p['place'] for p in players) == [1, 2, 3, 4, 5]
@@ -0,0 +1,38 @@
+"""
+ইউজার ক্যাশ: রাইট কমিট হলে ক্যাশ করা সারি বাতিল হয়, আর কোনো রিডার পুরনো সারি পড়ার পর রাইট কমিট হলে
+সেই পুরনো সারি ক্যাশে ঢোকে না (fill token); পরের get_user সবসময় নতুন মান দেয়।
+
+    python -m pytest -q test_user_cache.py
+"""
+import asyncio
+import db
+
+def _delta(before):
+    after = db.user_cache_stats()
+    return dict({k: after[k] - before[k] for k in ('hits', 'misses')}, size=after['size'])
+
+def test_writes_invalidate_cached_users(fresh_db):
+    async def scenario():
+        await db.create_user_if_not_exists(1, 'u1'); before = db.user_cache_stats()
+        seen = [(await db.get_user(1))['balance'], (await db.get_user(1))['balance']]
+        await db.adjust_balance(1, 30, 'deposit', 'seed'); seen.append((await db.get_user(1))['balance'])
+        await db.update_user_fields(1, {'ingame_name': 'Tiger'}); row = await db.get_user(1)
+        return seen + [row['balance'], row['ingame_name']], _delta(before)
+    seen, stats = asyncio.run(scenario())
+    assert seen == [0, 0, 30, 30, 'Tiger'] and stats == {'hits': 1, 'misses': 3, 'size': 1}
+
+def test_stale_fill_is_not_cached(fresh_db, monkeypatch):
+    select = db._select_user; raced = []
+    def select_then_write(user_id):
+        row = select(user_id)
+        if not getattr(db._local, 'is_writer', False) and not raced:  # a write commits between the read and the fill
+            raced.append(db.submit_write(db.adjust_balance_sync, user_id, 50, 'deposit', 'race').result(5))
+        return row
+    monkeypatch.setattr(db, '_select_user', select_then_write)
+    async def scenario():
+        await db.create_user_if_not_exists(1, 'u1'); before = db.user_cache_stats()
+        stale = (await db.get_user(1))['balance']; cached = db.user_cache_stats()['size']
+        return stale, cached, (await db.get_user(1))['balance'], (await db.get_user(1))['balance'], _delta(before)
+    stale, cached, fresh, again, stats = asyncio.run(scenario())
+    assert raced and stale == 0 and cached == 0
+    assert fresh == again == 50 and stats == {'hits': 1, 'misses': 2, 'size': 1}
@@ -0,0 +1,34 @@
+"""
+webhook: সিক্রেট ছাড়া লিসেনার চালু হয় না, WEBHOOK_URL থাকলে র‍্যান্ডম সিক্রেট তৈরি হয়, ভুল বা অনুপস্থিত হেডারের আপডেট 403
+এবং JSON অবজেক্ট নয় এমন বডি 400 পায়।
+
+    python -m pytest -q test_webhook.py
+"""
+import asyncio, json
+from types import SimpleNamespace
+import pytest
+import config, webhook
+
+def test_secret_is_required(monkeypatch):
+    monkeypatch.setattr(config, 'WEBHOOK_SECRET', ''); monkeypatch.setattr(config, 'WEBHOOK_URL', '')
+    with pytest.raises(RuntimeError): webhook.webhook_secret()
+    with pytest.raises(ValueError): webhook.make_handler(None, '')
+    monkeypatch.setattr(config, 'WEBHOOK_URL', 'https://example.com')
+    assert len(webhook.webhook_secret()) >= 32 and webhook.webhook_secret() != webhook.webhook_secret()
+
+def test_forged_updates_are_rejected():
+    queue = asyncio.Queue(); app = SimpleNamespace(bot=None, update_queue=queue)
+    handle = webhook.make_handler(app, 's3cret')
+    body = json.dumps({'update_id': 1}).encode()
+    async def post(headers): return (await handle('POST', config.WEBHOOK_PATH, headers, body))[0]
+    async def scenario():
+        return [await post({}), await post({'x-telegram-bot-api-secret-token': 'guess'}),
+                await post({'x-telegram-bot-api-secret-token': 's3cret'})]
+    assert asyncio.run(scenario()) == [403, 403, 200] and queue.qsize() == 1
+
+def test_malformed_updates_are_rejected():
+    queue = asyncio.Queue(); app = SimpleNamespace(bot=None, update_queue=queue)
+    handle = webhook.make_handler(app, 's3cret'); headers = {'x-telegram-bot-api-secret-token': 's3cret'}
+    async def scenario():
+        return [(await handle('POST', config.WEBHOOK_PATH, headers, body))[0] for body in (b'[]', b'1', b'null', b'"x"', b'{', b'{}')]
+    assert asyncio.run(scenario()) == [400] * 6 and queue.empty()
@@ -0,0 +1,95 @@
+# timeouts.py - Durable match-timeout scheduler (hashed timer wheel)
+import asyncio, math, time, logging
+from collections import defaultdict
+import storage, config, conversation, outbound, tournament
+
+logger = logging.getLogger(__name__)
+
+class TimerWheel:
+    """Buckets deadlines by tick; add/cancel are O(1) and each tick pops one slot."""
+
+    def __init__(self, tick):
+        self.tick = tick
+        self._slots = defaultdict(set)  # tick number -> {key}
+        self._where = {}                # key -> tick number
+        self._cursor = math.floor(time.time() / tick)
+
+    def __len__(self): return len(self._where)
+
+    def add(self, key, deadline):
+        self.cancel(key)
+        slot = max(math.ceil(deadline / self.tick), self._cursor)  # already overdue -> next pop
+        self._slots[slot].add(key); self._where[key] = slot
+
+    def cancel(self, key):
+        slot = self._where.pop(key, None)
+        if slot is not None:
+            self._slots[slot].discard(key)
+            if not self._slots[slot]: del self._slots[slot]
+
+    def pop_due(self, now):
+        due = []; last = math.floor(now / self.tick)
+        for slot in range(self._cursor, last + 1):
+            for key in self._slots.pop(slot, ()):
+                del self._where[key]; due.append(key)
+        self._cursor = last + 1
+        return due
+
+class MatchTimeoutScheduler:
+    """Expires in-progress matches whose `active_matches.deadline_at` has passed.
+
+    Deadlines live on the match row, so a restart reloads them with one indexed
+    query. A single task ticks the wheel and settles everything that is due in
+    batches of TIMEOUT_BATCH matches per transaction.
+    """
+
+    def __init__(self):
+        self.wheel = TimerWheel(config.TIMEOUT_TICK)
+        self._task = None
+
+    async def start(self, bot):
+        for match_id, deadline_at in await storage.backend.get_pending_deadlines(): self.wheel.add(match_id, deadline_at)
+        logger.info(f"Timeout scheduler loaded {len(self.wheel)} pending match deadlines.")
+        self._task = asyncio.create_task(self._run(bot))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try: await self._task
+            except asyncio.CancelledError: pass
+            self._task = None
+
+    def schedule(self, match_id, deadline_at): self.wheel.add(match_id, deadline_at)
+    def cancel(self, match_id): self.wheel.cancel(match_id)
+
+    async def _run(self, bot):
+        while True:
+            await asyncio.sleep(self.wheel.tick)
+            due = self.wheel.pop_due(time.time())
+            for i in range(0, len(due), config.TIMEOUT_BATCH):
+                batch = due[i:i + config.TIMEOUT_BATCH]
+                try:
+                    outcomes = await storage.backend.expire_matches(batch)
+                    notify_expired(bot, outcomes)
+                    tournament.engine.matches_finished([o['match_id'] for o in outcomes])
+                except Exception as e:
+                    # pop_due already dropped them; retry on the next tick (settled matches are skipped then).
+                    logger.error(f"Failed to expire matches {batch}, retrying: {e}", exc_info=True)
+                    for match_id in batch: self.schedule(match_id, time.time() + self.wheel.tick)
+
+def notify_expired(bot, outcomes):
+    send = outbound.pipeline.send
+    for o in outcomes:
+        for uid in (o['player1_id'], o['player2_id']):
+            conv = conversation.store.get(uid)  # a late room code or screenshot must not reach a settled match
+            if conv and conv.match_id == o['match_id']: conversation.store.clear(uid)
+        if o['winner_id']:
+            loser = o['player2_id'] if o['winner_id'] == o['player1_id'] else o['player1_id']
+            send(bot.send_message, o['winner_id'], "প্রতিপক্ষ ফলাফল না দেওয়ায় আপনি বিজয়ী হয়েছেন।", lane=outbound.CRITICAL)
+            send(bot.send_message, loser, "ফলাফল না দেওয়ায় আপনি পরাজিত হয়েছেন।", lane=outbound.CRITICAL)
+        else:
+            refund_msg = "আপনার ফি ফেরত দেওয়া হয়েছে।" if o['fee'] > 0 else "এটি একটি ফ্রি ম্যাচ ছিল।"
+            for uid in (o['player1_id'], o['player2_id']):
+                send(bot.send_message, uid, f"ম্যাচ ({o['match_id']}) বাতিল কারণ কোনো ফলাফল পাওয়া যায়নি। {refund_msg}", lane=outbound.CRITICAL)
+
+scheduler = MatchTimeoutScheduler()
@@ -0,0 +1,297 @@
+# tournament.py - Knockout and Swiss tournaments played as ordinary active_matches
+import asyncio, logging, math, time
+import config, conversation, matchmaking, outbound, storage, timeouts
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {'knockout': 'নকআউট', 'swiss': 'সুইস'}
+FINISHED = ('completed', 'cancelled')
+SWISS_SEARCH_STEPS = 100_000  # backtracking steps before Swiss pairing settles for rematches
+
+class TournamentError(Exception):
+    """An admin action that is not possible right now; the message is shown as is."""
+
+# --- Pairing (pure functions over tournament_players rows) ---
+def bracket_order(size):
+    """Seeds in bracket position order, so 1 and 2 can only meet in the final: 4 -> [1, 4, 2, 3]."""
+    order = [1]
+    while len(order) < size:
+        order = [s for seed in order for s in (seed, 2 * len(order) + 1 - seed)]
+    return order
+
+def seed_players(players):
+    """Seeds 1..n by ELO, highest first; earlier registration breaks ties."""
+    ranked = sorted(players, key=lambda p: (-(p['elo_rating'] or 0), p['joined_at'] or 0, p['user_id']))
+    for seed, p in enumerate(ranked, 1): p['seed'] = seed
+    return ranked
+
+def place_in_bracket(players):
+    """Gives every seeded player a first-round slot; returns the number of rounds. Missing seeds are byes for the top seeds."""
+    size = 1 << max(len(players) - 1, 1).bit_length()
+    position = {seed: slot for slot, seed in enumerate(bracket_order(size))}
+    for p in players: p['slot'] = position[p['seed']]
+    return size.bit_length() - 1
+
+def knockout_pairs(active):
+    """Slots 2k and 2k+1 meet; a slot without a neighbour is a bye. The higher seed is player 1 (sends the room code)."""
+    groups = {}
+    for p in active: groups.setdefault(p['slot'] // 2, []).append(p)
+    pairs, byes = [], []
+    for _, group in sorted(groups.items()):
+        if len(group) == 1: byes.append(group[0])
+        else: pairs.append(tuple(sorted(group, key=lambda p: p['seed'])))
+    return pairs, byes
+
+def swiss_pairs(active, played):
+    """Pairs players with equal or nearest scores, avoiding rematches where possible.
+
+    `played` is a set of frozenset({user_id, user_id}). With an odd count the
+    lowest-ranked player with the fewest byes sits out and scores a point.
+    """
+    ranked = sorted(active, key=lambda p: (-p['points'], p['seed']))
+    byes = []
+    if len(ranked) % 2:
+        bye = min(reversed(ranked), key=lambda p: p['byes'])
+        ranked.remove(bye); byes.append(bye)
+    pairs = _pair_unplayed(ranked, played, [SWISS_SEARCH_STEPS])
+    if pairs is None:  # every pairing repeats a match; take neighbours in standings order
+        pairs = list(zip(ranked[::2], ranked[1::2]))
+    return pairs, byes
+
+def _pair_unplayed(ranked, played, budget):
+    """Pairs the top player with the nearest opponent they have not met, backtracking
+    when the rest cannot be paired. None once `budget` (a one-item list) runs out."""
+    if not ranked: return []
+    p, rest = ranked[0], ranked[1:]
+    for i, q in enumerate(rest):
+        if frozenset((p['user_id'], q['user_id'])) in played: continue
+        budget[0] -= 1
+        if budget[0] < 0: return None
+        tail = _pair_unplayed(rest[:i] + rest[i + 1:], played, budget)
+        if tail is not None: return [(p, q)] + tail
+    return None
+
+def _advancing(match, a, b):
+    """The winner of a and b's match. Without a result: player 2 if player 1 never sent
+    the room code (the no-show must not win by waiting), otherwise the higher seed."""
+    if match and match['status'] == 'completed' and match['winner_id'] in (a['user_id'], b['user_id']):
+        return a if match['winner_id'] == a['user_id'] else b
+    if match and match['status'] == 'cancelled' and not match.get('room_code'):
+        return a if match['player2_id'] == a['user_id'] else b
+    return min(a, b, key=lambda p: p['seed'])
+
+def settle_knockout(players, matches, round):
+    """Applies a finished round: winners and byes move to slot // 2, losers are eliminated."""
+    by_pair = {frozenset((m['player1_id'], m['player2_id'])): m for m in matches}
+    pairs, byes = knockout_pairs([p for p in players if p['eliminated_round'] is None])
+    for a, b in pairs:
+        winner = _advancing(by_pair.get(frozenset((a['user_id'], b['user_id']))), a, b)
+        (b if winner is a else a)['eliminated_round'] = round
+    for p in players:
+        if p['eliminated_round'] is None: p['slot'] //= 2
+
+def settle_swiss(players, matches):
+    """A win is worth a point; a match without a result scores nothing for either player."""
+    by_id = {p['user_id']: p for p in players}
+    for m in matches:
+        if m['status'] == 'completed' and m['winner_id'] in by_id: by_id[m['winner_id']]['points'] += 1
+
+def final_standings(fmt, players, matches):
+    """Sets `place` on every player and returns them best first."""
+    if fmt == 'knockout':
+        # Eliminated later is better; the champion was never eliminated.
+        ranked = sorted(players, key=lambda p: (-(p['eliminated_round'] or math.inf), p['seed']))
+        for i, p in enumerate(ranked):  # losers of the same round share a place
+            p['place'] = ranked[i - 1]['place'] if i and ranked[i - 1]['eliminated_round'] == p['eliminated_round'] else i + 1
+        return ranked
+    points = {p['user_id']: p['points'] for p in players}; buchholz = dict.fromkeys(points, 0.0)
+    for m in matches:
+        if m['player1_id'] in points and m['player2_id'] in points:
+            buchholz[m['player1_id']] += points[m['player2_id']]; buchholz[m['player2_id']] += points[m['player1_id']]
+    ranked = sorted(players, key=lambda p: (-p['points'], -buchholz[p['user_id']], p['seed']))
+    for place, p in enumerate(ranked, 1): p['place'] = place
+    return ranked
+
+def prizes(tournament, ranked):
+    """(user_id, amount) for the top places: the entry fees minus TOURNAMENT_RAKE, split by TOURNAMENT_PAYOUTS."""
+    pool = tournament['fee'] * len(ranked) * (1 - config.TOURNAMENT_RAKE)
+    return [(p['user_id'], round(pool * share, 2)) for share, p in zip(config.TOURNAMENT_PAYOUTS, ranked) if pool > 0]
+
+def _name(p):
+    return p.get('ingame_name') or p.get('username') or str(p['user_id'])
+
+class TournamentEngine:
+    """Runs tournaments round by round on top of the normal match flow.
+
+    A round is created in one transaction: every pairing becomes an
+    active_matches row (fee 0, the entry fee was paid at registration) waiting
+    for player 1's room code, with a TOURNAMENT_ROOM_CODE_TIMEOUT deadline on
+    the shared timer wheel, so no-shows are swept in batches by timeouts.py.
+    From there the usual room code, /result, admin review and timeout paths
+    apply. Whoever settles a match calls matches_finished(); the engine only
+    counts down the round's open matches in memory, and the last one triggers
+    settling the round and creating the next (or paying out the prizes).
+    Notifications go through the outbound queue. Round state lives in the
+    database, so a restart picks up where it left off.
+
+    A player still in a tournament (registered, or playing and not yet
+    eliminated) cannot queue for 1v1 (see playing()), and join() refuses
+    anyone who is queued or in a 1v1 match, so the room-code conversation a
+    round opens never replaces another match's. A host busy with some other
+    flow (say a withdrawal) keeps it; the room code is asked for once that
+    conversation ends (resume_host()). Deferrals are not stored: start() rebuilds
+    them from the hosts of waiting matches whose room-code prompt is not open.
+    """
+
+    def __init__(self):
+        self._open = {}       # match_id -> tournament_id, current-round matches without a result
+        self._remaining = {}  # tournament_id -> open matches left in its current round
+        self._entrants = {}   # user_id -> tournament_id, registered or not yet eliminated
+        self._deferred = {}   # user_id -> match_id whose room code waits until their current conversation ends
+        self._locks = {}      # tournament_id -> asyncio.Lock
+        self._tasks = set()
+        self._bot = None
+
+    async def start(self, bot):
+        self._bot = bot
+        for t in await storage.backend.get_open_tournaments():
+            for p in await storage.backend.get_tournament_players(t['id']):
+                if p['eliminated_round'] is None: self._entrants[p['user_id']] = t['id']
+            if t['status'] != 'running': continue
+            matches = await storage.backend.get_tournament_matches(t['id'], t['round'])
+            self._track(t['id'], [m['match_id'] for m in matches if m['status'] not in FINISHED])
+            for m in matches:
+                if m['status'] != 'waiting_for_code': continue
+                if m['deadline_at']: timeouts.scheduler.schedule(m['match_id'], m['deadline_at'])
+                conv = conversation.store.get(m['player1_id'])
+                if not (conv and conv.step == 'awaiting_room_code' and conv.match_id == m['match_id']): self._deferred[m['player1_id']] = m['match_id']
+            if not self._remaining[t['id']]: self._spawn(t['id'])  # the round ended while the bot was down
+        logger.info(f"Tournament engine tracking {len(self._open)} open matches in {len(self._remaining)} tournaments.")
+
+    async def stop(self):
+        for task in list(self._tasks): task.cancel()
+        if self._tasks: await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _track(self, tournament_id, match_ids):
+        for match_id in match_ids: self._open[match_id] = tournament_id
+        self._remaining[tournament_id] = sum(1 for t in self._open.values() if t == tournament_id)
+
+    def matches_finished(self, match_ids):
+        """Matches that got their result (admin decision or timeout); anything not in a tournament is ignored."""
+        for match_id in match_ids:
+            tournament_id = self._open.pop(match_id, None)
+            if tournament_id is None: continue
+            self._remaining[tournament_id] -= 1
+            if not self._remaining[tournament_id]: self._spawn(tournament_id)
+
+    def playing(self, user_id):
+        """The tournament `user_id` is registered for or still playing in, else None."""
+        return self._entrants.get(user_id)
+
+    async def join(self, tournament_id, user_id):
+        """storage join_tournament's answer, or 'busy' for a player queued or playing elsewhere."""
+        if user_id in self._entrants: return 'already' if self._entrants[user_id] == tournament_id else 'busy'
+        conv = conversation.store.get(user_id)
+        if matchmaking.engine.get(user_id) or (conv and conv.step in conversation.MATCH_STEPS): return 'busy'
+        self._entrants[user_id] = tournament_id  # claimed before the write so a 1v1 tap can't slip in
+        result = await storage.backend.join_tournament(tournament_id, user_id)
+        if result != 'joined': self._entrants.pop(user_id, None)
+        return result
+
+    async def cancel(self, tournament_id):
+        """Cancels a tournament still in registration; the refunded user_ids, or None."""
+        refunded = await storage.backend.cancel_tournament(tournament_id)
+        for user_id in refunded or (): self._entrants.pop(user_id, None)
+        return refunded
+
+    def resume_host(self, user_id):
+        """Opens the deferred room-code conversation once `user_id` has none; True if it did."""
+        match_id = self._deferred.pop(user_id, None)
+        if match_id not in self._open: return False
+        conversation.store.set(user_id, 'awaiting_room_code', match_id=match_id)
+        return True
+
+    def _spawn(self, tournament_id):
+        task = asyncio.create_task(self._advance(tournament_id))
+        self._tasks.add(task); task.add_done_callback(self._tasks.discard)
+
+    async def create(self, name, fmt, fee, max_players, rounds=None):
+        if fmt not in FORMATS: raise TournamentError(f"ফরম্যাট হবে {' অথবা '.join(FORMATS)}।")
+        if fee < 0: raise TournamentError("এন্ট্রি ফি ঋণাত্মক হতে পারে না।")
+        if not 2 <= max_players <= config.TOURNAMENT_MAX_PLAYERS: raise TournamentError(f"খেলোয়াড় সংখ্যা 2 থেকে {config.TOURNAMENT_MAX_PLAYERS} এর মধ্যে হতে হবে।")
+        return await storage.backend.create_tournament(name, fmt, fee, max_players, rounds if fmt == 'swiss' else None)
+
+    async def begin(self, tournament_id):
+        """Closes registration, seeds by ELO and starts round 1."""
+        async with self._locks.setdefault(tournament_id, asyncio.Lock()):
+            t = await storage.backend.get_tournament(tournament_id)
+            if not t or t['status'] != 'registering': raise TournamentError("এই টুর্নামেন্টের রেজিস্ট্রেশন চলছে না।")
+            players = seed_players(await storage.backend.get_tournament_players(tournament_id))
+            if len(players) < 2: raise TournamentError("শুরু করতে অন্তত ২ জন খেলোয়াড় দরকার।")
+            if t['format'] == 'knockout': rounds = place_in_bracket(players)
+            else: rounds = min(t['rounds'] or max(1, math.ceil(math.log2(len(players)))), len(players) - 1 + len(players) % 2)
+            return await self._start_round(t, 1, rounds, players, set())
+
+    async def _start_round(self, t, round, rounds, players, played):
+        active = [p for p in players if p['eliminated_round'] is None]
+        pairs, byes = knockout_pairs(active) if t['format'] == 'knockout' else swiss_pairs(active, played)
+        for p in byes:
+            p['byes'] += 1
+            if t['format'] == 'swiss': p['points'] += 1
+        deadline_at = int(time.time()) + config.TOURNAMENT_ROOM_CODE_TIMEOUT
+        match_ids = await storage.backend.start_tournament_round(t['id'], round, rounds, players, [(a['user_id'], b['user_id']) for a, b in pairs], deadline_at)
+        self._track(t['id'], match_ids)
+        title = f"🏆 {t['name']} — রাউন্ড {round}/{rounds}"; minutes = config.TOURNAMENT_ROOM_CODE_TIMEOUT // 60
+        for match_id, (a, b) in zip(match_ids, pairs):
+            timeouts.scheduler.schedule(match_id, deadline_at)
+            conv = conversation.store.get(a['user_id']); busy = ""
+            if conv is None or conv.step in conversation.MATCH_STEPS:  # none, or left over from an earlier round
+                conversation.store.set(a['user_id'], 'awaiting_room_code', match_id=match_id)
+            else:
+                self._deferred[a['user_id']] = match_id; busy = "আগে চলমান কাজটি শেষ করুন বা ❌ Cancel চাপুন, তারপর "
+            self._send(a['user_id'], f"{title}\nআপনার প্রতিপক্ষ: {_name(b)}\n\neFootball গেমে একটি Friend Match রুম তৈরি করে {busy}রুম কোডটি এখানে পাঠান। "
+                                     f"{minutes} মিনিটের মধ্যে কোড না দিলে ম্যাচটি ফলাফল ছাড়া শেষ হবে।")
+            self._send(b['user_id'], f"{title}\nআপনার প্রতিপক্ষ: {_name(a)}। রুম কোডের জন্য অপেক্ষা করুন।")
+        for p in byes: self._send(p['user_id'], f"{title}\nএই রাউন্ডে আপনি বাই পেয়েছেন (সরাসরি জয়)।")
+        logger.info(f"Tournament {t['id']} round {round}: {len(pairs)} matches, {len(byes)} byes.")
+        if not pairs: self._spawn(t['id'])  # only byes (e.g. a Swiss round of one): settle right away
+        return len(pairs)
+
+    async def _advance(self, tournament_id):
+        try:
+            async with self._locks.setdefault(tournament_id, asyncio.Lock()):
+                t = await storage.backend.get_tournament(tournament_id)
+                if not t or t['status'] != 'running': return
+                matches = await storage.backend.get_tournament_matches(tournament_id)
+                current = [m for m in matches if m['round'] == t['round']]
+                if any(m['status'] not in FINISHED for m in current):  # e.g. an admin re-opened a match
+                    return self._track(tournament_id, [m['match_id'] for m in current if m['status'] not in FINISHED])
+                players = await storage.backend.get_tournament_players(tournament_id)
+                if t['format'] == 'knockout': settle_knockout(players, current, t['round'])
+                else: settle_swiss(players, current)
+                for p in players:
+                    if p['eliminated_round'] is not None: self._entrants.pop(p['user_id'], None)
+                alive = sum(1 for p in players if p['eliminated_round'] is None)
+                if (t['format'] == 'knockout' and alive > 1) or (t['format'] == 'swiss' and t['round'] < t['rounds']):
+                    played = {frozenset((m['player1_id'], m['player2_id'])) for m in matches}
+                    return await self._start_round(t, t['round'] + 1, t['rounds'], players, played)
+                await self._finish(t, players, matches)
+        except Exception as e:
+            logger.error(f"Failed to advance tournament {tournament_id}: {e}", exc_info=True)
+
+    async def _finish(self, t, players, matches):
+        ranked = final_standings(t['format'], players, matches); payouts = prizes(t, ranked)
+        if not await storage.backend.finish_tournament(t['id'], players, payouts): return
+        self._remaining.pop(t['id'], None)
+        for p in players: self._entrants.pop(p['user_id'], None)
+        prize = dict(payouts); champion = _name(ranked[0])
+        for p in ranked:
+            text = f"🏁 {t['name']} শেষ! চ্যাম্পিয়ন: {champion}\nআপনার অবস্থান: #{p['place']}"
+            if p['user_id'] in prize: text += f"\nপুরস্কার: {prize[p['user_id']]:.2f} TK আপনার ব্যালেন্সে যোগ হয়েছে।"
+            self._send(p['user_id'], text)
+        logger.info(f"Tournament {t['id']} finished, winner {ranked[0]['user_id']}.")
+
+    def _send(self, chat_id, text):
+        outbound.pipeline.send(self._bot.send_message, chat_id, text, lane=outbound.CRITICAL)
+
+engine = TournamentEngine()
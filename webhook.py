@@ -0,0 +1,63 @@
+# webhook.py - Webhook serving mode (alternative to run_polling)
+import asyncio, hmac, json, logging, secrets, signal
+from telegram import Update
+import config, httpserver
+
+logger = logging.getLogger(__name__)
+
+def webhook_secret():
+    """The secret Telegram must echo back. Generated per run when we register the
+    webhook ourselves; without WEBHOOK_URL it must be configured, since an
+    unchecked listener would accept forged updates (e.g. from an admin's id)."""
+    if config.WEBHOOK_SECRET: return config.WEBHOOK_SECRET
+    if config.WEBHOOK_URL: return secrets.token_urlsafe(32)
+    raise RuntimeError("Webhook mode needs WEBHOOK_SECRET (or WEBHOOK_URL, so a random one can be registered)")
+
+def make_handler(app, secret):
+    """HTTP handler that verifies Telegram's secret token and enqueues the update."""
+    if not secret: raise ValueError("make_handler needs a webhook secret")
+    secret = secret.encode()
+    async def handle(method, path, headers, body):
+        if path.split('?', 1)[0] != config.WEBHOOK_PATH: return 404, 'text/plain', b''
+        if method != 'POST': return 405, 'text/plain', b''
+        if not hmac.compare_digest(headers.get('x-telegram-bot-api-secret-token', '').encode(), secret):
+            return 403, 'text/plain', b''
+        try:
+            data = json.loads(body)
+            if not isinstance(data, dict): raise ValueError("update is not a JSON object")
+            update = Update.de_json(data, app.bot)
+        except (ValueError, TypeError, KeyError, AttributeError): return 400, 'text/plain', b''
+        await app.update_queue.put(update)
+        return 200, 'application/json', b'{}'
+    return handle
+
+async def serve(app, stop=None):
+    """Runs the application behind the built-in listener until `stop` is set (or SIGINT/SIGTERM).
+
+    Mirrors Application.run_polling's lifecycle, so post_init/post_shutdown
+    (scheduler start, DB flush) run exactly as in polling mode.
+    """
+    secret = webhook_secret()  # before anything starts: refuse to listen without one
+    stop = stop or asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try: loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError): pass  # Windows / non-main thread
+    await app.initialize()
+    if app.post_init: await app.post_init(app)
+    server = None
+    try:
+        if config.WEBHOOK_URL:
+            await app.bot.set_webhook(url=config.WEBHOOK_URL + config.WEBHOOK_PATH, secret_token=secret,
+                                      allowed_updates=Update.ALL_TYPES, max_connections=config.WEBHOOK_MAX_CONNECTIONS)
+        await app.start()
+        server = await httpserver.start_server(make_handler(app, secret), config.WEBHOOK_LISTEN, config.WEBHOOK_PORT)
+        logger.info(f"Webhook listener on {config.WEBHOOK_LISTEN}:{config.WEBHOOK_PORT}{config.WEBHOOK_PATH}")
+        await stop.wait()
+    finally:
+        if server:
+            server.close(); await server.wait_closed()
+        if app.running: await app.stop()
+        if app.post_stop: await app.post_stop(app)
+        await app.shutdown()
+        if app.post_shutdown: await app.post_shutdown(app)